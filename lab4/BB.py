@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+import operator
 
 
 # Определение констант для типов инструкций
@@ -14,6 +15,41 @@ SUB = 'sub'
 RET = 'ret'
 PHI = 'phi'
 
+# Ключи аргументов, которые инструкция читает (для phi - список 'from')
+USE_KEYS = {
+    STORE: ('from',),
+    LOAD: ('from',),
+    ADD: ('oper1', 'oper2'),
+    SUB: ('oper1', 'oper2'),
+    MUL: ('oper1', 'oper2'),
+    ICMP: ('arg1', 'arg2'),
+    CONDBR: ('cond',),
+    RET: ('value',),
+}
+
+# Инструкции, определяющие значение в аргументе 'to'
+DEF_TYPES = (STORE, LOAD, ADD, SUB, MUL, ICMP, PHI)
+
+# Инструкции, завершающие базовый блок
+TERMINATORS = (BR, CONDBR, RET)
+
+# Операции сравнения инструкции icmp (аргумент 'op', по умолчанию '>')
+ICMP_OPS = {
+    '>': operator.gt,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# Арифметические операции
+ARITH_OPS = {
+    ADD: operator.add,
+    SUB: operator.sub,
+    MUL: operator.mul,
+}
+
 
 class Value:
     """Базовый класс для всех значений в IR"""
@@ -38,7 +74,7 @@ class Variable(Value):
         return f'{self.name}({"" + str(self.version) + ""})'
 
     def __hash__(self):
-        return len(self.name)
+        return hash((self.name, self.version))
 
     def __eq__(self, other):
         if type(other) == type(self):
@@ -63,6 +99,32 @@ class IntConst(Value):
         return str(self.value)
     
 
+def const_value(val):
+    """Возвращает числовое значение константы или None, если val - не константа"""
+    if isinstance(val, IntConst):
+        return val.value
+    if isinstance(val, int):
+        return val
+    return None
+
+
+def evaluate(typ, a, b, op='>'):
+    """
+    Вычисляет арифметическую инструкцию или сравнение над числами.
+    
+    Args:
+        typ: Тип инструкции (ADD, SUB, MUL или ICMP)
+        a, b: Значения операндов
+        op: Операция сравнения для ICMP
+        
+    Returns:
+        int: Результат (для сравнения - 1 или 0)
+    """
+    if typ == ICMP:
+        return int(ICMP_OPS[op](a, b))
+    return ARITH_OPS[typ](a, b)
+
+
 @dataclass
 class Instruction:
     """Представление инструкции в промежуточном коде"""
@@ -93,7 +155,7 @@ class Instruction:
             return f'if ({self.args["cond"]}) go to BLOCK{self.args["dest1"]} else go to BLOCK{self.args["dest2"]}'
             
         if self.typ == ICMP:
-            return f'{self.args["to"]} <- {self.args["arg1"]} > {self.args["arg2"]}'
+            return f'{self.args["to"]} <- {self.args["arg1"]} {self.args.get("op", ">")} {self.args["arg2"]}'
             
         if self.typ == PHI:
             return f'{self.args["to"]} = phi({", ".join(map(str, self.args["from"]))})'
@@ -106,6 +168,55 @@ class Instruction:
         for k, v in self.args.items():
             ret += f'{k} {v} '
         return ret
+
+    # ====== ФУНКЦИОНАЛ ДЛЯ ОПТИМИЗАЦИЙ ======
+
+    def get_def(self):
+        """Возвращает переменную, определяемую инструкцией, или None"""
+        if self.typ in DEF_TYPES:
+            return self.args['to']
+        return None
+
+    def get_uses(self):
+        """Возвращает список операндов, которые читает инструкция"""
+        if self.typ == PHI:
+            return list(self.args['from'])
+        return [self.args[key] for key in USE_KEYS.get(self.typ, ()) if key in self.args]
+
+    def with_args(self, **changes):
+        """Возвращает копию инструкции с измененными аргументами"""
+        args = dict(self.args)
+        args.update(changes)
+        return Instruction(self.typ, args)
+
+    def map_uses(self, fn):
+        """
+        Заменяет операнды инструкции, не изменяя ее саму.
+        
+        Инструкции могут разделяться несколькими версиями программы,
+        поэтому при замене операндов создается новая инструкция.
+        
+        Args:
+            fn: Функция, получающая операнд и возвращающая его замену
+            
+        Returns:
+            Instruction: Новая инструкция или эта же, если операнды не изменились
+        """
+        if self.typ == PHI:
+            values = [fn(val) for val in self.args['from']]
+            if all(new is old for new, old in zip(values, self.args['from'])):
+                return self
+            return self.with_args(**{'from': values})
+
+        changes = {}
+        for key in USE_KEYS.get(self.typ, ()):
+            if key in self.args:
+                new = fn(self.args[key])
+                if new is not self.args[key]:
+                    changes[key] = new
+        if not changes:
+            return self
+        return self.with_args(**changes)
     
 
 @dataclass
@@ -140,6 +251,21 @@ class BB:
     def __repr__(self):
         return f'BB({self.block_num})'
 
+    def copy(self):
+        """
+        Создает копию блока со своим списком инструкций.
+        
+        Сами инструкции разделяются с исходным блоком, поэтому изменять
+        их нужно заменой, а не на месте.
+        """
+        bb = BB()
+        bb.block_num = self.block_num
+        bb.instructions = list(self.instructions)
+        bb.returned = self.returned
+        bb.variables = dict(self.variables)
+        bb.varcounter = self.varcounter
+        return bb
+
     # ====== ФУНКЦИОНАЛ IR БЛОКА ======
 
     def add_instr(self, instr):
@@ -226,6 +352,20 @@ class BB:
                    (self.block_num, last.args["dest2"])}
         return set()
 
+    def get_successors(self):
+        """Возвращает список номеров блоков-преемников в порядке терминатора"""
+        if not self.instructions:
+            return []
+
+        last = self.instructions[-1]
+        if last.typ == BR:
+            return [last.args["dest"]]
+        elif last.typ == CONDBR:
+            if last.args["dest1"] == last.args["dest2"]:
+                return [last.args["dest1"]]
+            return [last.args["dest1"], last.args["dest2"]]
+        return []
+
     def build_changing_variables(self):
         """Определяет множество переменных, изменяемых в блоке"""
         changed_vars = set()
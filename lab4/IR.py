@@ -148,7 +148,8 @@ def example1():
     # i < 5
     b1.add_instr(Instruction('icmp', {'arg1': Variable('i', 0), 
                                      'arg2': 5, 
-                                     'to': tmp}))
+                                     'to': tmp,
+                                     'op': '<'}))
     # Переход к телу цикла или выходу
     b1.add_instr(Instruction('condbr', {'cond': tmp, 'dest1': 2, 'dest2': 3}))
     b1.returned = False
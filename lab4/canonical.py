@@ -0,0 +1,92 @@
+"""
+Канонизация программы: плотные номера блоков и переменных.
+
+Номера блоков назначает Parser (в порядке создания) или автор примера
+в IR.py; после удаления недостижимых блоков они идут с пропусками, а
+переменные всюду хранятся в словарях и множествах. Канонизация удаляет
+недостижимые блоки, перенумеровывает достижимые подряд в обратном
+постпорядке и назначает переменным плотные целые номера. Анализы могут
+после этого хранить свойства блоков и переменных в списках и битовых
+масках (int), индексированных номерами, а отображения назад позволяют
+вернуться к исходным номерам блоков и переменным.
+
+Проход работает как с исходным IR, так и с SSA-формой.
+"""
+
+from BB import *
+from cfg import *
+
+
+class Canonicalizer:
+    """
+    Проход канонизации.
+
+    Входной блок получает номер 0, блоки идут в обратном постпорядке,
+    поэтому обход range(len(blocks)) - прямой обход графа для анализов.
+    Номера переменных назначаются в порядке первого появления при
+    просмотре блоков по новым номерам.
+    """
+
+    def __init__(self, blocks, verbose=True):
+        """
+        Args:
+            blocks: Базовые блоки программы (номера блоков и списки
+                    инструкций изменяются на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+
+        # Отображения номеров
+        self.block_id = {}      # исходный номер блока -> новый номер
+        self.origin = []        # новый номер блока -> исходный номер
+        self.var_id = {}        # переменная -> номер
+        self.variables = []     # номер -> переменная
+
+        # Статистика прохода
+        self.removed = []       # исходные номера удаленных недостижимых блоков
+
+    def run(self):
+        """
+        Выполняет канонизацию.
+
+        Returns:
+            list: Достижимые блоки программы, упорядоченные по новым номерам
+        """
+        self.origin = reverse_post_order(self.blocks)
+        self.removed = sorted(set(self.blocks) - set(self.origin))
+        self.blocks, self.block_id = renumber_blocks(self.blocks, self.origin)
+
+        for n in range(len(self.origin)):
+            for instr in self.blocks[n].instructions:
+                for val in instr.get_uses() + [instr.get_def()]:
+                    if isinstance(val, Variable) and val not in self.var_id:
+                        self.var_id[val] = len(self.variables)
+                        self.variables.append(val)
+
+        if self.verbose:
+            renamed = [f"{old}->{new}" for old, new in sorted(self.block_id.items()) if old != new]
+            print(f"Канонизация: блоков: {len(self.origin)}, "
+                  f"удалено недостижимых: {len(self.removed)}, "
+                  f"переменных: {len(self.variables)}")
+            if renamed:
+                print(f"  Перенумерованы блоки: {', '.join(renamed)}")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    def to_mask(self, values):
+        """Битовая маска множества переменных (прочие значения пропускаются)"""
+        mask = 0
+        for val in values:
+            if isinstance(val, Variable):
+                mask |= 1 << self.var_id[val]
+        return mask
+
+    def from_mask(self, mask):
+        """Переменные битовой маски в порядке номеров"""
+        result = []
+        while mask:
+            low = mask & -mask
+            result.append(self.variables[low.bit_length() - 1])
+            mask ^= low
+        return result
@@ -0,0 +1,404 @@
+"""
+Общие анализы и преобразования графа потока управления.
+
+Функции модуля используются проходами над IR и SSA-формой.
+Программа задается словарем {номер блока: BB}, входной блок имеет номер 0.
+"""
+
+import re
+
+import networkx as nx
+from BB import *
+
+
+# Номер входного блока программы
+ENTRY = 0
+
+
+# ==== ПОСТРОЕНИЕ ГРАФА ====
+
+def block_map(blocks):
+    """Строит словарь {номер блока: блок} для набора блоков"""
+    return dict((bb.block_num, bb) for bb in blocks)
+
+
+def build_preds(blocks_by_num):
+    """
+    Строит списки предшественников для всех блоков.
+
+    Args:
+        blocks_by_num: Словарь {номер блока: BB}
+
+    Returns:
+        dict: {номер блока: список номеров предшественников по возрастанию}
+    """
+    preds = dict((n, []) for n in blocks_by_num)
+    for n in sorted(blocks_by_num):
+        for succ in blocks_by_num[n].get_successors():
+            if succ in preds:
+                preds[succ].append(n)
+    return preds
+
+
+def to_networkx(blocks_by_num):
+    """Строит граф потока управления в виде nx.DiGraph"""
+    graph = nx.DiGraph()
+    for n, bb in blocks_by_num.items():
+        graph.add_node(n)
+        for succ in bb.get_successors():
+            graph.add_edge(n, succ)
+    return graph
+
+
+def reverse_post_order(blocks_by_num, entry=ENTRY):
+    """
+    Вычисляет обратный постпорядок достижимых блоков.
+
+    Обход в глубину выполняется с явным стеком.
+
+    Args:
+        blocks_by_num: Словарь {номер блока: BB}
+        entry: Номер входного блока
+
+    Returns:
+        list: Номера достижимых блоков в обратном постпорядке
+    """
+    order = []
+    visited = {entry}
+    stack = [(entry, iter(blocks_by_num[entry].get_successors()))]
+    while stack:
+        node, succs = stack[-1]
+        for succ in succs:
+            if succ not in visited and succ in blocks_by_num:
+                visited.add(succ)
+                stack.append((succ, iter(blocks_by_num[succ].get_successors())))
+                break
+        else:
+            order.append(node)
+            stack.pop()
+    order.reverse()
+    return order
+
+
+def find_back_edges(blocks_by_num, entry=ENTRY):
+    """
+    Находит обратные рёбра графа потока управления.
+
+    Ребро обратное, если при поиске в глубину оно ведет в узел, который
+    еще находится на стеке обхода. Обход выполняется с явным стеком.
+
+    Returns:
+        set: Множество обратных рёбер (откуда, куда)
+    """
+    back_edges = set()
+    visited = {entry}
+    active = {entry}
+    stack = [(entry, iter(blocks_by_num[entry].get_successors()))]
+    while stack:
+        node, succs = stack[-1]
+        for succ in succs:
+            if succ in active:
+                back_edges.add((node, succ))
+            elif succ not in visited and succ in blocks_by_num:
+                visited.add(succ)
+                active.add(succ)
+                stack.append((succ, iter(blocks_by_num[succ].get_successors())))
+                break
+        else:
+            active.remove(node)
+            stack.pop()
+    return back_edges
+
+
+def immediate_dominators(blocks_by_num, entry=ENTRY):
+    """
+    Вычисляет непосредственные доминаторы достижимых блоков.
+
+    Returns:
+        dict: {номер блока: номер его непосредственного доминатора},
+              для входного блока - он сам
+    """
+    return nx.immediate_dominators(to_networkx(blocks_by_num), entry)
+
+
+def dominator_tree(idom):
+    """
+    Строит дерево доминаторов по непосредственным доминаторам.
+
+    Returns:
+        dict: {номер блока: отсортированный список дочерних узлов}
+    """
+    children = dict((n, []) for n in idom)
+    for n in sorted(idom):
+        if idom[n] != n:
+            children[idom[n]].append(n)
+    return children
+
+
+def dominates(idom, a, b):
+    """Проверяет, доминирует ли блок a над блоком b"""
+    while True:
+        if a == b:
+            return True
+        if idom[b] == b:
+            return False
+        b = idom[b]
+
+
+# ==== ЖИВОСТЬ ====
+
+def phi_operand(instr, pred):
+    """Возвращает операнд phi-функции, приходящий из блока pred"""
+    return instr.args['from'][instr.args['blocks'].index(pred)]
+
+
+def ssa_liveness(blocks_by_num, preds=None):
+    """
+    Вычисляет живость значений программы в SSA-форме.
+
+    Операнд phi-функции считается живым на выходе из соответствующего
+    предшественника, а не на входе в блок с phi-функцией. Результат
+    phi-функции определяется в начале своего блока.
+
+    Args:
+        blocks_by_num: Словарь {номер блока: BB}
+        preds: Списки предшественников (вычисляются, если не заданы)
+
+    Returns:
+        tuple: (live_in, live_out) - словари {номер блока: множество переменных}
+    """
+    if preds is None:
+        preds = build_preds(blocks_by_num)
+
+    upward_exposed = {}
+    defs = {}
+    # Переменные, читаемые phi-функциями блока s по ребру (p, s)
+    phi_uses = {}
+    for n, bb in blocks_by_num.items():
+        exposed = set()
+        defined = set()
+        for instr in bb.instructions:
+            if instr.typ == PHI:
+                for pred, val in zip(instr.args['blocks'], instr.args['from']):
+                    if isinstance(val, Variable):
+                        phi_uses.setdefault((pred, n), set()).add(val)
+            else:
+                for val in instr.get_uses():
+                    if isinstance(val, Variable) and val not in defined:
+                        exposed.add(val)
+            d = instr.get_def()
+            if isinstance(d, Variable):
+                defined.add(d)
+        upward_exposed[n] = exposed
+        defs[n] = defined
+
+    live_in = dict((n, set(upward_exposed[n])) for n in blocks_by_num)
+    live_out = dict((n, set()) for n in blocks_by_num)
+
+    # Обратный анализ с рабочим списком, начинаем с конца программы
+    worklist = sorted(blocks_by_num)
+    in_worklist = set(worklist)
+    while worklist:
+        n = worklist.pop()
+        in_worklist.discard(n)
+        out = set()
+        for succ in blocks_by_num[n].get_successors():
+            if succ not in blocks_by_num:
+                continue
+            out |= live_in[succ]
+            out |= phi_uses.get((n, succ), set())
+        live_out[n] = out
+        new_in = upward_exposed[n] | (out - defs[n])
+        if new_in != live_in[n]:
+            live_in[n] = new_in
+            for pred in preds[n]:
+                if pred not in in_worklist:
+                    in_worklist.add(pred)
+                    worklist.append(pred)
+    return live_in, live_out
+
+
+# ==== ПРЕОБРАЗОВАНИЯ ГРАФА ====
+
+def temp_counters(blocks_by_num):
+    """
+    Находит наибольшие номера существующих временных переменных.
+
+    Имя временной переменной tmp_<блок>_<k> содержит номер блока, в котором
+    она создана; после слияния и удаления блоков такие переменные остаются
+    в других блоках, а номер удаленного блока может быть выдан снова.
+
+    Returns:
+        dict: {номер блока из имени: наибольший номер k}
+    """
+    counters = {}
+    for bb in blocks_by_num.values():
+        for instr in bb.instructions:
+            for val in instr.get_uses() + [instr.get_def()]:
+                match = re.fullmatch(r'tmp_(\d+)_(\d+)', val.name) if isinstance(val, Variable) else None
+                if match:
+                    n, k = int(match.group(1)), int(match.group(2))
+                    counters[n] = max(counters.get(n, -1), k)
+    return counters
+
+
+def new_block(blocks_by_num, template=None):
+    """
+    Создает пустой блок со свободным номером и добавляет его в программу.
+
+    Args:
+        blocks_by_num: Словарь {номер блока: BB}
+        template: Блок, область видимости которого наследует новый блок
+
+    Returns:
+        BB: Новый блок
+    """
+    bb = BB()
+    bb.block_num = max(blocks_by_num) + 1
+    # Номер мог принадлежать удаленному блоку, временные переменные
+    # которого остались в программе
+    bb.varcounter = temp_counters(blocks_by_num).get(bb.block_num, -1) + 1
+    if template is not None:
+        bb.set_map(template)
+    blocks_by_num[bb.block_num] = bb
+    return bb
+
+
+def retarget(bb, old, new):
+    """Перенаправляет переходы блока bb из блока old в блок new"""
+    last = bb.instructions[-1]
+    changes = {}
+    for key in ('dest', 'dest1', 'dest2'):
+        if last.args.get(key) == old and last.typ in (BR, CONDBR):
+            changes[key] = new
+    if changes:
+        bb.instructions[-1] = last.with_args(**changes)
+
+
+def replace_phi_pred(bb, old, new):
+    """Заменяет блок-предшественник old на new во всех phi-функциях блока"""
+    for i, instr in enumerate(bb.instructions):
+        if instr.typ != PHI:
+            break
+        if old in instr.args['blocks']:
+            blocks = [new if b == old else b for b in instr.args['blocks']]
+            bb.instructions[i] = instr.with_args(blocks=blocks)
+
+
+def split_edge(blocks_by_num, pred, succ):
+    """
+    Расщепляет ребро (pred, succ), вставляя на него новый блок.
+
+    Новый блок содержит только безусловный переход в succ; переходы pred
+    и операнды phi-функций succ перенаправляются на новый блок.
+
+    Returns:
+        BB: Вставленный блок
+    """
+    bb = new_block(blocks_by_num, blocks_by_num[pred])
+    bb.add_instr(Instruction(BR, {'dest': succ}))
+    retarget(blocks_by_num[pred], succ, bb.block_num)
+    replace_phi_pred(blocks_by_num[succ], pred, bb.block_num)
+    return bb
+
+
+def forward_empty_block(blocks_by_num, preds, n):
+    """
+    Исключает блок n, состоящий из одного безусловного перехода.
+
+    Переходы предшественников перенаправляются сразу на преемника, операнд
+    phi-функций преемника из блока n повторяется для каждого из них. Блок
+    не исключается, если его предшественник уже ведет в преемник с
+    phi-функциями: значения по двум рёбрам из одного блока не различить.
+
+    Args:
+        blocks_by_num: Словарь {номер блока: BB}
+        preds: Словарь {номер блока: множество предшественников}, обновляется
+        n: Номер блока
+
+    Returns:
+        bool: True, если блок был исключен
+    """
+    bb = blocks_by_num[n]
+    if n == ENTRY or len(bb.instructions) != 1 or bb.instructions[0].typ != BR:
+        return False
+    succ = bb.instructions[0].args['dest']
+    if succ == n or not preds[n]:
+        return False
+    succ_bb = blocks_by_num[succ]
+    has_phi = bool(succ_bb.instructions) and succ_bb.instructions[0].typ == PHI
+    if has_phi and not preds[n].isdisjoint(preds[succ]):
+        return False
+
+    new_preds = sorted(preds[n])
+    for i, instr in enumerate(succ_bb.instructions):
+        if instr.typ != PHI:
+            break
+        blocks, values = [], []
+        for pred, val in zip(instr.args['blocks'], instr.args['from']):
+            if pred == n:
+                blocks.extend(new_preds)
+                values.extend([val] * len(new_preds))
+            else:
+                blocks.append(pred)
+                values.append(val)
+        succ_bb.instructions[i] = instr.with_args(**{'blocks': blocks, 'from': values})
+
+    for pred in new_preds:
+        retarget(blocks_by_num[pred], n, succ)
+        preds[succ].add(pred)
+    preds[succ].discard(n)
+    del blocks_by_num[n]
+    del preds[n]
+    return True
+
+
+def renumber_blocks(blocks_by_num, order):
+    """
+    Перенумеровывает блоки в заданном порядке: i-й блок order получает номер i.
+
+    Блоки, отсутствующие в order, удаляются вместе с операндами phi-функций,
+    приходящими из них. Счетчики временных переменных блоков сдвигаются
+    так, чтобы новые временные переменные не совпали с существующими
+    (их имена содержат номер блока, в котором они созданы).
+
+    Args:
+        blocks_by_num: Словарь {номер блока: BB}, блоки изменяются на месте
+        order: Номера сохраняемых блоков, входной блок - первый
+
+    Returns:
+        tuple: (новый словарь {номер блока: BB}, {старый номер: новый номер})
+    """
+    mapping = dict((old, new) for new, old in enumerate(order))
+    result = {}
+    for old in order:
+        bb = blocks_by_num[old]
+        instrs = []
+        for instr in bb.instructions:
+            if instr.typ == PHI:
+                pairs = [(mapping[b], v) for b, v in zip(instr.args['blocks'], instr.args['from'])
+                         if b in mapping]
+                instr = instr.with_args(**{'blocks': [b for b, _ in pairs],
+                                           'from': [v for _, v in pairs]})
+            elif instr.typ == BR:
+                instr = instr.with_args(dest=mapping[instr.args['dest']])
+            elif instr.typ == CONDBR:
+                instr = instr.with_args(dest1=mapping[instr.args['dest1']],
+                                        dest2=mapping[instr.args['dest2']])
+            instrs.append(instr)
+        bb.instructions = instrs
+        bb.block_num = mapping[old]
+        result[bb.block_num] = bb
+
+    counters = temp_counters(result)
+    for n, bb in result.items():
+        bb.varcounter = max(bb.varcounter, counters.get(n, -1) + 1)
+    return result, mapping
+
+
+def insert_before_terminator(bb, instrs):
+    """Вставляет инструкции в конец блока перед завершающим переходом"""
+    pos = len(bb.instructions)
+    if bb.instructions and bb.instructions[-1].typ in TERMINATORS:
+        pos -= 1
+    bb.instructions[pos:pos] = instrs
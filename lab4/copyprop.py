@@ -0,0 +1,113 @@
+"""
+Распространение копирований над SSA-формой.
+
+Генератор IR записывает каждое значение через временную переменную:
+результат операции сохраняется в tmp, а затем копируется в переменную,
+перед возвратом значение еще раз загружается в tmp. В SSA-форме все такие
+LOAD и STORE - чистые копирования, поэтому их можно удалить, подставив
+источник во все использования.
+"""
+
+from BB import *
+from cfg import *
+
+
+# Инструкции, результат которых можно сразу записать в приемник копирования
+COMPUTE_TYPES = (ADD, SUB, MUL, ICMP)
+
+
+class CopyPropagation:
+    """
+    Проход распространения копирований.
+
+    Копирование d <- tmp, где tmp - результат операции, больше нигде
+    не используемый, сворачивается в саму операцию: она сразу определяет d.
+    Остальные копирования удаляются, а их приемники заменяются источниками.
+    """
+
+    def __init__(self, blocks, verbose=True):
+        """
+        Args:
+            blocks: Базовые блоки программы в SSA-форме (списки инструкций
+                    изменяются на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+
+        # Статистика прохода
+        self.instructions_before = 0    # инструкций до прохода
+        self.instructions_after = 0     # инструкций после прохода
+        self.copies_removed = 0         # удалено копирований
+        self.defs_forwarded = 0         # операций, записанных сразу в приемник
+
+    def run(self):
+        """
+        Выполняет распространение копирований.
+
+        Returns:
+            list: Блоки программы, упорядоченные по номерам
+        """
+        self.collect()
+        self.rewrite()
+
+        if self.verbose:
+            print(f"Копирования: удалено {self.copies_removed}, "
+                  f"свернуто в операции {self.defs_forwarded}, "
+                  f"инструкций {self.instructions_before} -> {self.instructions_after}")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    def is_copy(self, instr):
+        """Проверяет, является ли инструкция копированием"""
+        return instr.typ in (STORE, LOAD)
+
+    def collect(self):
+        """Находит копирования и решает, как устранить каждое из них"""
+        use_count = {}
+        def_instr = {}
+        copies = []
+        for bb in self.blocks.values():
+            self.instructions_before += len(bb.instructions)
+            for instr in bb.instructions:
+                for val in instr.get_uses():
+                    if isinstance(val, Variable):
+                        use_count[val] = use_count.get(val, 0) + 1
+                d = instr.get_def()
+                if isinstance(d, Variable):
+                    def_instr[d] = instr
+                if self.is_copy(instr):
+                    copies.append(instr)
+
+        self.replace = {}       # приемник удаленного копирования -> источник
+        self.forward = {}       # временная переменная -> новый приемник операции
+        for instr in copies:
+            d, src = instr.args['to'], instr.args['from']
+            if (isinstance(src, Variable) and src.is_temp and use_count.get(src) == 1
+                    and src in def_instr and def_instr[src].typ in COMPUTE_TYPES):
+                self.forward[src] = d
+            else:
+                self.replace[d] = src
+
+    def resolve(self, val):
+        """Возвращает значение, которым заменяется операнд"""
+        while isinstance(val, Variable) and val in self.replace:
+            val = self.replace[val]
+        return val
+
+    def rewrite(self):
+        """Удаляет копирования и подставляет источники в использования"""
+        for bb in self.blocks.values():
+            instructions = []
+            for instr in bb.instructions:
+                if self.is_copy(instr):
+                    self.copies_removed += 1
+                    continue
+                instr = instr.map_uses(self.resolve)
+                d = instr.get_def()
+                if d in self.forward:
+                    instr = instr.with_args(to=self.forward[d])
+                    self.defs_forwarded += 1
+                instructions.append(instr)
+            bb.instructions = instructions
+            self.instructions_after += len(instructions)
@@ -0,0 +1,196 @@
+"""
+Агрессивное удаление мертвого кода (ADCE) над SSA-формой.
+
+Все инструкции считаются мертвыми, пока не доказано обратное. Живыми
+изначально объявляются возвраты значений, далее живость распространяется
+по цепочкам использование-определение и по зависимостям по управлению:
+условный переход жив, только если от него зависит живая инструкция.
+Непомеченные инструкции (в том числе циклы из phi-функций) удаляются,
+мертвые условные переходы заменяются переходом на ближайший постдоминатор,
+а опустевшие блоки - исключаются из графа. Цикл, не вычисляющий живых
+значений, удаляется целиком, если из него достижим выход из программы.
+"""
+
+import networkx as nx
+from BB import *
+from cfg import *
+
+
+# Номер фиктивного выходного блока для построения постдоминаторов
+EXIT = -1
+
+
+class Dce:
+    """
+    Проход агрессивного удаления мертвого кода.
+
+    Время работы линейно по размеру программы: каждая инструкция помечается
+    не более одного раза, а граница постдоминирования вычисляется один раз.
+    """
+
+    def __init__(self, blocks, verbose=True):
+        """
+        Args:
+            blocks: Базовые блоки программы в SSA-форме (списки инструкций
+                    изменяются на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+
+        # Статистика прохода
+        self.removed = 0            # удалено инструкций (без переходов)
+        self.branches_removed = 0   # мертвых условных переходов
+        self.blocks_removed = 0     # удалено блоков
+
+    def run(self):
+        """
+        Выполняет пометку живых инструкций и удаление остальных.
+
+        Returns:
+            list: Оставшиеся блоки программы, упорядоченные по номерам
+        """
+        self.build_postdominators()
+        self.mark()
+        self.sweep()
+        self.remove_unreachable()
+        self.remove_empty_blocks()
+
+        if self.verbose:
+            print(f"DCE: удалено инструкций: {self.removed}, "
+                  f"условных переходов: {self.branches_removed}, "
+                  f"блоков: {self.blocks_removed}")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    # ==== ПОСТДОМИНАТОРЫ ====
+
+    def build_postdominators(self):
+        """
+        Строит постдоминаторы и обратную границу доминирования.
+
+        Блоки с возвратом соединяются с фиктивным выходом. Блоки, из которых
+        выход недостижим (бесконечные циклы), в анализ не входят - их
+        переходы считаются живыми.
+        """
+        reverse = nx.DiGraph()
+        reverse.add_node(EXIT)
+        for n, bb in self.blocks.items():
+            reverse.add_node(n)
+            for succ in bb.get_successors():
+                reverse.add_edge(succ, n)
+            if bb.instructions and bb.instructions[-1].typ == RET:
+                reverse.add_edge(EXIT, n)
+
+        self.reaches_exit = nx.descendants(reverse, EXIT)
+        self.ipdom = nx.immediate_dominators(reverse, EXIT)
+        # Обратная граница доминирования блока - переходы, от которых он зависит
+        self.control_deps = nx.dominance_frontiers(reverse, EXIT)
+
+    # ==== ПОМЕТКА ====
+
+    def mark(self):
+        """Помечает живые инструкции"""
+        self.live = set()           # id живых инструкций
+        self.live_blocks = set()    # блоки, содержащие живые инструкции
+        self.defs = {}              # переменная -> (блок, инструкция)
+        for n, bb in self.blocks.items():
+            for instr in bb.instructions:
+                d = instr.get_def()
+                if isinstance(d, Variable):
+                    self.defs[d] = (n, instr)
+
+        self.worklist = []
+        for n, bb in self.blocks.items():
+            for instr in bb.instructions:
+                if instr.typ == RET:
+                    self.mark_instr(n, instr)
+            if n not in self.reaches_exit or any(
+                    succ not in self.reaches_exit for succ in bb.get_successors()):
+                # Удаление перехода могло бы устранить бесконечный цикл
+                self.mark_terminator(n)
+
+        while self.worklist:
+            n, instr = self.worklist.pop()
+
+            # Блок выполняется - живы переходы, от которых он зависит
+            self.mark_block(n)
+
+            if instr.typ == PHI:
+                # Значение выбирается по ребру - живы переходы предшественников
+                for pred in instr.args['blocks']:
+                    self.mark_terminator(pred)
+
+            for val in instr.get_uses():
+                if isinstance(val, Variable) and val in self.defs:
+                    self.mark_instr(*self.defs[val])
+
+    def mark_instr(self, n, instr):
+        """Помечает инструкцию как живую"""
+        if id(instr) not in self.live:
+            self.live.add(id(instr))
+            self.worklist.append((n, instr))
+
+    def mark_block(self, n):
+        """Помечает переходы, от которых зависит выполнение блока n"""
+        if n in self.live_blocks:
+            return
+        self.live_blocks.add(n)
+        for dep in self.control_deps.get(n, ()):
+            if dep != EXIT:
+                self.mark_terminator(dep)
+
+    def mark_terminator(self, n):
+        """Помечает завершающий переход блока n"""
+        instrs = self.blocks[n].instructions
+        if instrs and instrs[-1].typ in TERMINATORS:
+            self.mark_instr(n, instrs[-1])
+
+    # ==== УДАЛЕНИЕ ====
+
+    def sweep(self):
+        """Удаляет непомеченные инструкции и мертвые условные переходы"""
+        for n, bb in self.blocks.items():
+            instructions = []
+            for instr in bb.instructions:
+                if id(instr) in self.live or instr.typ == BR:
+                    instructions.append(instr)
+                elif instr.typ == CONDBR:
+                    if self.ipdom[n] == EXIT:
+                        # Ветви ведут к разным возвратам - переход остается
+                        instructions.append(instr)
+                        continue
+                    # От перехода ничего не зависит - идем сразу на постдоминатор
+                    instructions.append(Instruction(BR, {'dest': self.ipdom[n]}))
+                    self.branches_removed += 1
+                else:
+                    self.removed += 1
+            bb.instructions = instructions
+
+    def remove_unreachable(self):
+        """Удаляет блоки, ставшие недостижимыми, и соответствующие операнды phi-функций"""
+        reachable = set(reverse_post_order(self.blocks))
+        for n in list(self.blocks):
+            if n not in reachable:
+                del self.blocks[n]
+                self.blocks_removed += 1
+
+        preds = build_preds(self.blocks)
+        for n, bb in self.blocks.items():
+            for i, instr in enumerate(bb.instructions):
+                if instr.typ != PHI:
+                    break
+                if len(instr.args['blocks']) != len(preds[n]):
+                    pairs = [(pred, val) for pred, val
+                             in zip(instr.args['blocks'], instr.args['from'])
+                             if pred in preds[n]]
+                    bb.instructions[i] = instr.with_args(**{
+                        'blocks': [pred for pred, _ in pairs],
+                        'from': [val for _, val in pairs]})
+
+    def remove_empty_blocks(self):
+        """Исключает блоки, состоящие из одного безусловного перехода"""
+        preds = dict((n, set(p)) for n, p in build_preds(self.blocks).items())
+        for n in sorted(self.blocks):
+            if forward_empty_block(self.blocks, preds, n):
+                self.blocks_removed += 1
@@ -0,0 +1,211 @@
+"""
+Глобальная нумерация значений (GVN) над SSA-формой.
+
+Дерево доминаторов обходится с областью видимости хеш-таблицы выражений:
+выражение, вычисленное в блоке, доступно во всех блоках, над которыми
+этот блок доминирует. Повторное вычисление удаляется, а его использования
+заменяются результатом первого вычисления.
+"""
+
+from BB import *
+from cfg import *
+
+
+# Операции, результат которых не зависит от порядка операндов
+COMMUTATIVE = (ADD, MUL)
+
+# Сравнения, не зависящие от порядка операндов
+COMMUTATIVE_CMP = ('==', '!=')
+
+# Сравнения, которые сводятся друг к другу перестановкой операндов
+SWAPPED_CMP = {'<': '>', '<=': '>='}
+
+
+class Gvn:
+    """
+    Проход глобальной нумерации значений.
+
+    Номер значения переменной - переменная (или константа), вычисляющая то же
+    значение и доминирующая над ней. Копирования получают номер источника,
+    поэтому выражения над копиями совпадают с выражениями над оригиналами.
+    """
+
+    def __init__(self, blocks, verbose=True):
+        """
+        Args:
+            blocks: Базовые блоки программы в SSA-форме (списки инструкций
+                    изменяются на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+
+        # Статистика прохода
+        self.removed = 0        # удалено избыточных вычислений
+        self.phis_removed = 0   # удалено phi-функций
+
+    def run(self):
+        """
+        Выполняет нумерацию значений и удаление избыточных вычислений.
+
+        Returns:
+            list: Блоки программы, упорядоченные по номерам
+        """
+        idom = immediate_dominators(self.blocks)
+        children = dominator_tree(idom)
+
+        # Номера значений переменных и замены для удаленных определений
+        self.number = {}
+        self.replace = {}
+        table = {}
+
+        # Обход дерева доминаторов с явным стеком: (признак выхода, блок, добавленные ключи)
+        stack = [(False, ENTRY, None)]
+        while stack:
+            leaving, n, added = stack.pop()
+            if leaving:
+                # Выражения блока перестают быть доступными
+                for key in added:
+                    del table[key]
+                continue
+
+            added = self.number_block(n, table)
+            stack.append((True, n, added))
+            for child in reversed(children[n]):
+                stack.append((False, child, None))
+
+        # Операнды phi-функций могли ссылаться на удаленные определения
+        # из еще не обработанных блоков - заменяем все использования в конце
+        if self.replace:
+            for bb in self.blocks.values():
+                bb.instructions = [instr.map_uses(self.resolve) for instr in bb.instructions]
+
+        if self.verbose:
+            print(f"GVN: удалено вычислений: {self.removed}, "
+                  f"phi-функций: {self.phis_removed}")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    def number_block(self, n, table):
+        """
+        Нумерует значения блока и удаляет избыточные инструкции.
+
+        Returns:
+            list: Ключи выражений, добавленные блоком в таблицу
+        """
+        bb = self.blocks[n]
+        added = []
+        instructions = []
+        for instr in bb.instructions:
+            instr = instr.map_uses(self.resolve)
+            d = instr.get_def()
+            if not isinstance(d, Variable):
+                instructions.append(instr)
+                continue
+
+            if instr.typ in (STORE, LOAD):
+                # Копирование: значение совпадает со значением источника
+                self.number[d] = self.value_of(instr.args['from'])
+                instructions.append(instr)
+                continue
+
+            if instr.typ == PHI:
+                same = self.phi_same_value(instr)
+                if same is not None:
+                    self.replace[d] = same
+                    self.number[d] = self.value_of(same)
+                    self.phis_removed += 1
+                    continue
+                key = (PHI, n, tuple(instr.args['blocks']),
+                       tuple(self.operand_key(val) for val in instr.args['from']))
+            else:
+                key = self.expression_key(instr)
+
+            leader = table.get(key)
+            if leader is not None:
+                # Значение уже вычислено в доминирующей точке
+                self.replace[d] = leader
+                self.number[d] = self.value_of(leader)
+                if instr.typ == PHI:
+                    self.phis_removed += 1
+                else:
+                    self.removed += 1
+                continue
+
+            table[key] = d
+            added.append(key)
+            instructions.append(instr)
+        bb.instructions = instructions
+        return added
+
+    # ==== НОМЕРА ЗНАЧЕНИЙ ====
+
+    def resolve(self, val):
+        """Заменяет использование удаленного определения его заменой"""
+        while isinstance(val, Variable) and val in self.replace:
+            val = self.replace[val]
+        return val
+
+    def value_of(self, val):
+        """Возвращает номер значения операнда"""
+        val = self.resolve(val)
+        if isinstance(val, Variable):
+            return self.number.get(val, val)
+        return val
+
+    def operand_key(self, val):
+        """Возвращает хешируемый ключ номера значения операнда"""
+        val = self.value_of(val)
+        if isinstance(val, Variable):
+            return (val.name, val.version)
+        return ('const', const_value(val))
+
+    def expression_key(self, instr):
+        """
+        Строит ключ выражения по номерам значений операндов.
+
+        Операнды коммутативных операций упорядочиваются, а сравнения
+        '<' и '<=' приводятся к '>' и '>=' перестановкой операндов.
+        """
+        if instr.typ == ICMP:
+            op = instr.args.get('op', '>')
+            a = self.operand_key(instr.args['arg1'])
+            b = self.operand_key(instr.args['arg2'])
+            if op in SWAPPED_CMP:
+                op, a, b = SWAPPED_CMP[op], b, a
+            elif op in COMMUTATIVE_CMP and repr(b) < repr(a):
+                a, b = b, a
+            return (ICMP, op, a, b)
+
+        a = self.operand_key(instr.args['oper1'])
+        b = self.operand_key(instr.args['oper2'])
+        if instr.typ in COMMUTATIVE and repr(b) < repr(a):
+            a, b = b, a
+        return (instr.typ, a, b)
+
+    def phi_same_value(self, instr):
+        """
+        Возвращает операнд, если все входы phi-функции дают одно значение.
+
+        Операнды, совпадающие с результатом самой phi-функции (значение,
+        переданное по циклу без изменений), не учитываются. Остальные
+        операнды сравниваются как переменные, а не по номерам значений:
+        определение, доступное на всех входящих рёбрах, доминирует над
+        блоком, а разные копии одного значения могут и не доминировать.
+
+        Returns:
+            Операнд-замена или None
+        """
+        own = self.operand_key(instr.args['to'])
+        result = None
+        result_key = None
+        for val in instr.args['from']:
+            if self.operand_key(val) == own:
+                continue
+            val = self.resolve(val)
+            key = (val.name, val.version) if isinstance(val, Variable) else const_value(val)
+            if result_key is None:
+                result, result_key = val, key
+            elif key != result_key:
+                return None
+        return result
@@ -0,0 +1,370 @@
+"""
+Индукционные переменные циклов и понижение силы операций.
+
+Базовая индукционная переменная - phi-функция заголовка цикла вида
+i = phi(init, i + s), где шаг s - целая константа. Производная
+индукционная переменная - значение вида a * i + b, вычисленное в цикле
+из базовой переменной сложениями, вычитаниями и умножениями на константы.
+
+Понижение силы заменяет умножения, вычисляющие производные переменные,
+новой phi-функцией, которая на каждой итерации увеличивается на a * s.
+Замена условия выхода (LFTR) переводит сравнение с базовой переменной
+на такую phi-функцию, после чего базовая переменная удаляется, если
+больше нигде не используется.
+"""
+
+from BB import *
+from cfg import *
+from loops import find_loops, ensure_preheader
+
+
+# Сравнения, меняющиеся местами при умножении обеих частей на отрицательное число
+NEGATED_CMP = {'>': '<', '<': '>', '>=': '<=', '<=': '>=', '==': '==', '!=': '!='}
+
+
+class InductionVariable:
+    """
+    Индукционная переменная вида factor * base + offset.
+
+    Для базовой переменной base - она сама, factor = 1, offset = 0,
+    а также известны начальное значение, шаг и значение на следующей итерации.
+    """
+
+    def __init__(self, base, factor=1, offset=0):
+        self.base = base
+        self.factor = factor
+        self.offset = offset
+        # Только для базовых переменных
+        self.init = None
+        self.step = None
+        self.update = None
+
+    def __repr__(self):
+        return f'IV({self.factor} * {self.base} + {self.offset})'
+
+    @property
+    def is_basic(self):
+        return self.step is not None
+
+    def scaled(self, factor, offset=0):
+        """Возвращает переменную (factor * self + offset) с той же базой"""
+        return InductionVariable(self.base, self.factor * factor,
+                                 self.offset * factor + offset)
+
+
+def find_induction_variables(blocks_by_num, loop, order=None):
+    """
+    Находит базовые и производные индукционные переменные цикла.
+
+    Args:
+        blocks_by_num: Словарь {номер блока: BB} программы в SSA-форме
+        loop: Цикл (loops.Loop) с единственным латчем
+        order: Обратный постпорядок блоков (вычисляется, если не задан)
+
+    Returns:
+        dict: {переменная: InductionVariable}
+    """
+    if len(loop.latches) != 1:
+        return {}
+    latch = loop.latches[0]
+    if order is None:
+        order = reverse_post_order(blocks_by_num)
+
+    defs = {}
+    for n in loop.blocks:
+        for instr in blocks_by_num[n].instructions:
+            d = instr.get_def()
+            if isinstance(d, Variable):
+                defs[d] = instr
+
+    # Базовые переменные: i = phi(init, i + s)
+    ivs = {}
+    for instr in blocks_by_num[loop.header].instructions:
+        if instr.typ != PHI:
+            break
+        phi = instr.args['to']
+        update = phi_operand(instr, latch)
+        if not isinstance(update, Variable):
+            continue
+        step = increment_of(defs.get(update), phi)
+        if step is None:
+            continue
+        iv = InductionVariable(phi)
+        iv.step = step
+        iv.update = update
+        iv.init = [v for p, v in zip(instr.args['blocks'], instr.args['from'])
+                   if p not in loop.blocks]
+        ivs[phi] = iv
+
+    # Производные переменные в порядке доминирования определений
+    for n in order:
+        if n not in loop.blocks:
+            continue
+        for instr in blocks_by_num[n].instructions:
+            d = instr.get_def()
+            if instr.typ == PHI or d in ivs:
+                continue
+            iv = derive(instr, ivs)
+            if iv is not None:
+                ivs[d] = iv
+    return ivs
+
+
+def increment_of(instr, phi):
+    """Возвращает шаг, если instr вычисляет phi + const или phi - const"""
+    if instr is None:
+        return None
+    if instr.typ == ADD:
+        a, b = instr.args['oper1'], instr.args['oper2']
+        if a == phi and const_value(b) is not None:
+            return const_value(b)
+        if b == phi and const_value(a) is not None:
+            return const_value(a)
+    if instr.typ == SUB and instr.args['oper1'] == phi:
+        c = const_value(instr.args['oper2'])
+        if c is not None:
+            return -c
+    return None
+
+
+def derive(instr, ivs):
+    """Возвращает индукционную переменную, вычисляемую инструкцией, или None"""
+    if instr.typ in (STORE, LOAD):
+        src = instr.args['from']
+        return ivs.get(src) if isinstance(src, Variable) else None
+    if instr.typ not in ARITH_OPS:
+        return None
+
+    a, b = instr.args['oper1'], instr.args['oper2']
+    iv_a = ivs.get(a) if isinstance(a, Variable) else None
+    iv_b = ivs.get(b) if isinstance(b, Variable) else None
+    ca, cb = const_value(a), const_value(b)
+
+    if instr.typ == ADD:
+        if iv_a and cb is not None:
+            return iv_a.scaled(1, cb)
+        if iv_b and ca is not None:
+            return iv_b.scaled(1, ca)
+    elif instr.typ == SUB:
+        if iv_a and cb is not None:
+            return iv_a.scaled(1, -cb)
+        if iv_b and ca is not None:
+            return iv_b.scaled(-1, ca)
+    elif instr.typ == MUL:
+        if iv_a and cb is not None:
+            return iv_a.scaled(cb)
+        if iv_b and ca is not None:
+            return iv_b.scaled(ca)
+    return None
+
+
+class StrengthReduction:
+    """
+    Понижение силы умножений на индукционных переменных и замена условия выхода.
+
+    Обрабатываются циклы с единственным латчем; при необходимости
+    создаются предзаголовки.
+    """
+
+    def __init__(self, blocks, verbose=True):
+        """
+        Args:
+            blocks: Базовые блоки программы в SSA-форме (списки инструкций
+                    изменяются на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+
+        # Статистика прохода
+        self.reduced = 0            # заменено умножений
+        self.new_ivs = 0            # создано индукционных переменных
+        self.tests_replaced = 0     # заменено условий выхода
+        self.ivs_removed = 0        # удалено базовых переменных
+
+    def run(self):
+        """
+        Выполняет понижение силы во всех циклах.
+
+        Returns:
+            list: Блоки программы, упорядоченные по номерам
+        """
+        for loop in find_loops(self.blocks):
+            ensure_preheader(self.blocks, loop)
+
+        for loop in find_loops(self.blocks):
+            pre = loop.preheader(self.blocks, build_preds(self.blocks))
+            if pre is not None and len(loop.latches) == 1:
+                self.reduce_loop(loop, pre)
+
+        if self.verbose:
+            print(f"Понижение силы: заменено умножений: {self.reduced}, "
+                  f"новых переменных: {self.new_ivs}, "
+                  f"заменено условий выхода: {self.tests_replaced}, "
+                  f"удалено переменных: {self.ivs_removed}")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    def reduce_loop(self, loop, pre):
+        """Выполняет понижение силы и замену условия выхода в одном цикле"""
+        ivs = find_induction_variables(self.blocks, loop)
+        header = self.blocks[loop.header]
+        latch = self.blocks[loop.latches[0]]
+
+        # Новые phi-функции по ключу (база, множитель, смещение)
+        reduced = {}
+        replace = {}
+        for n in loop.blocks:
+            bb = self.blocks[n]
+            instructions = []
+            for instr in bb.instructions:
+                d = instr.get_def()
+                iv = ivs.get(d)
+                if (instr.typ != MUL or iv is None or iv.factor == 0
+                        or len(ivs[iv.base].init) != 1):
+                    instructions.append(instr)
+                    continue
+                key = (iv.base, iv.factor, iv.offset)
+                if key not in reduced:
+                    reduced[key] = (header.create_tmp_var(), latch.create_tmp_var())
+                replace[d] = reduced[key][0]
+                self.reduced += 1
+            bb.instructions = instructions
+
+        if not replace:
+            return
+
+        # Новые phi-функции в заголовке и их приращения в конце латча
+        for (base, factor, offset), (var, update) in reduced.items():
+            basic = ivs[base]
+            start = self.emit_linear(basic.init[0], factor, offset, pre)
+            header.instructions.insert(0, Instruction(PHI, {
+                'to': var, 'from': [start, update], 'blocks': [pre, latch.block_num]}))
+            insert_before_terminator(latch, [Instruction(ADD, {
+                'oper1': var, 'oper2': IntConst(factor * basic.step), 'to': update})])
+            self.new_ivs += 1
+
+        self.substitute(replace)
+        self.remove_dead_derived(loop, ivs)
+
+        for (base, factor, offset), (var, _) in reduced.items():
+            self.replace_test(loop, ivs[base], factor, offset, var, pre)
+
+    def emit_linear(self, value, factor, offset, pre):
+        """
+        Вычисляет factor * value + offset в конце предзаголовка.
+
+        Returns:
+            Константа или переменная с результатом
+        """
+        c = const_value(value)
+        if c is not None:
+            return IntConst(c * factor + offset)
+        pre_bb = self.blocks[pre]
+        instrs = []
+        if factor != 1:
+            tmp = pre_bb.create_tmp_var()
+            instrs.append(Instruction(MUL, {'oper1': value, 'oper2': IntConst(factor), 'to': tmp}))
+            value = tmp
+        if offset != 0:
+            tmp = pre_bb.create_tmp_var()
+            instrs.append(Instruction(ADD, {'oper1': value, 'oper2': IntConst(offset), 'to': tmp}))
+            value = tmp
+        insert_before_terminator(pre_bb, instrs)
+        return value
+
+    def substitute(self, replace):
+        """Заменяет использования удаленных умножений новыми переменными"""
+        def resolve(val):
+            return replace.get(val, val) if isinstance(val, Variable) else val
+        for bb in self.blocks.values():
+            bb.instructions = [instr.map_uses(resolve) for instr in bb.instructions]
+
+    def remove_dead_derived(self, loop, ivs):
+        """Удаляет производные переменные цикла, оставшиеся без использований"""
+        used = {}
+        for bb in self.blocks.values():
+            for instr in bb.instructions:
+                for val in instr.get_uses():
+                    if isinstance(val, Variable):
+                        used[val] = used.get(val, 0) + 1
+
+        changed = True
+        while changed:
+            changed = False
+            for n in loop.blocks:
+                bb = self.blocks[n]
+                instructions = []
+                for instr in bb.instructions:
+                    d = instr.get_def()
+                    iv = ivs.get(d)
+                    if (iv is not None and not iv.is_basic and instr.typ != PHI
+                            and used.get(d, 0) == 0):
+                        for val in instr.get_uses():
+                            if isinstance(val, Variable):
+                                used[val] -= 1
+                        changed = True
+                        continue
+                    instructions.append(instr)
+                bb.instructions = instructions
+
+    # ==== ЗАМЕНА УСЛОВИЯ ВЫХОДА ====
+
+    def uses_of(self, var):
+        """Возвращает список пар (блок, инструкция), использующих var"""
+        return [(n, instr) for n, bb in self.blocks.items() for instr in bb.instructions
+                if var in [v for v in instr.get_uses() if isinstance(v, Variable)]]
+
+    def replace_test(self, loop, basic, factor, offset, var, pre):
+        """
+        Переводит условие выхода с базовой переменной на var = factor * base + offset.
+
+        Замена выполняется, если базовая переменная используется только
+        в своем приращении и одном сравнении с инвариантом цикла; после
+        замены базовая переменная удаляется.
+        """
+        if factor == 0 or basic.init is None:
+            return
+        base, update = basic.base, basic.update
+        uses = [u for u in self.uses_of(base) if u[1].get_def() != update]
+        update_uses = self.uses_of(update)
+        if len(uses) != 1 or any(instr.typ != PHI or instr.args['to'] != base
+                                 for _, instr in update_uses):
+            return
+        n, cmp = uses[0]
+        if cmp.typ != ICMP or n not in loop.blocks:
+            return
+
+        defined_inside = set()
+        for m in loop.blocks:
+            for instr in self.blocks[m].instructions:
+                if isinstance(instr.get_def(), Variable):
+                    defined_inside.add(instr.get_def())
+
+        if cmp.args['arg1'] == base:
+            key_iv, key_other = 'arg1', 'arg2'
+        else:
+            key_iv, key_other = 'arg2', 'arg1'
+        other = cmp.args[key_other]
+        if cmp.args[key_iv] != base or (isinstance(other, Variable) and other in defined_inside):
+            return
+
+        limit = self.emit_linear(other, factor, offset, pre)
+        op = cmp.args.get('op', '>')
+        if factor < 0:
+            op = NEGATED_CMP[op]
+        new_cmp = cmp.with_args(**{key_iv: var, key_other: limit, 'op': op})
+        self.replace_instr(n, cmp, new_cmp)
+        self.tests_replaced += 1
+
+        # Базовая переменная больше не нужна
+        for m in loop.blocks:
+            bb = self.blocks[m]
+            bb.instructions = [instr for instr in bb.instructions
+                               if instr.get_def() not in (base, update)]
+        self.ivs_removed += 1
+
+    def replace_instr(self, n, old, new):
+        """Заменяет инструкцию old блока n на new"""
+        instrs = self.blocks[n].instructions
+        instrs[next(i for i, instr in enumerate(instrs) if instr is old)] = new
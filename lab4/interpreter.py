@@ -0,0 +1,245 @@
+"""
+Интерпретатор программ lab4 (исходного IR и SSA-формы).
+
+Перед выполнением каждый блок компилируется в список замыканий Python:
+операнды заменяются номерами ячеек массива регистров (константы
+занимают свои ячейки, заполненные заранее), поэтому на шаге выполнения
+нет разбора типа инструкции. Phi-функции блока вычисляются по входящему
+ребру как параллельное копирование, заранее построенное для каждого
+предшественника.
+
+Интерпретатор подсчитывает выполненные инструкции (всего и по типам),
+посещения блоков и переходы по рёбрам; последние можно передать как
+профиль в BlockLayout.
+"""
+
+from BB import *
+from cfg import *
+
+
+# Признак возврата из программы, который возвращает завершающее замыкание
+RETURN = -1
+
+
+def compile_arith(typ, d, a, b):
+    """Замыкание арифметической инструкции над ячейками регистров"""
+    if typ == ADD:
+        def run(regs):
+            regs[d] = regs[a] + regs[b]
+    elif typ == SUB:
+        def run(regs):
+            regs[d] = regs[a] - regs[b]
+    else:
+        def run(regs):
+            regs[d] = regs[a] * regs[b]
+    return run
+
+
+def compile_icmp(op, d, a, b):
+    """Замыкание сравнения (результат - 1 или 0)"""
+    cmp = ICMP_OPS[op]
+
+    def run(regs):
+        regs[d] = 1 if cmp(regs[a], regs[b]) else 0
+    return run
+
+
+def compile_copy(d, s):
+    """Замыкание копирования (LOAD или STORE)"""
+    def run(regs):
+        regs[d] = regs[s]
+    return run
+
+
+def compile_moves(dests, sources):
+    """Замыкание параллельного копирования phi-функций по одному ребру"""
+    if len(dests) == 1:
+        return compile_copy(dests[0], sources[0])
+
+    def run(regs):
+        values = [regs[s] for s in sources]
+        for d, val in zip(dests, values):
+            regs[d] = val
+    return run
+
+
+class CompiledBlock:
+    """Блок, скомпилированный в замыкания"""
+
+    def __init__(self, types, moves, ops, term):
+        # Число выполняемых инструкций блока каждого типа (ALLOCA не выполняется)
+        self.types = types
+        self.size = sum(types.values())
+        # Копирования phi-функций: {индекс предшественника: замыкание}
+        self.moves = moves
+        # Замыкания инструкций без phi-функций и перехода
+        self.ops = ops
+        # Замыкание перехода: возвращает индекс следующего блока или RETURN
+        self.term = term
+
+
+class Interpreter:
+    """
+    Интерпретатор программы.
+
+    Программа компилируется один раз при создании интерпретатора и может
+    выполняться многократно с разными аргументами. Переменные, как и при
+    построении SSA, изначально равны 0. Аргументы задают начальные
+    значения переменных исходного IR по имени; в SSA-форме чтение
+    неприсвоенной переменной уже заменено константой 0, и аргументы на
+    результат не влияют.
+    """
+
+    def __init__(self, blocks, verbose=True, limit=10 ** 7):
+        """
+        Args:
+            blocks: Базовые блоки программы (не изменяются)
+            verbose: Флаг, управляющий выводом отладочной информации
+            limit: Наибольшее число выполняемых инструкций
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+        self.limit = limit
+
+        # Статистика последнего запуска
+        self.executed = 0       # выполнено инструкций
+        self.by_type = {}       # тип инструкции -> выполнено инструкций
+        self.visits = {}        # номер блока -> число выполнений
+        self.edges = {}         # (номер блока, номер преемника) -> число переходов
+
+        self.compile()
+
+    # ==== КОМПИЛЯЦИЯ ====
+
+    def slot(self, val):
+        """Номер ячейки регистров для переменной или константы"""
+        if isinstance(val, Variable):
+            if val not in self.slots:
+                self.slots[val] = len(self.initial)
+                self.initial.append(0)
+            return self.slots[val]
+        value = const_value(val)
+        if value not in self.constants:
+            self.constants[value] = len(self.initial)
+            self.initial.append(value)
+        return self.constants[value]
+
+    def compile(self):
+        """Компилирует блоки программы в замыкания"""
+        self.slots = {}         # переменная -> номер ячейки
+        self.constants = {}     # значение константы -> номер ячейки
+        self.initial = [None]   # начальное содержимое ячеек; ячейка 0 - результат
+        self.nums = sorted(self.blocks)
+        self.index = dict((n, i) for i, n in enumerate(self.nums))
+        self.code = [self.compile_block(self.blocks[n]) for n in self.nums]
+
+    def compile_block(self, bb):
+        """Компилирует блок; инструкции после перехода не выполняются"""
+        edges = {}
+        ops = []
+        term = None
+        types = {}
+        for instr in bb.instructions:
+            typ = instr.typ
+            if typ != ALLOCA:
+                types[typ] = types.get(typ, 0) + 1
+            if typ == PHI:
+                for pred, val in zip(instr.args['blocks'], instr.args['from']):
+                    if pred in self.index:
+                        dests, sources = edges.setdefault(self.index[pred], ([], []))
+                        dests.append(self.slot(instr.args['to']))
+                        sources.append(self.slot(val))
+            elif typ in (ADD, SUB, MUL):
+                ops.append(compile_arith(typ, self.slot(instr.args['to']),
+                                         self.slot(instr.args['oper1']),
+                                         self.slot(instr.args['oper2'])))
+            elif typ == ICMP:
+                ops.append(compile_icmp(instr.args.get('op', '>'), self.slot(instr.args['to']),
+                                        self.slot(instr.args['arg1']),
+                                        self.slot(instr.args['arg2'])))
+            elif typ in (LOAD, STORE):
+                ops.append(compile_copy(self.slot(instr.args['to']), self.slot(instr.args['from'])))
+            elif typ in TERMINATORS:
+                term = self.compile_terminator(instr)
+                break
+        if term is None:
+            raise ValueError(f"Блок без завершающего перехода: BLOCK {bb.block_num}")
+        moves = dict((pred, compile_moves(dests, sources))
+                     for pred, (dests, sources) in edges.items())
+        return CompiledBlock(types, moves, ops, term)
+
+    def compile_terminator(self, instr):
+        """Замыкание перехода или возврата"""
+        if instr.typ == BR:
+            dest = self.index[instr.args['dest']]
+            return lambda regs: dest
+        if instr.typ == CONDBR:
+            cond = self.slot(instr.args['cond'])
+            dest1 = self.index[instr.args['dest1']]
+            dest2 = self.index[instr.args['dest2']]
+            return lambda regs: dest1 if regs[cond] else dest2
+        value = self.slot(instr.args['value'])
+
+        def ret(regs):
+            regs[0] = regs[value]
+            return RETURN
+        return ret
+
+    # ==== ВЫПОЛНЕНИЕ ====
+
+    def run(self, arguments=None):
+        """
+        Выполняет программу.
+
+        Args:
+            arguments: Начальные значения переменных исходного IR ({имя: значение})
+
+        Returns:
+            int: Возвращаемое значение программы
+        """
+        regs = list(self.initial)
+        if arguments:
+            for var, s in self.slots.items():
+                if var.name in arguments:
+                    regs[s] = arguments[var.name]
+
+        code = self.code
+        visits = [0] * len(code)
+        edges = {}
+        limit = self.limit
+        steps = 0
+        prev = None
+        cur = self.index[ENTRY]
+        while True:
+            block = code[cur]
+            visits[cur] += 1
+            steps += block.size
+            if steps > limit:
+                raise RuntimeError(f"Превышено число выполняемых инструкций: {limit}")
+            if prev in block.moves:
+                block.moves[prev](regs)
+            for op in block.ops:
+                op(regs)
+            nxt = block.term(regs)
+            if nxt == RETURN:
+                break
+            edge = (cur, nxt)
+            edges[edge] = edges.get(edge, 0) + 1
+            prev, cur = cur, nxt
+
+        self.collect(visits, edges)
+        if self.verbose:
+            print(f"Выполнено инструкций: {self.executed}, "
+                  f"блоков: {sum(self.visits.values())}, результат: {regs[0]}")
+            print("  " + ", ".join(f"{typ}: {count}" for typ, count in sorted(self.by_type.items())))
+        return regs[0]
+
+    def collect(self, visits, edges):
+        """Переводит счетчики запуска в номера блоков и счетчики по типам"""
+        self.visits = dict((self.nums[i], count) for i, count in enumerate(visits) if count)
+        self.edges = dict(((self.nums[a], self.nums[b]), count) for (a, b), count in edges.items())
+        self.by_type = {}
+        for i, count in enumerate(visits):
+            for typ, k in self.code[i].types.items():
+                self.by_type[typ] = self.by_type.get(typ, 0) + k * count
+        self.executed = sum(self.by_type.values())
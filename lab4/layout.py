@@ -0,0 +1,168 @@
+"""
+Размещение базовых блоков (построение цепочек по Pettis и Hansen).
+
+Блоки размещаются так, чтобы за блоком следовал его наиболее вероятный
+преемник: переход в следующий блок не выполняется (блок "проваливается"
+в него), остальные переходы передают управление. Рёбра графа
+просматриваются по убыванию веса; ребро (a, b) сливает цепочку,
+кончающуюся блоком a, с цепочкой, начинающейся блоком b. Затем цепочки
+размещаются одна за другой, начиная с цепочки входного блока: следующей
+выбирается цепочка, сильнее всего связанная с уже размещенными.
+
+Вес ребра - число переходов по нему при профилирующем запуске или
+статическая оценка: частота блока 10 в степени глубины вложенности
+циклов, переход внутри цикла вероятнее выхода из него.
+
+Результат размещения закрепляется перенумерацией блоков в порядке
+размещения: граф и генерируемый код следуют порядку номеров блоков.
+Проход работает как с исходным IR, так и с SSA-формой.
+"""
+
+from BB import *
+from cfg import *
+from loops import find_loops, loop_depths
+
+
+# Вероятность выхода из цикла по условному переходу (статическая оценка)
+EXIT_PROBABILITY = 0.1
+
+
+class BlockLayout:
+    """
+    Проход размещения базовых блоков.
+
+    Число переходов с передачей управления (взвешенное по рёбрам)
+    подсчитывается для исходного порядка номеров и для нового размещения.
+    """
+
+    def __init__(self, blocks, verbose=True, profile=None):
+        """
+        Args:
+            blocks: Базовые блоки программы (номера блоков и списки
+                    инструкций изменяются на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+            profile: Число переходов по рёбрам при профилирующем запуске
+                     ({(номер блока, номер преемника): число}); если не
+                     задано, используется статическая оценка
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+        self.profile = profile
+
+        # Результат и статистика прохода
+        self.order = []         # исходные номера блоков в порядке размещения
+        self.chains = 0         # количество цепочек
+        self.taken_before = 0   # переходов с передачей управления до размещения
+        self.taken_after = 0    # и после него
+
+    @property
+    def saved(self):
+        """Число сэкономленных переходов с передачей управления"""
+        return self.taken_before - self.taken_after
+
+    def run(self):
+        """
+        Размещает блоки и перенумеровывает их в порядке размещения.
+
+        Returns:
+            list: Блоки программы, упорядоченные по новым номерам
+        """
+        self.weights = self.edge_weights()
+        chains = self.build_chains()
+        self.chains = len(chains)
+        self.order = self.place_chains(chains)
+
+        self.taken_before = self.taken_branches(sorted(self.blocks))
+        self.taken_after = self.taken_branches(self.order)
+        self.blocks, _ = renumber_blocks(self.blocks, self.order)
+
+        if self.verbose:
+            source = "профиль" if self.profile is not None else "статическая оценка"
+            print(f"Размещение блоков ({source}): цепочек: {self.chains}, "
+                  f"порядок: {' '.join(map(str, self.order))}")
+            print(f"Переходов с передачей управления: {self.taken_before:g} -> "
+                  f"{self.taken_after:g} (сэкономлено {self.saved:g})")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    # ==== ВЕСА РЁБЕР ====
+
+    def edge_weights(self):
+        """Возвращает веса рёбер графа ({(блок, преемник): вес})"""
+        edges = [(n, s) for n in sorted(self.blocks)
+                 for s in self.blocks[n].get_successors() if s in self.blocks]
+        if self.profile is not None:
+            return dict((edge, self.profile.get(edge, 0)) for edge in edges)
+
+        loops = find_loops(self.blocks)
+        depth = loop_depths(loops)
+        # Внутренний цикл, содержащий блок (циклы упорядочены от внутренних)
+        innermost = {}
+        for loop in loops:
+            for n in loop.blocks:
+                innermost.setdefault(n, loop)
+
+        weights = {}
+        for n in sorted(self.blocks):
+            succs = [s for s in self.blocks[n].get_successors() if s in self.blocks]
+            freq = 10 ** depth.get(n, 0)
+            loop = innermost.get(n)
+            exits = [s for s in succs if loop is not None and s not in loop.blocks]
+            for s in succs:
+                if len(succs) == 2 and len(exits) == 1:
+                    prob = EXIT_PROBABILITY if s in exits else 1 - EXIT_PROBABILITY
+                else:
+                    prob = 1 / len(succs)
+                weights[(n, s)] = freq * prob
+        return weights
+
+    # ==== ЦЕПОЧКИ ====
+
+    def build_chains(self):
+        """
+        Сливает блоки в цепочки по рёбрам в порядке убывания веса.
+
+        Returns:
+            list: Цепочки (списки номеров блоков), первая - с входным блоком
+        """
+        chain = dict((n, [n]) for n in self.blocks)
+        for (a, b), _ in sorted(self.weights.items(), key=lambda item: (-item[1], item[0])):
+            if b == ENTRY or chain[a] is chain[b]:
+                continue
+            if chain[a][-1] != a or chain[b][0] != b:
+                continue
+            merged = chain[a] + chain[b]
+            for n in merged:
+                chain[n] = merged
+
+        chains = []
+        for n in sorted(self.blocks):
+            if chain[n][0] == n:
+                chains.append(chain[n])
+        return chains
+
+    def place_chains(self, chains):
+        """
+        Размещает цепочки, начиная с цепочки входного блока.
+
+        Returns:
+            list: Номера блоков в порядке размещения
+        """
+        order = []
+        placed = set()
+        rest = list(chains)
+        while rest:
+            def connection(chain):
+                members = set(chain)
+                return sum(w for (a, b), w in self.weights.items()
+                           if (a in placed and b in members) or (b in placed and a in members))
+            best = rest[0] if not order else max(rest, key=lambda chain: (connection(chain), -chain[0]))
+            rest.remove(best)
+            order.extend(best)
+            placed.update(best)
+        return order
+
+    def taken_branches(self, order):
+        """Суммарный вес рёбер, ведущих не в следующий по порядку блок"""
+        following = dict(zip(order, order[1:]))
+        return sum(w for (a, b), w in self.weights.items() if following.get(a) != b)
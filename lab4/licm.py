@@ -0,0 +1,107 @@
+"""
+Вынос инвариантного кода из циклов (LICM) над SSA-формой.
+
+Инструкция инвариантна, если все ее операнды - константы или значения,
+определенные вне цикла (в том числе уже вынесенными инструкциями).
+Инструкции IR не имеют побочных эффектов и не прерывают выполнение,
+поэтому инвариантную инструкцию можно перенести в предзаголовок, даже
+если в цикле она выполняется не на каждой итерации.
+"""
+
+from BB import *
+from cfg import *
+from loops import find_loops, ensure_preheader
+
+
+# Инструкции, которые можно выносить из цикла
+HOISTABLE = (STORE, LOAD, ADD, SUB, MUL, ICMP)
+
+
+class Licm:
+    """
+    Проход выноса инвариантного кода.
+
+    Циклы обрабатываются от внутренних к внешним, поэтому инструкция,
+    вынесенная в предзаголовок внутреннего цикла, может затем покинуть
+    и объемлющий цикл.
+    """
+
+    def __init__(self, blocks, verbose=True):
+        """
+        Args:
+            blocks: Базовые блоки программы в SSA-форме (списки инструкций
+                    изменяются на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+
+        # Статистика прохода
+        self.preheaders_created = 0     # создано предзаголовков
+        self.hoisted = {}               # заголовок цикла -> вынесено инструкций
+
+    def run(self):
+        """
+        Выполняет вынос инвариантного кода.
+
+        Returns:
+            list: Блоки программы, упорядоченные по номерам
+        """
+        # Сначала создаем предзаголовки, затем заново находим циклы:
+        # предзаголовок внутреннего цикла входит в тело внешнего
+        for loop in find_loops(self.blocks):
+            _, created = ensure_preheader(self.blocks, loop)
+            self.preheaders_created += created
+
+        loops = find_loops(self.blocks)
+        preds = build_preds(self.blocks)
+        order = reverse_post_order(self.blocks)
+        for loop in loops:
+            pre = loop.preheader(self.blocks, preds)
+            if pre is None:
+                continue
+            self.hoisted[loop.header] = self.hoist(loop, pre, order)
+
+        if self.verbose:
+            print(f"LICM: создано предзаголовков: {self.preheaders_created}")
+            for header in sorted(self.hoisted):
+                print(f"Цикл с заголовком BLOCK {header}: "
+                      f"вынесено инструкций: {self.hoisted[header]}")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    def hoist(self, loop, pre, order):
+        """
+        Переносит инвариантные инструкции цикла в предзаголовок.
+
+        Блоки просматриваются в обратном постпорядке, поэтому определение
+        переносится раньше своих использований.
+
+        Returns:
+            int: Количество вынесенных инструкций
+        """
+        defined_inside = set()
+        for n in loop.blocks:
+            for instr in self.blocks[n].instructions:
+                d = instr.get_def()
+                if isinstance(d, Variable):
+                    defined_inside.add(d)
+
+        hoisted = []
+        for n in order:
+            if n not in loop.blocks:
+                continue
+            bb = self.blocks[n]
+            instructions = []
+            for instr in bb.instructions:
+                if instr.typ in HOISTABLE and all(
+                        not isinstance(val, Variable) or val not in defined_inside
+                        for val in instr.get_uses()):
+                    hoisted.append(instr)
+                    defined_inside.discard(instr.get_def())
+                else:
+                    instructions.append(instr)
+            bb.instructions = instructions
+
+        insert_before_terminator(self.blocks[pre], hoisted)
+        return len(hoisted)
@@ -0,0 +1,166 @@
+"""
+Анализ циклов графа потока управления.
+
+Цикл задается заголовком и обратными рёбрами, найденными поиском в глубину
+(как в SsaBuilder.identify_back_edges). Тело естественного цикла - блоки,
+из которых латч достижим без прохода через заголовок. Циклы с общим
+заголовком объединяются, вложенность определяется по включению тел.
+"""
+
+from BB import *
+from cfg import *
+
+
+class Loop:
+    """Естественный цикл"""
+
+    def __init__(self, header):
+        # Заголовок цикла
+        self.header = header
+        # Блоки-источники обратных рёбер
+        self.latches = []
+        # Номера блоков тела (включая заголовок)
+        self.blocks = {header}
+        # Объемлющий цикл и вложенные циклы
+        self.parent = None
+        self.children = []
+
+    def __repr__(self):
+        return f'Loop({self.header}, {sorted(self.blocks)})'
+
+    @property
+    def depth(self):
+        """Глубина вложенности (1 для внешних циклов)"""
+        depth = 1
+        loop = self.parent
+        while loop is not None:
+            depth += 1
+            loop = loop.parent
+        return depth
+
+    def exits(self, blocks_by_num):
+        """Возвращает рёбра (из цикла, вне цикла), по которым цикл завершается"""
+        return [(n, succ) for n in sorted(self.blocks)
+                for succ in blocks_by_num[n].get_successors()
+                if succ not in self.blocks]
+
+    def outside_preds(self, preds):
+        """Возвращает предшественников заголовка, не входящих в цикл"""
+        return [p for p in preds[self.header] if p not in self.blocks]
+
+    def preheader(self, blocks_by_num, preds):
+        """
+        Возвращает номер предзаголовка или None, если его нет.
+
+        Предзаголовок - единственный внешний предшественник заголовка,
+        у которого заголовок - единственный преемник.
+        """
+        outside = self.outside_preds(preds)
+        if len(outside) == 1 and blocks_by_num[outside[0]].get_successors() == [self.header]:
+            return outside[0]
+        return None
+
+
+def find_loops(blocks_by_num):
+    """
+    Находит естественные циклы программы.
+
+    Рёбра, ведущие в блок, который не доминирует над их началом
+    (неприводимые циклы), пропускаются.
+
+    Returns:
+        list: Циклы, упорядоченные от внутренних к внешним
+    """
+    idom = immediate_dominators(blocks_by_num)
+    preds = build_preds(blocks_by_num)
+
+    loops = {}
+    for latch, header in sorted(find_back_edges(blocks_by_num)):
+        if not dominates(idom, header, latch):
+            continue
+        loop = loops.setdefault(header, Loop(header))
+        loop.latches.append(latch)
+
+        # Обратный обход от латча до заголовка
+        work = [latch]
+        while work:
+            n = work.pop()
+            if n in loop.blocks:
+                continue
+            loop.blocks.add(n)
+            work.extend(p for p in preds[n] if p in idom)
+
+    # Родитель - наименьший из циклов, строго содержащих данный
+    ordered = sorted(loops.values(), key=lambda loop: len(loop.blocks))
+    for i, loop in enumerate(ordered):
+        for outer in ordered[i + 1:]:
+            if loop.header in outer.blocks and outer is not loop:
+                loop.parent = outer
+                outer.children.append(loop)
+                break
+
+    return sorted(ordered, key=lambda loop: (-loop.depth, loop.header))
+
+
+def loop_depths(loops):
+    """Возвращает глубину вложенности циклов для каждого блока ({номер: глубина})"""
+    depth = {}
+    for loop in loops:
+        d = loop.depth
+        for n in loop.blocks:
+            depth[n] = max(depth.get(n, 0), d)
+    return depth
+
+
+def ensure_preheader(blocks_by_num, loop, preds=None):
+    """
+    Создает предзаголовок цикла, если его нет.
+
+    Внешние предшественники заголовка перенаправляются в новый блок.
+    Операнды phi-функций заголовка, приходящие снаружи, объединяются
+    phi-функцией предзаголовка, если внешних предшественников несколько.
+
+    Args:
+        blocks_by_num: Словарь {номер блока: BB}
+        loop: Цикл
+        preds: Списки предшественников (вычисляются, если не заданы)
+
+    Returns:
+        tuple: (номер предзаголовка, True если блок был создан);
+               для цикла с заголовком во входном блоке - (None, False)
+    """
+    if preds is None:
+        preds = build_preds(blocks_by_num)
+    existing = loop.preheader(blocks_by_num, preds)
+    if existing is not None:
+        return existing, False
+
+    header = blocks_by_num[loop.header]
+    outside = loop.outside_preds(preds)
+    if not outside:
+        return None, False
+    pre = new_block(blocks_by_num, blocks_by_num[outside[0]])
+
+    for i, instr in enumerate(header.instructions):
+        if instr.typ != PHI:
+            break
+        inner = [(p, v) for p, v in zip(instr.args['blocks'], instr.args['from'])
+                 if p in loop.blocks]
+        outer = [(p, v) for p, v in zip(instr.args['blocks'], instr.args['from'])
+                 if p not in loop.blocks]
+        if len(outer) == 1:
+            value = outer[0][1]
+        else:
+            # Несколько входов снаружи - значение выбирается в предзаголовке
+            value = pre.create_tmp_var()
+            pre.add_instr(Instruction(PHI, {'to': value,
+                                            'from': [v for _, v in outer],
+                                            'blocks': [p for p, _ in outer]}))
+        header.instructions[i] = instr.with_args(**{
+            'from': [value] + [v for _, v in inner],
+            'blocks': [pre.block_num] + [p for p, _ in inner]})
+
+    pre.add_instr(Instruction(BR, {'dest': loop.header}))
+    for p in outside:
+        retarget(blocks_by_num[p], loop.header, pre.block_num)
+    return pre.block_num, True
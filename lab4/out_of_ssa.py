@@ -0,0 +1,338 @@
+"""
+Выход из SSA-формы.
+
+Phi-функции заменяются параллельными копированиями на рёбрах графа.
+Перед этим неинтерферирующие версии, связанные phi-функциями
+и копированиями, объединяются в одну переменную, поэтому большая часть
+копирований исчезает. Оставшиеся параллельные копирования упорядочиваются
+с учетом циклов (обменов значений).
+"""
+
+from BB import *
+from cfg import *
+
+
+def sequentialize_copies(copies, new_tmp):
+    """
+    Упорядочивает параллельное копирование в последовательность копирований.
+
+    Копирования из переменных выполняются так, чтобы ни одно значение не было
+    затерто до чтения; циклы (например, обмен a <-> b) разрываются через
+    временную переменную. Копирования констант выполняются последними.
+
+    Args:
+        copies: Список пар (приемник, источник) с различными приемниками
+        new_tmp: Функция, создающая новую временную переменную
+
+    Returns:
+        list: Последовательность пар (приемник, источник)
+    """
+    result = []
+    consts = [(dst, src) for dst, src in copies if not isinstance(src, Variable)]
+    moves = [(dst, src) for dst, src in copies
+             if isinstance(src, Variable) and dst != src]
+
+    # loc[v] - где сейчас находится исходное значение v,
+    # pred[d] - откуда нужно скопировать значение в d
+    loc = {}
+    pred = {}
+    done = set()
+    to_do = []
+    for dst, src in moves:
+        loc[src] = src
+        pred[dst] = src
+        to_do.append(dst)
+
+    # Готовы к записи приемники, значения которых никому не нужны
+    ready = [dst for dst, _ in moves if dst not in loc]
+
+    while to_do:
+        while ready:
+            b = ready.pop()
+            a = pred[b]
+            c = loc[a]
+            result.append((b, c))
+            done.add(b)
+            loc[a] = b
+            # Исходное значение a сохранено - a можно перезаписывать
+            if a == c and a in pred:
+                ready.append(a)
+
+        b = to_do.pop()
+        if b not in done:
+            # b еще не записан, но его значение нужно другим - это цикл
+            tmp = new_tmp()
+            result.append((tmp, b))
+            loc[b] = tmp
+            ready.append(b)
+
+    return result + consts
+
+
+class SsaDestructor:
+    """
+    Переводит программу из SSA-формы в обычную форму с копированиями.
+
+    Этапы:
+    1. Расщепление критических рёбер, ведущих в блоки с phi-функциями
+    2. Построение графа интерференции версий по живости
+    3. Объединение неинтерферирующих версий, связанных phi-функциями
+       и копированиями
+    4. Замена phi-функций упорядоченными параллельными копированиями
+    """
+
+    def __init__(self, blocks, verbose=True):
+        """
+        Инициализирует проход выхода из SSA.
+
+        Args:
+            blocks: Базовые блоки программы в SSA-форме (списки инструкций
+                    блоков изменяются на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+
+        # Статистика прохода
+        self.split_edges = 0        # количество расщепленных рёбер
+        self.phi_copies = 0         # копирований при наивном удалении phi
+        self.copies_removed = 0     # копирований, устраненных объединением
+        self.copies_inserted = 0    # вставлено инструкций копирования
+
+    def run(self):
+        """
+        Выполняет выход из SSA-формы.
+
+        Returns:
+            list: Блоки программы без phi-функций, упорядоченные по номерам
+        """
+        self.split_critical_edges()
+        self.build_interference()
+        self.coalesce()
+        self.rewrite()
+        self.insert_copies()
+
+        if self.verbose:
+            print(f"Расщеплено рёбер: {self.split_edges}")
+            print(f"Phi-копирований: {self.phi_copies}, "
+                  f"устранено копирований: {self.copies_removed}, "
+                  f"вставлено: {self.copies_inserted}")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    # ==== РАСЩЕПЛЕНИЕ РЁБЕР ====
+
+    def split_critical_edges(self):
+        """
+        Расщепляет критические рёбра, ведущие в блоки с phi-функциями.
+
+        Ребро критическое, если у его начала несколько преемников, а у конца
+        несколько предшественников: копирования для phi-функции нельзя
+        поставить ни в один из этих блоков.
+        """
+        preds = build_preds(self.blocks)
+        for n in sorted(self.blocks):
+            succs = self.blocks[n].get_successors()
+            if len(succs) < 2:
+                continue
+            for succ in succs:
+                if len(preds[succ]) > 1 and self.has_phi(succ):
+                    split_edge(self.blocks, n, succ)
+                    self.split_edges += 1
+        self.preds = build_preds(self.blocks)
+
+    def has_phi(self, n):
+        """Проверяет, есть ли в блоке phi-функции"""
+        instrs = self.blocks[n].instructions
+        return bool(instrs) and instrs[0].typ == PHI
+
+    # ==== ИНТЕРФЕРЕНЦИЯ ====
+
+    def add_interference(self, a, b):
+        """Добавляет ребро интерференции между версиями a и b"""
+        self.interference.setdefault(a, set()).add(b)
+        self.interference.setdefault(b, set()).add(a)
+
+    def build_interference(self):
+        """
+        Строит граф интерференции версий.
+
+        Версия интерферирует со всеми значениями, живыми в точке ее
+        определения. Приемник копирования не интерферирует с источником:
+        пока оба живы, они хранят одно и то же значение. Результаты
+        phi-функций одного блока интерферируют друг с другом.
+        """
+        self.interference = {}
+        _, live_out = ssa_liveness(self.blocks, self.preds)
+
+        for n, bb in self.blocks.items():
+            live = set(live_out[n])
+            phi_defs = []
+            for instr in reversed(bb.instructions):
+                d = instr.get_def()
+                if instr.typ == PHI:
+                    phi_defs.append(d)
+                    continue
+                if isinstance(d, Variable):
+                    src = self.copy_source(instr)
+                    for v in live:
+                        if v != d and v != src:
+                            self.add_interference(d, v)
+                    live.discard(d)
+                for val in instr.get_uses():
+                    if isinstance(val, Variable):
+                        live.add(val)
+
+            # Результаты phi-функций определяются одновременно в начале блока
+            for d in phi_defs:
+                for v in live:
+                    if v != d:
+                        self.add_interference(d, v)
+                for other in phi_defs:
+                    if other != d:
+                        self.add_interference(d, other)
+
+    def copy_source(self, instr):
+        """Возвращает переменную-источник для инструкции копирования или None"""
+        if instr.typ in (STORE, LOAD) and isinstance(instr.args['from'], Variable):
+            return instr.args['from']
+        return None
+
+    # ==== ОБЪЕДИНЕНИЕ ВЕРСИЙ ====
+
+    def find(self, v):
+        """Возвращает представителя класса объединенных версий"""
+        root = v
+        while self.parent.get(root, root) != root:
+            root = self.parent[root]
+        # Сжатие путей
+        while self.parent.get(v, v) != root:
+            self.parent[v], v = root, self.parent[v]
+        return root
+
+    def try_union(self, a, b):
+        """
+        Объединяет классы версий a и b, если они не интерферируют.
+
+        Returns:
+            bool: True, если версии оказались в одном классе
+        """
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return True
+        members_a = self.members.get(ra, [ra])
+        members_b = self.members.get(rb, [rb])
+        set_b = set(members_b)
+        for v in members_a:
+            if not self.interference.get(v, set()).isdisjoint(set_b):
+                return False
+
+        # Присоединяем меньший класс к большему
+        if len(members_a) < len(members_b):
+            ra, rb, members_a, members_b = rb, ra, members_b, members_a
+        self.parent[rb] = ra
+        self.members[ra] = members_a + members_b
+        self.members.pop(rb, None)
+        return True
+
+    def coalesce(self):
+        """
+        Объединяет неинтерферирующие версии.
+
+        Сначала объединяются результаты и операнды phi-функций, затем
+        приемники и источники обычных копирований.
+        """
+        self.parent = {}
+        self.members = {}
+
+        for n in sorted(self.blocks):
+            for instr in self.blocks[n].instructions:
+                if instr.typ != PHI:
+                    break
+                for val in instr.args['from']:
+                    if isinstance(val, Variable):
+                        self.try_union(instr.args['to'], val)
+
+        for n in sorted(self.blocks):
+            for instr in self.blocks[n].instructions:
+                src = self.copy_source(instr)
+                if src is not None:
+                    self.try_union(instr.args['to'], src)
+
+        # Представитель класса - именованная переменная, если она есть
+        self.rep = {}
+        for root, members in self.members.items():
+            best = min(members, key=lambda v: (v.is_temp, v.name, v.version))
+            for v in members:
+                self.rep[v] = best
+
+    def rename(self, val):
+        """Возвращает переменную, которой заменяется версия val"""
+        if isinstance(val, Variable):
+            return self.rep.get(val, val)
+        return val
+
+    def rewrite(self):
+        """Заменяет версии представителями и удаляет ставшие пустыми копирования"""
+        for bb in self.blocks.values():
+            instructions = []
+            for instr in bb.instructions:
+                instr = instr.map_uses(self.rename)
+                d = instr.get_def()
+                if d is not None and self.rename(d) is not d:
+                    instr = instr.with_args(to=self.rename(d))
+                src = self.copy_source(instr)
+                if src is not None and src == instr.args['to']:
+                    self.copies_removed += 1
+                    continue
+                instructions.append(instr)
+            bb.instructions = instructions
+
+    # ==== ЗАМЕНА PHI-ФУНКЦИЙ ====
+
+    def insert_copies(self):
+        """
+        Заменяет phi-функции параллельными копированиями.
+
+        Копирования ставятся в конец предшественника, если у него один
+        преемник, иначе - в начало блока с phi-функциями (у него тогда один
+        предшественник, так как критические рёбра расщеплены).
+        """
+        for n in sorted(self.blocks):
+            bb = self.blocks[n]
+            phis = [instr for instr in bb.instructions if instr.typ == PHI]
+            if not phis:
+                continue
+            bb.instructions = bb.instructions[len(phis):]
+
+            # Собираем параллельные копирования для каждого входящего ребра
+            copies = dict((pred, []) for pred in self.preds[n])
+            for instr in phis:
+                for pred, val in zip(instr.args['blocks'], instr.args['from']):
+                    self.phi_copies += 1
+                    if val == instr.args['to']:
+                        self.copies_removed += 1
+                        continue
+                    copies[pred].append((instr.args['to'], val))
+
+            for pred, parallel in copies.items():
+                if not parallel:
+                    continue
+                pred_bb = self.blocks[pred]
+                if len(pred_bb.get_successors()) == 1:
+                    target, at_end = pred_bb, True
+                else:
+                    target, at_end = bb, False
+
+                sequence = sequentialize_copies(parallel, target.create_tmp_var)
+                instrs = [self.make_copy(dst, src) for dst, src in sequence]
+                self.copies_inserted += len(instrs)
+                if at_end:
+                    insert_before_terminator(target, instrs)
+                else:
+                    target.instructions[0:0] = instrs
+
+    def make_copy(self, dst, src):
+        """Создает инструкцию копирования src в dst"""
+        typ = LOAD if dst.is_temp else STORE
+        return Instruction(typ, {'from': src, 'to': dst})
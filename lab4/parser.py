@@ -6,6 +6,7 @@
     - Арифметические операции: x = a + b, x = a - b, x = a * b
     - Условные операторы: if x > y then ... else ...
     - Циклы: while x < y do ...
+    - Операции сравнения в условиях: >, <, >=, <=, ==, !=
     - Возврат значения: return x
 """
 
@@ -178,6 +179,20 @@ class Parser:
             Instruction(STORE, {'from': tmp, 'to': self.variables[left]})
         )
     
+    def _parse_compare_op(self, op):
+        """
+        Проверяет операцию сравнения в условии.
+        
+        Args:
+            op: Строка с операцией сравнения
+            
+        Returns:
+            str: Операция сравнения для инструкции icmp
+        """
+        if op not in ICMP_OPS:
+            raise ValueError(f"Неизвестная операция сравнения: {op}")
+        return op
+    
     def _parse_if(self, lines):
         """
         Обрабатывает условный оператор.
@@ -192,8 +207,9 @@ class Parser:
         if_line = lines[0].strip()
         condition_parts = if_line.split('then')[0][2:].strip().split()
         
-        # Определяем переменные в условии
+        # Определяем переменные и операцию сравнения в условии
         left_var = condition_parts[0].strip()
+        op = self._parse_compare_op(condition_parts[1].strip())
         right_var = condition_parts[2].strip()
         
         # Если переменные не объявлены, добавляем их
@@ -216,7 +232,7 @@ class Parser:
         
         # Добавляем инструкцию сравнения
         self.current_block.add_instr(
-            Instruction(ICMP, {'arg1': self.variables[left_var], 'arg2': right_val, 'to': tmp})
+            Instruction(ICMP, {'arg1': self.variables[left_var], 'arg2': right_val, 'to': tmp, 'op': op})
         )
         
         # Создаем блоки для true и false ветвей
@@ -275,8 +291,9 @@ class Parser:
         while_line = lines[0].strip()
         condition_parts = while_line.split('do')[0][5:].strip().split()
         
-        # Определяем переменные в условии
+        # Определяем переменные и операцию сравнения в условии
         left_var = condition_parts[0].strip()
+        op = self._parse_compare_op(condition_parts[1].strip())
         right_var = condition_parts[2].strip()
         
         # Если переменные не объявлены, добавляем их
@@ -310,7 +327,7 @@ class Parser:
         
         # Добавляем инструкцию сравнения
         self.current_block.add_instr(
-            Instruction(ICMP, {'arg1': self.variables[left_var], 'arg2': right_val, 'to': tmp})
+            Instruction(ICMP, {'arg1': self.variables[left_var], 'arg2': right_val, 'to': tmp, 'op': op})
         )
         
         # Создаем блоки для тела цикла и выхода
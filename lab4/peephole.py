@@ -0,0 +1,345 @@
+"""
+Оконный (peephole) оптимизатор по декларативным правилам.
+
+Правило переписывает короткое окно подряд идущих инструкций блока.
+Правила записываются на небольшом языке шаблонов:
+
+    r = mul x 2                     =>  r = add x x
+    t = load v; x = store t         =>  x = store v         if single_use t
+    c = icmp A B; condbr c t f      =>  br {t if evaluate(ICMP, A, B, op) else f}
+
+Окно - инструкции через ';', инструкция - "результат = операция операнды"
+или "операция операнды" (для переходов и return). В шаблоне:
+- идентификатор со строчной буквы сопоставляется с любым значением
+  (повторное вхождение требует того же значения);
+- идентификатор с заглавной буквы - только с константой;
+- число - с константой (или номером блока) с этим значением;
+- у icmp операция сравнения связывается с именем op.
+В замене операнд {выражение} вычисляется над связанными константами
+и номерами блоков, операция copy создает копирование (LOAD для временной
+переменной, STORE для остальных), а замена '-' удаляет окно. Условия
+после if: single_use x - у значения x единственное использование.
+
+Правила индексируются по операции первой инструкции окна. Блоки
+обрабатываются по рабочему списку до неподвижной точки: блок снова
+попадает в список, когда у определенного в нем значения становится
+меньше использований.
+"""
+
+import re
+
+from BB import *
+from cfg import *
+
+
+RULES = """
+# Свертка константных выражений
+r = add A B                     =>  r = copy {A + B}
+r = sub A B                     =>  r = copy {A - B}
+r = mul A B                     =>  r = copy {A * B}
+
+# Сравнение, используемое только условным переходом, на константах
+c = icmp A B; condbr c t f      =>  br {t if evaluate(ICMP, A, B, op) else f}   if single_use c
+r = icmp A B                    =>  r = copy {evaluate(ICMP, A, B, op)}
+condbr C t f                    =>  br {t if C else f}
+condbr c t t                    =>  br t
+
+# Алгебраические тождества
+r = mul x 2                     =>  r = add x x
+r = mul 2 x                     =>  r = add x x
+r = add x 0                     =>  r = copy x
+r = add 0 x                     =>  r = copy x
+r = sub x 0                     =>  r = copy x
+r = mul x 1                     =>  r = copy x
+r = mul 1 x                     =>  r = copy x
+r = mul x 0                     =>  r = copy 0
+r = mul 0 x                     =>  r = copy 0
+r = sub x x                     =>  r = copy 0
+
+# Пары LOAD/STORE, создаваемые BB.set_variable
+t = load v; x = store t         =>  x = store v     if single_use t
+x = store v; t = load x         =>  x = store v; t = load v
+x = store x                     =>  -
+"""
+
+# Ключи операндов инструкций в порядке записи в шаблоне
+OPERANDS = {
+    ADD: ('oper1', 'oper2'),
+    SUB: ('oper1', 'oper2'),
+    MUL: ('oper1', 'oper2'),
+    ICMP: ('arg1', 'arg2'),
+    LOAD: ('from',),
+    STORE: ('from',),
+    CONDBR: ('cond', 'dest1', 'dest2'),
+    BR: ('dest',),
+    RET: ('value',),
+}
+
+# Ключи, значения которых - номера блоков
+TARGETS = ('dest', 'dest1', 'dest2')
+
+# Псевдооперация замены: копирование значения
+COPY = 'copy'
+
+TOKEN = re.compile(r'\{[^}]*\}|\S+')
+
+
+def same(a, b):
+    """Сравнивает связанные значения (константы - по числу)"""
+    if const_value(a) is not None or const_value(b) is not None:
+        return const_value(a) == const_value(b)
+    return a == b
+
+
+class Pattern:
+    """Шаблон одной инструкции: результат, операция, операнды"""
+
+    def __init__(self, text):
+        tokens = TOKEN.findall(text)
+        if len(tokens) > 1 and tokens[1] == '=':
+            self.dest, tokens = tokens[0], tokens[2:]
+        else:
+            self.dest = None
+        self.typ, self.operands = tokens[0], tokens[1:]
+        keys = OPERANDS.get(self.typ, OPERANDS[LOAD] if self.typ == COPY else None)
+        if keys is None or len(keys) != len(self.operands):
+            raise ValueError(f"Неверная инструкция шаблона: {text}")
+        self.keys = keys
+
+    def match(self, instr, bindings):
+        """Сопоставляет инструкцию с шаблоном, дополняя bindings; False при несовпадении"""
+        if instr.typ != self.typ:
+            return False
+        pairs = list(zip(self.operands, (instr.args[key] for key in self.keys)))
+        if self.dest is not None:
+            pairs.append((self.dest, instr.args['to']))
+        for token, val in pairs:
+            if re.fullmatch(r'-?\d+', token):
+                if const_value(val) != int(token):
+                    return False
+                continue
+            if token[0].isupper() and const_value(val) is None:
+                return False
+            if token in bindings:
+                if not same(bindings[token], val):
+                    return False
+            else:
+                bindings[token] = val
+        if self.typ == ICMP:
+            bindings['op'] = instr.args.get('op', '>')
+        return True
+
+    def build(self, bindings):
+        """Создает инструкцию замены по связанным значениям"""
+        env = dict((name, const_value(val) if const_value(val) is not None else val)
+                   for name, val in bindings.items())
+        env.update({'evaluate': evaluate, 'ICMP': ICMP})
+        args = {}
+        for token, key in zip(self.operands, self.keys):
+            if token.startswith('{'):
+                val = eval(token[1:-1], {}, env)
+            elif re.fullmatch(r'-?\d+', token):
+                val = int(token)
+            else:
+                val = bindings[token]
+            if key not in TARGETS and isinstance(val, int):
+                val = IntConst(val)
+            args[key] = val
+
+        typ = self.typ
+        if self.dest is not None:
+            args['to'] = bindings[self.dest]
+            if typ == COPY:
+                typ = LOAD if args['to'].is_temp else STORE
+        if typ == ICMP and 'op' in bindings:
+            args['op'] = bindings['op']
+        return Instruction(typ, args)
+
+
+class Rule:
+    """Правило переписывания окна инструкций"""
+
+    def __init__(self, text):
+        self.text = text
+        lhs, rhs = text.split('=>')
+        # Условия - после последнего ' if ' вне вычисляемых операндов
+        tail = rhs.rfind('}') + 1
+        rhs, guards = rhs[:tail] + rhs[tail:].partition(' if ')[0], rhs[tail:].partition(' if ')[2]
+        self.pattern = [Pattern(part) for part in lhs.split(';')]
+        self.replacement = [] if rhs.strip() == '-' else [Pattern(part) for part in rhs.split(';')]
+        self.guards = [guard.split() for guard in guards.split(',') if guard.strip()]
+        for name, *args in self.guards:
+            if name != 'single_use' or len(args) != 1:
+                raise ValueError(f"Неизвестное условие правила: {name}")
+
+    def __repr__(self):
+        return self.text
+
+    def apply(self, window, uses):
+        """
+        Сопоставляет окно с правилом.
+
+        Args:
+            window: Инструкции окна
+            uses: Количество использований значений программы
+
+        Returns:
+            list: Инструкции замены или None, если правило неприменимо
+        """
+        bindings = {}
+        for pattern, instr in zip(self.pattern, window):
+            if not pattern.match(instr, bindings):
+                return None
+        for _, name in self.guards:
+            if uses.get(bindings[name], 0) != 1:
+                return None
+        return [pattern.build(bindings) for pattern in self.replacement]
+
+
+def parse_rules(text):
+    """Разбирает правила (по одному в строке, '#' - комментарий)"""
+    rules = []
+    for line in text.splitlines():
+        line = line.split('#')[0].strip()
+        if line:
+            rules.append(Rule(' '.join(line.split())))
+    return rules
+
+
+class Peephole:
+    """
+    Проход оконной оптимизации.
+
+    Работает как с SSA-формой, так и с исходным IR: правила не заменяют
+    использования значений в других инструкциях, а лишь переписывают окно,
+    поэтому изменяемые переменные исходного IR читаются в тех же точках.
+    """
+
+    def __init__(self, blocks, verbose=True, rules=None):
+        """
+        Args:
+            blocks: Базовые блоки программы (списки инструкций изменяются
+                    на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+            rules: Текст правил (по умолчанию RULES)
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+
+        # Правила по операции первой инструкции окна
+        self.rules = parse_rules(RULES if rules is None else rules)
+        self.index = {}
+        for rule in self.rules:
+            self.index.setdefault(rule.pattern[0].typ, []).append(rule)
+        self.window = max((len(rule.pattern) for rule in self.rules), default=1)
+
+        # Статистика прохода
+        self.applied = dict((rule.text, 0) for rule in self.rules)
+
+    def run(self):
+        """
+        Применяет правила до неподвижной точки.
+
+        Returns:
+            list: Блоки программы, упорядоченные по номерам
+        """
+        self.uses = {}
+        self.def_block = {}
+        for n, bb in self.blocks.items():
+            for instr in bb.instructions:
+                self.count_uses(instr, 1)
+                d = instr.get_def()
+                if isinstance(d, Variable):
+                    self.def_block[d] = n
+
+        worklist = sorted(self.blocks)
+        queued = set(worklist)
+        while worklist:
+            n = worklist.pop()
+            queued.discard(n)
+            for m in self.process(n):
+                if m not in queued and m in self.blocks:
+                    queued.add(m)
+                    worklist.append(m)
+
+        if self.verbose:
+            print(f"Peephole: применено правил: {sum(self.applied.values())}")
+            for text, count in self.applied.items():
+                if count:
+                    print(f"  {text}: {count}")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    def count_uses(self, instr, delta):
+        """Учитывает использования значений инструкцией"""
+        for val in instr.get_uses():
+            if isinstance(val, Variable):
+                self.uses[val] = self.uses.get(val, 0) + delta
+
+    def process(self, n):
+        """
+        Переписывает окна блока n, пока применимо хотя бы одно правило.
+
+        Returns:
+            set: Блоки, которые нужно обработать снова
+        """
+        bb = self.blocks[n]
+        requeue = set()
+        i = 0
+        while i < len(bb.instructions):
+            rule = self.rewrite_at(n, i, requeue)
+            if rule is None:
+                i += 1
+            else:
+                # Новая инструкция может начать окно вместе с предыдущими
+                i = max(0, i - self.window + 1)
+        requeue.discard(n)
+        return requeue
+
+    def rewrite_at(self, n, i, requeue):
+        """
+        Применяет первое подходящее правило к окну, начинающемуся с позиции i.
+
+        Returns:
+            Rule: Примененное правило или None
+        """
+        bb = self.blocks[n]
+        for rule in self.index.get(bb.instructions[i].typ, ()):
+            window = bb.instructions[i:i + len(rule.pattern)]
+            if len(window) < len(rule.pattern):
+                continue
+            new = rule.apply(window, self.uses)
+            if new is None or new == window:
+                continue
+
+            old_succs = bb.get_successors()
+            for instr in window:
+                self.count_uses(instr, -1)
+            for instr in new:
+                self.count_uses(instr, 1)
+            bb.instructions[i:i + len(window)] = new
+            self.applied[rule.text] += 1
+
+            # Значения с уменьшившимся числом использований
+            for instr in window:
+                for val in instr.get_uses():
+                    if isinstance(val, Variable) and val in self.def_block:
+                        requeue.add(self.def_block[val])
+
+            # Удаленные рёбра: операнды phi-функций преемников
+            for succ in set(old_succs) - set(bb.get_successors()):
+                self.remove_phi_pred(succ, n)
+            return rule
+        return None
+
+    def remove_phi_pred(self, n, pred):
+        """Удаляет из phi-функций блока n операнды, приходящие из pred"""
+        bb = self.blocks[n]
+        for i, instr in enumerate(bb.instructions):
+            if instr.typ != PHI:
+                break
+            pairs = [(p, v) for p, v in zip(instr.args['blocks'], instr.args['from']) if p != pred]
+            self.count_uses(instr, -1)
+            bb.instructions[i] = instr.with_args(**{'blocks': [p for p, _ in pairs],
+                                                    'from': [v for _, v in pairs]})
+            self.count_uses(bb.instructions[i], 1)
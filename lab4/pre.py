@@ -0,0 +1,384 @@
+"""
+Удаление частичной избыточности (PRE) ленивым перемещением кода (LCM).
+
+Выражение частично избыточно, если оно уже вычислено на некоторых путях
+к точке вычисления. Ленивое перемещение кода (Knoop, Rüthing, Steffen,
+в реберной формулировке Drechsler и Stadel) вставляет вычисления на рёбра,
+где выражения не хватает, как можно позже, и удаляет ставшие полностью
+избыточными вычисления. Ни один путь при этом не удлиняется.
+
+Проход работает над SSA-формой. Выражения сравниваются по операции и
+операндам с учетом копирований (LOAD/STORE); блок, определяющий операнд
+выражения (в том числе phi-функцией), считается убивающим выражение.
+Значение удаленного вычисления восстанавливается поиском ближайших
+вычислений назад по графу с phi-функциями в точках слияния.
+"""
+
+from BB import *
+from cfg import *
+from gvn import COMMUTATIVE, COMMUTATIVE_CMP, SWAPPED_CMP
+
+
+# Инструкции-выражения, которые может перемещать проход
+EXPRESSIONS = (ADD, SUB, MUL, ICMP)
+
+# Фиктивный предшественник входного блока
+START = -1
+
+
+class Pre:
+    """
+    Проход удаления частичной избыточности.
+
+    Множества выражений хранятся битовыми масками (int), бит выражения -
+    его номер в self.exprs. Рёбра, на которые нужно вставить вычисление,
+    расщепляются, если они критические.
+    """
+
+    def __init__(self, blocks, verbose=True):
+        """
+        Args:
+            blocks: Базовые блоки программы в SSA-форме (списки инструкций
+                    изменяются на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+
+        # Статистика прохода
+        self.inserted = 0       # вставлено вычислений
+        self.deleted = 0        # удалено избыточных вычислений
+        self.edges_split = 0    # расщеплено критических рёбер
+
+    def run(self):
+        """
+        Выполняет удаление частичной избыточности.
+
+        Returns:
+            list: Блоки программы, упорядоченные по номерам
+        """
+        self.collect()
+        self.preds = build_preds(self.blocks)
+        # Вставка на ребро перед входным блоком невозможна, если в него
+        # ведут переходы: такая программа не обрабатывается
+        if self.exprs and not self.preds[ENTRY]:
+            self.order = reverse_post_order(self.blocks)
+            self.preds[ENTRY] = [START]
+            self.local_properties()
+            self.availability()
+            self.anticipability()
+            self.placement()
+            self.transform()
+
+        if self.verbose:
+            print(f"PRE: выражений: {len(self.exprs)}, вставлено вычислений: {self.inserted}, "
+                  f"удалено избыточных: {self.deleted}, "
+                  f"расщеплено рёбер: {self.edges_split}")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    # ==== ВЫРАЖЕНИЯ ====
+
+    def root(self, val):
+        """Источник цепочки копирований"""
+        while isinstance(val, Variable) and val in self.copies:
+            val = self.copies[val]
+        return val
+
+    def operand_key(self, val):
+        """Хешируемый ключ операнда"""
+        val = self.root(val)
+        if isinstance(val, Variable):
+            return (val.name, val.version)
+        return ('const', const_value(val))
+
+    def expression_key(self, instr):
+        """Ключ выражения (как в Gvn.expression_key, но по источникам копирований)"""
+        if instr.typ == ICMP:
+            op = instr.args.get('op', '>')
+            a = self.operand_key(instr.args['arg1'])
+            b = self.operand_key(instr.args['arg2'])
+            if op in SWAPPED_CMP:
+                op, a, b = SWAPPED_CMP[op], b, a
+            elif op in COMMUTATIVE_CMP and repr(b) < repr(a):
+                a, b = b, a
+            return (ICMP, op, a, b)
+
+        a = self.operand_key(instr.args['oper1'])
+        b = self.operand_key(instr.args['oper2'])
+        if instr.typ in COMMUTATIVE and repr(b) < repr(a):
+            a, b = b, a
+        return (instr.typ, a, b)
+
+    def collect(self):
+        """Нумерует выражения программы и находит блоки, определяющие их операнды"""
+        self.copies = {}
+        def_block = {}
+        for n, bb in self.blocks.items():
+            for instr in bb.instructions:
+                d = instr.get_def()
+                if isinstance(d, Variable):
+                    def_block[d] = n
+                if instr.typ in (LOAD, STORE):
+                    self.copies[d] = instr.args['from']
+
+        self.exprs = {}         # ключ выражения -> номер
+        self.template = []      # номер -> инструкция с операндами-источниками
+        self.kill_blocks = {}   # номер блока -> маска выражений, операнды которых он определяет
+        for bb in self.blocks.values():
+            for instr in bb.instructions:
+                if instr.typ not in EXPRESSIONS:
+                    continue
+                operands = [self.root(val) for val in instr.get_uses()]
+                if not any(isinstance(val, Variable) for val in operands):
+                    continue    # константные выражения - задача Sccp
+                key = self.expression_key(instr)
+                if key in self.exprs:
+                    continue
+                e = len(self.exprs)
+                self.exprs[key] = e
+                self.template.append(instr.map_uses(self.root))
+                for val in operands:
+                    if isinstance(val, Variable) and val in def_block:
+                        n = def_block[val]
+                        self.kill_blocks[n] = self.kill_blocks.get(n, 0) | (1 << e)
+
+    def occurrences(self, bb):
+        """Возвращает пары (номер выражения, инструкция) блока по порядку"""
+        result = []
+        for instr in bb.instructions:
+            if instr.typ in EXPRESSIONS:
+                key = self.expression_key(instr)
+                if key in self.exprs:
+                    result.append((self.exprs[key], instr))
+        return result
+
+    # ==== АНАЛИЗЫ ====
+
+    def local_properties(self):
+        """
+        Вычисляет локальные свойства блоков.
+
+        В SSA-форме операнд определяется раньше любого его использования,
+        поэтому вычисление в блоке, убивающем выражение, никогда не
+        предвидится на входе (ANTLOC), но всегда доступно на выходе (COMP).
+        """
+        self.all = (1 << len(self.exprs)) - 1
+        self.transp, self.antloc, self.comp = {}, {}, {}
+        for n in self.order:
+            kill = self.kill_blocks.get(n, 0)
+            comp = 0
+            for e, _ in self.occurrences(self.blocks[n]):
+                comp |= 1 << e
+            self.transp[n] = self.all & ~kill
+            self.antloc[n] = comp & ~kill
+            self.comp[n] = comp
+
+    def availability(self):
+        """Доступность выражений (прямой анализ, пересечение по предшественникам)"""
+        self.avail_out = dict((n, self.all) for n in self.order)
+        self.avail_out[START] = 0
+        changed = True
+        while changed:
+            changed = False
+            for n in self.order:
+                avail_in = self.all
+                for p in self.preds[n]:
+                    avail_in &= self.avail_out.get(p, self.all)
+                out = self.comp[n] | (avail_in & self.transp[n])
+                if out != self.avail_out[n]:
+                    self.avail_out[n] = out
+                    changed = True
+
+    def anticipability(self):
+        """Предвидимость выражений (обратный анализ, пересечение по преемникам)"""
+        self.antic_in = dict((n, self.all) for n in self.order)
+        self.antic_out = {}
+        changed = True
+        while changed:
+            changed = False
+            for n in reversed(self.order):
+                succs = self.blocks[n].get_successors()
+                out = self.all if succs else 0
+                for s in succs:
+                    out &= self.antic_in[s]
+                self.antic_out[n] = out
+                antic = self.antloc[n] | (self.transp[n] & out)
+                if antic != self.antic_in[n]:
+                    self.antic_in[n] = antic
+                    changed = True
+
+    def earliest(self, i, j):
+        """Выражения, которые можно вычислить на ребре (i, j) и не раньше"""
+        if i == START:
+            return self.antic_in[j]
+        return (self.antic_in[j] & ~self.avail_out[i]
+                & (~self.transp[i] | ~self.antic_out[i]) & self.all)
+
+    def placement(self):
+        """
+        Находит рёбра вставки и удаляемые вычисления (LATER/LATERIN).
+
+        INSERT(i, j) = LATER(i, j) и не LATERIN(j),
+        DELETE(n) = ANTLOC(n) и не LATERIN(n).
+        """
+        self.later_in = dict((n, self.all) for n in self.order)
+        self.later_in[START] = 0
+        later = {}
+        changed = True
+        while changed:
+            changed = False
+            for n in self.order:
+                value = self.all
+                for p in self.preds[n]:
+                    if p != START and p not in self.later_in:
+                        continue    # недостижимый предшественник
+                    edge = self.earliest(p, n)
+                    if p != START:
+                        edge |= self.later_in[p] & ~self.antloc[p]
+                    later[(p, n)] = edge
+                    value &= edge
+                if value != self.later_in[n]:
+                    self.later_in[n] = value
+                    changed = True
+
+        self.insert = dict((edge, mask & ~self.later_in[edge[1]])
+                           for edge, mask in later.items()
+                           if mask & ~self.later_in[edge[1]])
+        self.delete = dict((n, self.antloc[n] & ~self.later_in[n]) for n in self.order)
+
+    # ==== ПРЕОБРАЗОВАНИЕ ====
+
+    def transform(self):
+        """Вставляет вычисления на рёбра и заменяет избыточные вычисления"""
+        for (i, j), mask in sorted(self.insert.items()):
+            bb = self.insertion_block(i, j)
+            instrs = []
+            for e in range(len(self.exprs)):
+                if mask & (1 << e):
+                    instrs.append(self.template[e].with_args(to=bb.create_tmp_var()))
+            insert_before_terminator(bb, instrs)
+            self.inserted += len(instrs)
+
+        self.preds = build_preds(self.blocks)
+        self.replace = {}
+        self.entry_value = {}
+        for n in reverse_post_order(self.blocks):
+            seen = {}
+            for e, instr in self.occurrences(self.blocks[n]):
+                if e in seen:
+                    # Локальная избыточность
+                    self.replace[instr.args['to']] = seen[e]
+                elif self.delete.get(n, 0) & (1 << e):
+                    seen[e] = self.value_at_entry(n, e)
+                    self.replace[instr.args['to']] = seen[e]
+                else:
+                    seen[e] = instr.args['to']
+
+        for bb in self.blocks.values():
+            kept = []
+            for instr in bb.instructions:
+                if instr.get_def() in self.replace and instr.typ != PHI:
+                    self.deleted += 1
+                    continue
+                kept.append(instr.map_uses(self.resolve))
+            bb.instructions = kept
+
+    def insertion_block(self, i, j):
+        """
+        Блок, в конец которого вставляются вычисления ребра (i, j).
+
+        Ребро (START, ENTRY) вставок не получает: у входного блока нет
+        других предшественников, поэтому LATERIN(ENTRY) = LATER(START, ENTRY).
+        """
+        if len(self.blocks[i].get_successors()) == 1:
+            return self.blocks[i]
+        self.edges_split += 1
+        return split_edge(self.blocks, i, j)
+
+    def resolve(self, val):
+        """Заменяет результат удаленного вычисления его значением"""
+        while isinstance(val, Variable) and val in self.replace:
+            val = self.replace[val]
+        return val
+
+    def computed_at_end(self, n, e):
+        """Результат вычисления e, оставшегося в блоке n, или None"""
+        if self.delete.get(n, 0) & (1 << e):
+            return None
+        for k, instr in self.occurrences(self.blocks[n]):
+            if k == e:
+                return instr.args['to']
+        return None
+
+    def value_at_entry(self, n, e):
+        """
+        Значение выражения e на входе в блок n.
+
+        Блоки, через которые значение приходит в n, находятся обходом назад
+        с явным стеком до блоков с вычислениями e. В точках слияния
+        создаются phi-функции; если все операнды phi-функции совпадают, она
+        заменяется этим операндом.
+        """
+        if (n, e) in self.entry_value:
+            return self.entry_value[(n, e)]
+
+        pending = []
+        seen = {n}
+        stack = [n]
+        while stack:
+            m = stack.pop()
+            pending.append(m)
+            for p in self.preds[m]:
+                if (p not in seen and (p, e) not in self.entry_value
+                        and self.computed_at_end(p, e) is None):
+                    seen.add(p)
+                    stack.append(p)
+
+        # Результаты phi-функций точек слияния создаются заранее:
+        # по обратным рёбрам значение приходит в ту же точку
+        merges = [m for m in pending if len(self.preds[m]) != 1]
+        for m in merges:
+            self.entry_value[(m, e)] = self.blocks[m].create_tmp_var()
+
+        for m in merges:
+            var = self.entry_value[(m, e)]
+            preds = self.preds[m]
+            values = [self.value_at_end(p, e) for p in preds]
+            distinct = [v for v in values if v != var]
+            if all(v == distinct[0] for v in distinct):
+                self.replace[var] = distinct[0]
+            else:
+                self.blocks[m].instructions.insert(
+                    0, Instruction(PHI, {'to': var, 'from': values, 'blocks': list(preds)}))
+        return self.chain_entry(n, e)
+
+    def value_at_end(self, n, e):
+        """Значение выражения e в конце блока n"""
+        value = self.computed_at_end(n, e)
+        if value is None:
+            value = self.chain_entry(n, e)
+        return value
+
+    def chain_entry(self, n, e):
+        """
+        Значение e на входе в блок n по цепочке единственных предшественников.
+
+        Цепочка кончается блоком с вычислением e или блоком, значение на
+        входе в который уже известно (в том числе точкой слияния,
+        обработанной value_at_entry).
+        """
+        chain = []
+        m = n
+        while (m, e) not in self.entry_value:
+            chain.append(m)
+            p = self.preds[m][0]
+            value = self.computed_at_end(p, e)
+            if value is not None:
+                break
+            m = p
+        else:
+            value = self.entry_value[(m, e)]
+        for m in chain:
+            self.entry_value[(m, e)] = value
+        return value
@@ -0,0 +1,301 @@
+"""
+Генерация кода Python по программе вне SSA-формы.
+
+Программа переводится в исходный текст функции Python, который
+компилируется встроенной функцией compile(); результат - обычная функция,
+вызов которой не требует обхода блоков. Управляющие конструкции
+восстанавливаются по графу: естественный цикл становится циклом
+while True с continue на обратных рёбрах и break на ребре выхода,
+условный переход - оператором if/else, ветви которого сливаются
+в ближайшем постдоминаторе. Небольшие блоки, в которые ведут переходы
+из разных ветвей без общего слияния, копируются в каждую ветвь. Если граф
+так не разбирается (выход сразу из нескольких циклов, неприводимый
+цикл, превышен бюджет копирования) или структурный код вложен глубже,
+чем допускает компилятор Python, генерируется конечный автомат: цикл
+с выбором блока по номеру.
+
+Функции кешируются по исходному тексту: одинаковые программы
+компилируются один раз.
+"""
+
+import networkx as nx
+from BB import *
+from cfg import *
+from loops import find_loops
+
+
+# Номер фиктивного выходного блока для построения постдоминаторов
+EXIT = -1
+
+# Имя генерируемой функции
+FUNCTION = 'program'
+
+# Наибольшее число инструкций в копиях повторно выводимых блоков
+DUPLICATE_BUDGET = 16
+
+# Скомпилированные функции: исходный текст -> функция
+CACHE = {}
+
+
+class Unstructured(Exception):
+    """Граф не разбирается на структурные конструкции"""
+    pass
+
+
+class PythonBackend:
+    """
+    Генератор функции Python.
+
+    Параметры функции - переменные, которые читаются, но нигде не
+    определяются, по имени переменной; как и при построении SSA,
+    по умолчанию они равны 0. Присваиваемые переменные также равны 0
+    до первого присваивания, поэтому принимается и исходный IR, и
+    программа после выхода из SSA. Функция возвращает значение
+    инструкции возврата.
+    """
+
+    def __init__(self, blocks, verbose=True):
+        """
+        Args:
+            blocks: Базовые блоки программы без phi-функций (не изменяются)
+            verbose: Флаг, управляющий выводом отладочной информации
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+        for bb in self.blocks.values():
+            if any(instr.typ == PHI for instr in bb.instructions):
+                raise ValueError(f"Программа в SSA-форме (BLOCK {bb.block_num}): "
+                                 f"выполните выход из SSA (SsaDestructor)")
+
+        # Результат
+        self.source = None      # исходный текст функции
+        self.structured = False # True, если граф разобран на if/while
+        self.function = None    # скомпилированная функция
+
+    def compile(self):
+        """
+        Генерирует и компилирует функцию (повторные вызовы берут ее из кеша).
+
+        Returns:
+            function: Функция Python, вычисляющая программу
+        """
+        if self.function is not None:
+            return self.function
+
+        # Глубокая вложенность структурного кода превышает ограничения
+        # интерпретатора Python (уровни отступа, вложенные блоки, рекурсия
+        # компилятора) - тогда генерируется конечный автомат
+        prologue = self.prologue()
+        self.structured = False
+        try:
+            cached = self.load(prologue + self.structured_body())
+            self.structured = True
+        except (Unstructured, SyntaxError, RecursionError):
+            cached = self.load(prologue + self.state_machine_body())
+
+        if self.verbose:
+            how = "структурный код" if self.structured else "конечный автомат"
+            print(f"Генерация кода Python: {how}, строк: {self.source.count(chr(10))}"
+                  f"{', из кеша' if cached else ''}")
+            print(self.source)
+        return self.function
+
+    def load(self, source):
+        """
+        Компилирует исходный текст функции или берет функцию из кеша.
+
+        Returns:
+            bool: True, если функция взята из кеша
+        """
+        cached = source in CACHE
+        if not cached:
+            namespace = {}
+            exec(compile(source, f'<{FUNCTION}>', 'exec'), namespace)
+            CACHE[source] = namespace[FUNCTION]
+        self.source = source
+        self.function = CACHE[source]
+        return cached
+
+    # ==== ВЫРАЖЕНИЯ ====
+
+    def name(self, var):
+        """Имя переменной Python"""
+        return f'v_{var.name}' if var.is_temp else f'v_{var.name}_{var.version}'
+
+    def value(self, val):
+        """Операнд в тексте Python"""
+        if isinstance(val, Variable):
+            return self.name(val)
+        return str(const_value(val))
+
+    def statement(self, instr):
+        """Текст инструкции без перехода или None для инструкций без действия"""
+        typ = instr.typ
+        if typ in (LOAD, STORE):
+            return f"{self.name(instr.args['to'])} = {self.value(instr.args['from'])}"
+        if typ in (ADD, SUB, MUL):
+            sign = {ADD: '+', SUB: '-', MUL: '*'}[typ]
+            return (f"{self.name(instr.args['to'])} = {self.value(instr.args['oper1'])} "
+                    f"{sign} {self.value(instr.args['oper2'])}")
+        if typ == ICMP:
+            return (f"{self.name(instr.args['to'])} = int({self.value(instr.args['arg1'])} "
+                    f"{instr.args.get('op', '>')} {self.value(instr.args['arg2'])})")
+        return None
+
+    def prologue(self):
+        """
+        Заголовок функции, присваивание параметров и обнуление переменных.
+
+        В исходном IR переменная может читаться на пути, где она еще не
+        присвоена; как и в интерпретаторе, она равна 0, поэтому все
+        присваиваемые переменные обнуляются в начале функции.
+        """
+        defined, used = [], []
+        for n in sorted(self.blocks):
+            for instr in self.blocks[n].instructions:
+                d = instr.get_def()
+                if isinstance(d, Variable) and d not in defined:
+                    defined.append(d)
+                for val in instr.get_uses():
+                    if isinstance(val, Variable) and val not in used:
+                        used.append(val)
+        params = [var for var in used if var not in defined]
+        names = sorted(set(var.name for var in params))
+        lines = [f"def {FUNCTION}({', '.join(f'{name}=0' for name in names)}):"]
+        for var in params:
+            lines.append(f"    {self.name(var)} = {var.name}")
+        for var in defined:
+            lines.append(f"    {self.name(var)} = 0")
+        return '\n'.join(lines) + '\n'
+
+    # ==== СТРУКТУРНЫЙ КОД ====
+
+    def structured_body(self):
+        """Текст тела функции из вложенных if/while"""
+        reverse = nx.DiGraph()
+        reverse.add_node(EXIT)
+        for n, bb in self.blocks.items():
+            reverse.add_node(n)
+            for succ in bb.get_successors():
+                reverse.add_edge(succ, n)
+            if bb.instructions and bb.instructions[-1].typ == RET:
+                reverse.add_edge(EXIT, n)
+        self.ipdom = nx.immediate_dominators(reverse, EXIT)
+
+        self.loops = {}         # заголовок цикла -> цикл
+        self.follow = {}        # заголовок цикла -> блок после цикла или None
+        for loop in find_loops(self.blocks):
+            targets = set(to for _, to in loop.exits(self.blocks))
+            if len(targets) > 1:
+                raise Unstructured()
+            self.loops[loop.header] = loop
+            self.follow[loop.header] = targets.pop() if targets else None
+
+        self.lines = []
+        self.emitted = set()
+        self.duplicated = 0
+        self.emit_region(ENTRY, None, [], 1)
+        if self.emitted != set(reverse_post_order(self.blocks)):
+            raise Unstructured()
+        return '\n'.join(self.lines) + '\n'
+
+    def line(self, indent, text):
+        """Добавляет строку с отступом"""
+        self.lines.append('    ' * indent + text)
+
+    def jump(self, dest, loops):
+        """Оператор перехода в цикле (continue, break) или None для обычного перехода"""
+        if not loops:
+            return None
+        loop = loops[-1]
+        if dest == loop.header:
+            return 'continue'
+        if dest == self.follow[loop.header]:
+            return 'break'
+        if dest not in loop.blocks:
+            raise Unstructured()
+        return None
+
+    def emit_region(self, n, stop, loops, indent):
+        """
+        Выводит блоки, начиная с n, до блока stop.
+
+        Args:
+            n: Первый блок области
+            stop: Блок слияния, которым область заканчивается (или None)
+            loops: Стек объемлющих циклов
+            indent: Уровень отступа
+        """
+        while n is not None and n != stop:
+            if n in self.loops and (not loops or loops[-1].header != n):
+                loop = self.loops[n]
+                self.line(indent, 'while True:')
+                self.emit_region(n, None, loops + [loop], indent + 1)
+                n = self.follow[n]
+                continue
+
+            instrs = self.blocks[n].instructions
+            if n in self.emitted:
+                self.duplicated += len(instrs)
+                if self.duplicated > DUPLICATE_BUDGET:
+                    raise Unstructured()
+            self.emitted.add(n)
+            for instr in instrs:
+                text = self.statement(instr)
+                if text is not None:
+                    self.line(indent, text)
+
+            term = instrs[-1]
+            if term.typ == RET:
+                self.line(indent, f"return {self.value(term.args['value'])}")
+                return
+            if term.typ == BR:
+                keyword = self.jump(term.args['dest'], loops)
+                if keyword is not None:
+                    self.line(indent, keyword)
+                    return
+                n = term.args['dest']
+                continue
+
+            follow = self.ipdom.get(n)
+            if follow == EXIT or (loops and (follow not in loops[-1].blocks
+                                             or follow == loops[-1].header)):
+                follow = None
+            self.line(indent, f"if {self.value(term.args['cond'])}:")
+            self.emit_branch(term.args['dest1'], follow, loops, indent + 1)
+            self.line(indent, 'else:')
+            self.emit_branch(term.args['dest2'], follow, loops, indent + 1)
+            n = follow
+
+    def emit_branch(self, dest, follow, loops, indent):
+        """Выводит ветвь условного перехода до блока слияния follow"""
+        keyword = None if dest == follow else self.jump(dest, loops)
+        if keyword is not None:
+            self.line(indent, keyword)
+            return
+        count = len(self.lines)
+        self.emit_region(dest, follow, loops, indent)
+        # Ветвь без инструкций (в том числе из одних пустых блоков)
+        if len(self.lines) == count:
+            self.line(indent, 'pass')
+
+    # ==== КОНЕЧНЫЙ АВТОМАТ ====
+
+    def state_machine_body(self):
+        """Текст тела функции: цикл с выбором очередного блока по номеру"""
+        lines = [f"    block = {ENTRY}", "    while True:"]
+        for i, n in enumerate(reverse_post_order(self.blocks)):
+            lines.append(f"        {'if' if i == 0 else 'elif'} block == {n}:")
+            for instr in self.blocks[n].instructions:
+                text = self.statement(instr)
+                if text is not None:
+                    lines.append(f"            {text}")
+            term = self.blocks[n].instructions[-1]
+            if term.typ == RET:
+                lines.append(f"            return {self.value(term.args['value'])}")
+            elif term.typ == BR:
+                lines.append(f"            block = {term.args['dest']}")
+            else:
+                lines.append(f"            block = {term.args['dest1']} if "
+                             f"{self.value(term.args['cond'])} else {term.args['dest2']}")
+        return '\n'.join(lines) + '\n'
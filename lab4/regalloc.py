@@ -0,0 +1,206 @@
+"""
+Распределение регистров над SSA-формой.
+
+Граф интерференции SSA-программы хордален: значение интерферирует с
+теми значениями, которые живы в точке его определения, а определения
+доминируют над использованиями. Поэтому обход определений в порядке
+доминирования - совершенный порядок исключения, и жадная раскраска в
+этом порядке использует ровно столько цветов, каково наибольшее число
+одновременно живых значений (давление). Выгрузка и раскраска разделены:
+сначала значения выгружаются, пока давление в каждой точке программы
+не станет не больше числа регистров, затем граф без выгруженных значений
+раскрашивается без новых выгрузок.
+
+Выгруженное значение хранится в ячейке памяти все время жизни, а
+инструкции обращаются к нему как к операнду в памяти. Стоимость выгрузки -
+число определений и использований значения, взвешенное как 10 в степени
+глубины вложенности циклов блока. Phi-функции остаются в программе:
+при выходе из SSA их копирования становятся пересылками между
+регистрами и ячейками.
+"""
+
+from BB import *
+from cfg import *
+from loops import find_loops, loop_depths
+
+
+class RegisterAllocator:
+    """
+    Проход распределения регистров.
+
+    Программа не изменяется: результат - отображение значений в номера
+    регистров (assignment) и в номера ячеек памяти (spilled).
+    """
+
+    def __init__(self, blocks, verbose=True, registers=8):
+        """
+        Args:
+            blocks: Базовые блоки программы в SSA-форме
+            verbose: Флаг, управляющий выводом отладочной информации
+            registers: Число регистров целевой машины
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+        self.registers = registers
+
+        # Результат и статистика прохода
+        self.assignment = {}    # значение -> номер регистра
+        self.spilled = {}       # выгруженное значение -> номер ячейки памяти
+        self.max_pressure = 0   # наибольшее давление до выгрузки
+
+    @property
+    def registers_used(self):
+        """Число использованных регистров"""
+        return len(set(self.assignment.values()))
+
+    def run(self):
+        """
+        Выполняет распределение регистров.
+
+        Returns:
+            list: Блоки программы, упорядоченные по номерам
+        """
+        self.build_interference()
+        self.spill()
+        self.color()
+
+        if self.verbose:
+            print(f"Распределение регистров: регистров: {self.registers}, "
+                  f"использовано: {self.registers_used}, "
+                  f"выгружено значений: {len(self.spilled)}, "
+                  f"наибольшее давление: {self.max_pressure}")
+            for var in self.order:
+                if var in self.assignment:
+                    print(f"  {var}: r{self.assignment[var]}")
+                else:
+                    print(f"  {var}: память [{self.spilled[var]}]")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    # ==== ИНТЕРФЕРЕНЦИЯ ====
+
+    def add_interference(self, a, b):
+        """Добавляет ребро интерференции между значениями a и b"""
+        self.interference.setdefault(a, set()).add(b)
+        self.interference.setdefault(b, set()).add(a)
+
+    def define(self, d, live):
+        """Учитывает определение значения d при живых значениях live"""
+        self.interference.setdefault(d, set())
+        for v in live:
+            if v != d:
+                self.add_interference(d, v)
+
+    def add_cost(self, val, weight):
+        """Учитывает определение или использование значения в стоимости выгрузки"""
+        if isinstance(val, Variable):
+            self.cost[val] = self.cost.get(val, 0) + weight
+
+    def build_interference(self):
+        """
+        Строит граф интерференции, точки давления и стоимости выгрузки.
+
+        Точка давления - множество значений, одновременно занимающих
+        регистры: перед инструкцией (живые значения) и в момент
+        определения (живые после инструкции и ее результат). Значения,
+        живые на входе в программу, считаются определенными в ее начале.
+        """
+        preds = build_preds(self.blocks)
+        idom = immediate_dominators(self.blocks)
+        live_in, live_out = ssa_liveness(self.blocks, preds)
+        depth = loop_depths(find_loops(self.blocks))
+
+        self.interference = {}
+        self.points = []
+        self.cost = {}
+        # Определения по номерам достижимых блоков в порядке инструкций
+        defs = {}
+        for n in idom:
+            bb = self.blocks[n]
+            weight = 10 ** depth.get(n, 0)
+            live = set(live_out[n])
+            block_defs = []
+            phi_defs = []
+            for instr in reversed(bb.instructions):
+                d = instr.get_def()
+                if instr.typ == PHI:
+                    phi_defs.append(d)
+                    self.add_cost(d, weight)
+                    for pred, val in zip(instr.args['blocks'], instr.args['from']):
+                        self.add_cost(val, 10 ** depth.get(pred, 0))
+                    continue
+                if isinstance(d, Variable):
+                    self.define(d, live)
+                    self.points.append(live | {d})
+                    self.add_cost(d, weight)
+                    block_defs.append(d)
+                    live.discard(d)
+                for val in instr.get_uses():
+                    if isinstance(val, Variable):
+                        live.add(val)
+                        self.add_cost(val, weight)
+                self.points.append(set(live))
+
+            # Результаты phi-функций определяются одновременно в начале блока
+            for d in phi_defs:
+                self.define(d, live | set(phi_defs))
+            self.points.append(live | set(phi_defs))
+            defs[n] = list(reversed(phi_defs)) + list(reversed(block_defs))
+
+        params = sorted(live_in[ENTRY], key=lambda v: (v.name, v.version))
+        for d in params:
+            self.define(d, params)
+
+        # Порядок доминирования: прямой обход дерева доминаторов
+        self.order = list(params)
+        children = dominator_tree(idom)
+        stack = [ENTRY]
+        while stack:
+            n = stack.pop()
+            self.order.extend(defs[n])
+            stack.extend(reversed(children[n]))
+
+        self.max_pressure = max((len(p) for p in self.points), default=0)
+
+    # ==== ВЫГРУЗКА ====
+
+    def spill(self):
+        """
+        Выгружает значения, пока давление превышает число регистров.
+
+        Из значений, живых в перегруженных точках, выбирается значение
+        с наименьшей стоимостью на одну перегруженную точку: выгрузка
+        значения, живого во многих таких точках, снижает давление сразу
+        во всех них.
+        """
+        while True:
+            excess = {}
+            for point in self.points:
+                live = [v for v in point if v not in self.spilled]
+                if len(live) > self.registers:
+                    for v in live:
+                        excess[v] = excess.get(v, 0) + 1
+            if not excess:
+                break
+            victim = min(excess, key=lambda v: (self.cost.get(v, 0) / excess[v],
+                                                v.name, v.version))
+            self.spilled[victim] = len(self.spilled)
+
+    # ==== РАСКРАСКА ====
+
+    def color(self):
+        """
+        Раскрашивает граф жадно в порядке доминирования.
+
+        Раскрашенные соседи значения живы в точке его определения, поэтому
+        их не больше, чем давление в этой точке без единицы: номер
+        регистра всегда меньше числа регистров.
+        """
+        for d in self.order:
+            if d in self.spilled:
+                continue
+            used = set(self.assignment[v] for v in self.interference[d] if v in self.assignment)
+            reg = 0
+            while reg in used:
+                reg += 1
+            self.assignment[d] = reg
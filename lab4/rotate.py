@@ -0,0 +1,229 @@
+"""
+Поворот циклов: цикл while превращается в цикл do-while с защитной проверкой.
+
+Цикл, построенный Parser._parse_while, на каждой итерации выполняет
+переход в блок условия, сравнение, условный переход и переход обратно
+из тела. После поворота проверка условия копируется в предзаголовок
+(защита: выполняется ли хотя бы одна итерация) и в конец тела, а бывший
+заголовок удаляется. Каждая итерация выполняет один условный переход.
+
+Поворот выполняется над SSA-формой: phi-функции заголовка переносятся
+в первый блок тела, а для значений, используемых после цикла, в блоке
+выхода создаются phi-функции по рёбрам из защиты и из конца тела.
+"""
+
+from BB import *
+from cfg import *
+from loops import find_loops, ensure_preheader
+
+
+# Инструкции, которые можно копировать из заголовка
+CLONABLE = (STORE, LOAD, ADD, SUB, MUL, ICMP)
+
+
+class LoopRotation:
+    """
+    Проход поворота циклов.
+
+    Поворачиваются циклы с единственным латчем, выходящие только из
+    заголовка, если заголовок содержит лишь phi-функции, вычисления без
+    побочных эффектов и условный переход, а у первого блока тела и у блока
+    выхода единственный предшественник - заголовок.
+    """
+
+    def __init__(self, blocks, verbose=True):
+        """
+        Args:
+            blocks: Базовые блоки программы в SSA-форме (списки инструкций
+                    изменяются на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+
+        # Статистика прохода
+        self.rotated = []       # заголовки повернутых циклов
+
+    def run(self):
+        """
+        Выполняет поворот циклов.
+
+        Returns:
+            list: Блоки программы, упорядоченные по номерам
+        """
+        for loop in find_loops(self.blocks):
+            ensure_preheader(self.blocks, loop)
+
+        # Циклы ищутся заново после каждого поворота: меняются тела
+        # объемлющих циклов и номера заголовков
+        done = set()
+        changed = True
+        while changed:
+            changed = False
+            for loop in find_loops(self.blocks):
+                if loop.header in done:
+                    continue
+                done.add(loop.header)
+                if self.rotate(loop):
+                    changed = True
+                    break
+
+        if self.verbose:
+            print(f"Повернуто циклов: {len(self.rotated)} "
+                  f"(заголовки: {', '.join(map(str, self.rotated))})")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    def rotatable(self, loop, preds):
+        """
+        Проверяет, можно ли повернуть цикл.
+
+        Returns:
+            tuple: (предзаголовок, первый блок тела, блок выхода) или None
+        """
+        pre = loop.preheader(self.blocks, preds)
+        if pre is None or len(loop.latches) != 1 or loop.latches[0] == loop.header:
+            return None
+        exits = loop.exits(self.blocks)
+        if len(exits) != 1 or exits[0][0] != loop.header:
+            return None
+
+        header = self.blocks[loop.header]
+        term = header.instructions[-1]
+        if term.typ != CONDBR:
+            return None
+        for instr in header.instructions[:-1]:
+            if instr.typ != PHI and instr.typ not in CLONABLE:
+                return None
+
+        exit_num = exits[0][1]
+        body_num = term.args['dest1'] if term.args['dest2'] == exit_num else term.args['dest2']
+        if preds[exit_num] != [loop.header] or preds[body_num] != [loop.header]:
+            return None
+        exit_bb = self.blocks[exit_num]
+        if exit_bb.instructions and exit_bb.instructions[0].typ == PHI:
+            return None
+
+        # Переход латча заменяется проверкой условия: латч должен вести
+        # только в заголовок (латч внешнего цикла может быть заголовком
+        # вложенного, и его ребро во внутренний цикл потерялось бы)
+        latch_term = self.blocks[loop.latches[0]].instructions[-1]
+        if latch_term.typ != BR or latch_term.args['dest'] != loop.header:
+            return None
+        return pre, body_num, exit_num
+
+    def rotate(self, loop):
+        """
+        Поворачивает цикл.
+
+        Returns:
+            bool: True, если цикл был повернут
+        """
+        preds = build_preds(self.blocks)
+        shape = self.rotatable(loop, preds)
+        if shape is None:
+            return False
+        pre, body_num, exit_num = shape
+        header = self.blocks[loop.header]
+        latch = self.blocks[loop.latches[0]]
+        body = self.blocks[body_num]
+        exit_bb = self.blocks[exit_num]
+        pre_bb = self.blocks[pre]
+
+        phis = [instr for instr in header.instructions if instr.typ == PHI]
+        computed = [instr for instr in header.instructions[:-1] if instr.typ != PHI]
+        term = header.instructions[-1]
+
+        # Значения заголовка на входе в цикл и на обратном ребре
+        on_entry = dict((phi.args['to'], phi_operand(phi, pre)) for phi in phis)
+        on_back = dict((phi.args['to'], phi_operand(phi, latch.block_num)) for phi in phis)
+        guard, guard_instrs = self.clone(computed, on_entry, pre_bb)
+        bottom, bottom_instrs = self.clone(computed, on_back, latch)
+
+        # Новый предзаголовок между защитой и первым блоком тела
+        new_pre = new_block(self.blocks, pre_bb)
+        new_pre.add_instr(Instruction(BR, {'dest': body_num}))
+
+        # Значения заголовка, используемые в теле и после цикла
+        header_values = [phi.args['to'] for phi in phis] + [instr.args['to'] for instr in computed]
+        used_inside, used_outside = set(), set()
+        for n, bb in self.blocks.items():
+            if n == loop.header:
+                continue
+            target = used_inside if n in loop.blocks else used_outside
+            for instr in bb.instructions:
+                for val in instr.get_uses():
+                    if isinstance(val, Variable):
+                        target.add(val)
+
+        # Phi-функции первого блока тела сохраняют имена значений заголовка.
+        # Значение заголовка, приходящее в его phi-функцию по обратному
+        # ребру, читается в латче, поэтому тоже получает phi-функцию
+        back_values = set(val for val in on_back.values() if isinstance(val, Variable))
+        body_phis = []
+        for val in header_values:
+            if val in on_back or val in used_inside or val in back_values:
+                body_phis.append(Instruction(PHI, {
+                    'to': val,
+                    'from': [guard[val], bottom[val]],
+                    'blocks': [new_pre.block_num, latch.block_num]}))
+
+        # Phi-функции выхода для значений, используемых после цикла
+        exit_phis = []
+        after = {}
+        for val in header_values:
+            if val in used_outside:
+                merged = exit_bb.create_tmp_var()
+                exit_phis.append(Instruction(PHI, {
+                    'to': merged,
+                    'from': [guard[val], bottom[val]],
+                    'blocks': [pre, latch.block_num]}))
+                after[val] = merged
+
+        # Защита в предзаголовке и проверка в конце тела; в тело
+        # защита ведет через новый предзаголовок
+        cond = term.args['cond']
+        guard_term = term.with_args(cond=guard.get(cond, cond))
+        guard_term = guard_term.with_args(**dict(
+            (key, new_pre.block_num) for key in ('dest1', 'dest2')
+            if term.args[key] == body_num))
+        pre_bb.instructions[-1:] = guard_instrs + [guard_term]
+        latch.instructions[-1:] = bottom_instrs + [term.with_args(cond=bottom.get(cond, cond))]
+
+        # Заголовок удаляется, его значения переходят в phi-функции
+        del self.blocks[loop.header]
+        body.instructions[0:0] = body_phis
+        exit_bb.instructions[0:0] = exit_phis
+
+        if after:
+            def resolve(val):
+                return after.get(val, val) if isinstance(val, Variable) else val
+            for n, bb in self.blocks.items():
+                if n not in loop.blocks and n != new_pre.block_num:
+                    bb.instructions = [instr if instr.typ == PHI and bb is exit_bb
+                                       else instr.map_uses(resolve)
+                                       for instr in bb.instructions]
+
+        self.rotated.append(loop.header)
+        return True
+
+    def clone(self, computed, values, bb):
+        """
+        Копирует вычисления заголовка с подстановкой значений phi-функций.
+
+        Args:
+            computed: Инструкции заголовка, кроме phi-функций и перехода
+            values: Значения phi-функций заголовка на входящем ребре
+            bb: Блок, в который помещаются копии
+
+        Returns:
+            tuple: (отображение значений заголовка в их копии, новые инструкции)
+        """
+        current = dict(values)
+        instrs = []
+        for instr in computed:
+            new = instr.map_uses(lambda val: current.get(val, val) if isinstance(val, Variable) else val)
+            var = bb.create_tmp_var()
+            current[instr.args['to']] = var
+            instrs.append(new.with_args(to=var))
+        return current, instrs
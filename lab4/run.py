@@ -2,10 +2,13 @@
 Скрипт для автоматической генерации графов CFG и SSA
 
 Запуск:
-    python run.py [путь_к_файлу]
+    python run.py [--check] [--superopt] [путь_к_файлу]
 
 Если указан путь к файлу, скрипт будет пытаться разобрать его содержимое.
 Иначе используются встроенные примеры программ.
+Флаг --check включает проверку построенной SSA-формы (для отладки).
+Флаг --superopt применяет к SSA-форме базу замен супероптимизатора
+(superopt_db.json).
 """
 
 import os
@@ -13,26 +16,34 @@ import sys
 import subprocess
 import json
 from ssa import SsaBuilder
+from superopt import SuperoptRewrite
 from IR import *
 from parser import Parser
 
 
-def generate_graphs(blocks, name_prefix):
+def generate_graphs(blocks, name_prefix, check=False, superopt=False):
     """
     Генерирует графы CFG и SSA для заданных блоков.
     
     Args:
         blocks: Список базовых блоков
         name_prefix: Префикс для имен выходных файлов
+        check: Флаг проверки корректности построенной SSA-формы
+        superopt: Флаг применения базы замен супероптимизатора к SSA-форме
     
     Returns:
-        SsaBuilder: Построитель SSA с построенной SSA-формой
+        list: Блоки программы в SSA-форме
     """
     # Создаем директорию для результатов
     os.makedirs('results', exist_ok=True)
     
     # Создаем построитель SSA без подробного вывода
-    ssab = SsaBuilder(blocks, verbose=False)
+    ssab = SsaBuilder(blocks, verbose=False, check=check)
+    
+    # Строим SSA-форму (исходные блоки при этом не изменяются)
+    ssa_blocks = ssab.build()
+    if superopt:
+        ssa_blocks = SuperoptRewrite(ssa_blocks).run()
     
     # Генерируем граф потока управления
     cfg_dot_path = f'results/{name_prefix}_cfg.dot'
@@ -43,32 +54,28 @@ def generate_graphs(blocks, name_prefix):
     subprocess.run(['dot', '-Tpng', cfg_dot_path, '-o', f'results/{name_prefix}_cfg.png'], check=True)
     
     # Создаем интерактивный граф CFG в формате D3.js
-    generate_d3_graph(ssab, f'results/{name_prefix}_cfg_interactive.html', is_ssa=False)
-    
-    # Строим SSA-форму
-    ssab.insert_all_phi()
-    ssab.update_variable_versions()
+    generate_d3_graph(ssab.blocks, f'results/{name_prefix}_cfg_interactive.html', is_ssa=False)
     
     # Генерируем граф SSA
     ssa_dot_path = f'results/{name_prefix}_ssa.dot'
     with open(ssa_dot_path, 'w', encoding='utf-8') as f:
-        f.write(ssab.to_graph())
+        f.write(ssab.to_graph(ssa_blocks))
     
     # Конвертируем DOT в PNG
     subprocess.run(['dot', '-Tpng', ssa_dot_path, '-o', f'results/{name_prefix}_ssa.png'], check=True)
     
     # Создаем интерактивный граф SSA в формате D3.js
-    generate_d3_graph(ssab, f'results/{name_prefix}_ssa_interactive.html', is_ssa=True)
+    generate_d3_graph(ssa_blocks, f'results/{name_prefix}_ssa_interactive.html', is_ssa=True)
     
-    return ssab
+    return ssa_blocks
 
 
-def generate_d3_graph(ssab, output_path, is_ssa=False):
+def generate_d3_graph(blocks, output_path, is_ssa=False):
     """
     Генерирует интерактивный граф с использованием D3.js.
     
     Args:
-        ssab: Построитель SSA
+        blocks: Базовые блоки графа
         output_path: Путь к выходному HTML-файлу
         is_ssa: Флаг, указывающий, является ли граф SSA-формой
     """
@@ -79,7 +86,7 @@ def generate_d3_graph(ssab, output_path, is_ssa=False):
     }
     
     # Добавляем узлы
-    for block in ssab.blocks:
+    for block in blocks:
         # Преобразуем содержимое блока в строку
         content = str(block).replace('    ', '').replace('{', '').replace('}', '').strip()
         content = content.replace('\n', '<br>')
@@ -92,7 +99,7 @@ def generate_d3_graph(ssab, output_path, is_ssa=False):
         })
     
     # Добавляем ребра
-    for block in ssab.blocks:
+    for block in blocks:
         # Получаем исходящие ребра из блока
         edges = block.get_edges()
         
@@ -323,12 +330,14 @@ def generate_d3_graph(ssab, output_path, is_ssa=False):
         ))
 
 
-def process_input_file(file_path):
+def process_input_file(file_path, check=False, superopt=False):
     """
     Обрабатывает входной файл с кодом.
     
     Args:
         file_path: Путь к файлу с исходным кодом
+        check: Флаг проверки корректности построенной SSA-формы
+        superopt: Флаг применения базы замен супероптимизатора к SSA-форме
         
     Returns:
         bool: True если обработка успешна, False в противном случае
@@ -348,7 +357,7 @@ def process_input_file(file_path):
         
         # Генерируем графы
         name_prefix = os.path.splitext(os.path.basename(file_path))[0]
-        generate_graphs(blocks, name_prefix)
+        generate_graphs(blocks, name_prefix, check, superopt)
         
         return True
     except Exception as e:
@@ -362,10 +371,16 @@ def main():
     
     Обрабатывает аргументы командной строки и запускает генерацию графов.
     """
+    # Разбираем аргументы командной строки
+    args = sys.argv[1:]
+    check = '--check' in args
+    superopt = '--superopt' in args
+    args = [arg for arg in args if arg not in ('--check', '--superopt')]
+    
     # Проверяем наличие аргументов командной строки
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-        if process_input_file(input_file):
+    if args:
+        input_file = args[0]
+        if process_input_file(input_file, check, superopt):
             print(f"Графы успешно сгенерированы для файла {input_file}")
             return
     
@@ -381,7 +396,7 @@ def main():
     
     for blocks, name, description in examples:
         print(f"Генерация графов для примера: {description}")
-        generate_graphs(blocks, name)
+        generate_graphs(blocks, name, check, superopt)
     
     # Выводим информацию о сгенерированных файлах
     print("\nГрафы успешно сгенерированы в директории 'results/':")
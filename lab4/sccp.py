@@ -0,0 +1,252 @@
+"""
+Разреженное условное распространение констант (SCCP) над SSA-формой.
+
+Алгоритм Вегмана-Задека: значения переменных отслеживаются в решетке
+"не определено" -> константа -> "переопределено", причем учитываются только
+рёбра графа, которые могут выполниться. После анализа константные
+инструкции сворачиваются, решенные условные переходы заменяются
+безусловными, а недостижимые блоки удаляются.
+"""
+
+from BB import *
+from cfg import *
+
+
+# Значения решетки помимо констант
+UNDEF = 'undef'              # значение еще не вычислено
+OVERDEFINED = 'overdefined'  # значение не является константой
+
+
+def meet(a, b):
+    """Объединение двух значений решетки"""
+    if a == UNDEF:
+        return b
+    if b == UNDEF:
+        return a
+    if a == b:
+        return a
+    return OVERDEFINED
+
+
+class Sccp:
+    """
+    Проход распространения констант по SSA-форме.
+
+    Работает с блоками, построенными SsaBuilder: phi-функции хранят
+    блоки-предшественники в аргументе 'blocks'.
+    """
+
+    def __init__(self, blocks, verbose=True):
+        """
+        Args:
+            blocks: Базовые блоки программы в SSA-форме (списки инструкций
+                    изменяются на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+
+        # Статистика прохода
+        self.folded = 0             # удалено инструкций с константным результатом
+        self.branches_folded = 0    # условных переходов заменено безусловными
+        self.blocks_removed = 0     # удалено недостижимых блоков
+
+    def run(self):
+        """
+        Выполняет анализ и преобразование.
+
+        Returns:
+            list: Оставшиеся блоки программы, упорядоченные по номерам
+        """
+        self.analyze()
+        self.transform()
+
+        if self.verbose:
+            print(f"SCCP: свернуто инструкций: {self.folded}, "
+                  f"переходов: {self.branches_folded}, "
+                  f"удалено блоков: {self.blocks_removed}")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    # ==== АНАЛИЗ ====
+
+    def analyze(self):
+        """Вычисляет значения переменных и выполнимые рёбра"""
+        self.value = {}
+        self.executable_edges = set()
+        self.executable_blocks = set()
+
+        # Цепочки определение-использование: переменная -> места использования
+        self.uses = {}
+        self.defined = set()
+        for n, bb in self.blocks.items():
+            for instr in bb.instructions:
+                for val in instr.get_uses():
+                    if isinstance(val, Variable):
+                        self.uses.setdefault(val, []).append((n, instr))
+                d = instr.get_def()
+                if isinstance(d, Variable):
+                    self.defined.add(d)
+
+        flow_worklist = [(None, ENTRY)]
+        self.ssa_worklist = []
+        self.flow_worklist = flow_worklist
+
+        while flow_worklist or self.ssa_worklist:
+            while flow_worklist:
+                pred, n = flow_worklist.pop()
+                if (pred, n) in self.executable_edges:
+                    continue
+                self.executable_edges.add((pred, n))
+
+                if n not in self.executable_blocks:
+                    # Блок выполняется впервые - вычисляем все инструкции
+                    self.executable_blocks.add(n)
+                    for instr in self.blocks[n].instructions:
+                        self.visit(n, instr)
+                else:
+                    # Новое входящее ребро влияет только на phi-функции
+                    for instr in self.blocks[n].instructions:
+                        if instr.typ != PHI:
+                            break
+                        self.visit(n, instr)
+
+            while self.ssa_worklist:
+                var = self.ssa_worklist.pop()
+                for n, instr in self.uses.get(var, ()):
+                    if n in self.executable_blocks:
+                        self.visit(n, instr)
+
+    def operand_value(self, val):
+        """Возвращает значение операнда в решетке"""
+        if isinstance(val, Variable):
+            if val not in self.defined:
+                return OVERDEFINED
+            return self.value.get(val, UNDEF)
+        c = const_value(val)
+        return OVERDEFINED if c is None else c
+
+    def visit(self, n, instr):
+        """Вычисляет инструкцию блока n и обновляет решетку или выполнимые рёбра"""
+        if instr.typ == BR:
+            self.flow_worklist.append((n, instr.args['dest']))
+            return
+
+        if instr.typ == CONDBR:
+            cond = self.operand_value(instr.args['cond'])
+            if cond == UNDEF:
+                return
+            if cond == OVERDEFINED or cond:
+                self.flow_worklist.append((n, instr.args['dest1']))
+            if cond == OVERDEFINED or not cond:
+                self.flow_worklist.append((n, instr.args['dest2']))
+            return
+
+        d = instr.get_def()
+        if not isinstance(d, Variable):
+            return
+
+        new = self.evaluate(n, instr)
+        old = self.value.get(d, UNDEF)
+        new = meet(old, new)
+        if new != old:
+            self.value[d] = new
+            self.ssa_worklist.append(d)
+
+    def evaluate(self, n, instr):
+        """Вычисляет значение, определяемое инструкцией, в решетке"""
+        if instr.typ == PHI:
+            result = UNDEF
+            for pred, val in zip(instr.args['blocks'], instr.args['from']):
+                if (pred, n) in self.executable_edges:
+                    result = meet(result, self.operand_value(val))
+            return result
+
+        if instr.typ in (STORE, LOAD):
+            return self.operand_value(instr.args['from'])
+
+        if instr.typ in ARITH_OPS or instr.typ == ICMP:
+            if instr.typ == ICMP:
+                a = self.operand_value(instr.args['arg1'])
+                b = self.operand_value(instr.args['arg2'])
+            else:
+                a = self.operand_value(instr.args['oper1'])
+                b = self.operand_value(instr.args['oper2'])
+
+            # Умножение на ноль дает ноль при любом втором операнде
+            if instr.typ == MUL and (a == 0 or b == 0) and a != UNDEF and b != UNDEF:
+                return 0
+            if OVERDEFINED in (a, b):
+                return OVERDEFINED
+            if UNDEF in (a, b):
+                return UNDEF
+            return evaluate(instr.typ, a, b, instr.args.get('op', '>'))
+
+        return OVERDEFINED
+
+    # ==== ПРЕОБРАЗОВАНИЕ ====
+
+    def constant_of(self, val):
+        """Возвращает константу, которой заменяется операнд, или сам операнд"""
+        if isinstance(val, Variable):
+            c = self.value.get(val)
+            if c not in (None, UNDEF, OVERDEFINED):
+                return IntConst(c)
+        return val
+
+    def transform(self):
+        """Сворачивает константы, решенные переходы и удаляет недостижимые блоки"""
+        # Удаляем недостижимые блоки
+        for n in list(self.blocks):
+            if n not in self.executable_blocks:
+                del self.blocks[n]
+                self.blocks_removed += 1
+
+        replace = {}
+        for n, bb in self.blocks.items():
+            instructions = []
+            for instr in bb.instructions:
+                d = instr.get_def()
+                if isinstance(d, Variable) and self.constant_of(d) is not d:
+                    # Значение константно - все использования будут заменены
+                    self.folded += 1
+                    continue
+
+                if instr.typ == PHI:
+                    instr = self.prune_phi(n, instr)
+                    distinct = set(map(str, instr.args['from']))
+                    if len(distinct) == 1:
+                        # Все выполнимые входы дают одно и то же значение
+                        replace[instr.args['to']] = instr.args['from'][0]
+                        self.folded += 1
+                        continue
+
+                instr = instr.map_uses(self.constant_of)
+
+                if instr.typ == CONDBR:
+                    targets = [dest for dest in (instr.args['dest1'], instr.args['dest2'])
+                               if (n, dest) in self.executable_edges]
+                    if len(set(targets)) == 1:
+                        instr = Instruction(BR, {'dest': targets[0]})
+                        self.branches_folded += 1
+                instructions.append(instr)
+            bb.instructions = instructions
+
+        # Подставляем операнды вырожденных phi-функций
+        if replace:
+            def resolve(val):
+                while isinstance(val, Variable) and val in replace:
+                    val = replace[val]
+                return val
+
+            for bb in self.blocks.values():
+                bb.instructions = [instr.map_uses(resolve) for instr in bb.instructions]
+
+    def prune_phi(self, n, instr):
+        """Удаляет операнды phi-функции, приходящие по невыполнимым рёбрам"""
+        pairs = [(pred, val) for pred, val in zip(instr.args['blocks'], instr.args['from'])
+                 if (pred, n) in self.executable_edges]
+        if len(pairs) == len(instr.args['blocks']):
+            return instr
+        return instr.with_args(**{'blocks': [pred for pred, _ in pairs],
+                                  'from': [val for _, val in pairs]})
@@ -0,0 +1,602 @@
+"""
+Скалярная эволюция (SCEV) и замена финальных значений циклов.
+
+Значения phi-функций заголовка цикла описываются рекуррентностями сложения
+{c0, +, c1, +, ..., +, cm}: на итерации k значение равно
+c0 * C(k, 0) + c1 * C(k, 1) + ... + cm * C(k, m). Например, счетчик
+i = 0, 1, 2, ... - это {0, +, 1}, а сумма s = s + i - это {0, +, 0, +, 1}.
+Коэффициенты - линейные комбинации инвариантов цикла с целыми множителями.
+
+Если известно число итераций цикла, значения, используемые после цикла,
+заменяются их замкнутыми формами. Цикл, результаты которого больше
+не нужны, удаляется.
+"""
+
+from BB import *
+from cfg import *
+from loops import find_loops, ensure_preheader
+
+
+# Поменять местами операнды сравнения
+SWAPPED_CMP = {'>': '<', '<': '>', '>=': '<=', '<=': '>=', '==': '==', '!=': '!='}
+
+# Отрицание сравнения
+INVERTED_CMP = {'>': '<=', '<': '>=', '>=': '<', '<=': '>', '==': '!=', '!=': '=='}
+
+
+# ==== КОЭФФИЦИЕНТЫ ====
+# Коэффициент - словарь {инвариант: целый множитель}, ключ None - свободный член
+
+def coef_of(val):
+    """Возвращает коэффициент, равный операнду-инварианту"""
+    c = const_value(val)
+    if c is not None:
+        return {None: c}
+    return {val: 1}
+
+
+def coef_add(a, b, scale=1):
+    """Возвращает a + scale * b"""
+    result = dict(a)
+    for key, n in b.items():
+        result[key] = result.get(key, 0) + scale * n
+    return dict((key, n) for key, n in result.items() if n != 0)
+
+
+def coef_constant(coef):
+    """Возвращает число, если коэффициент постоянен, иначе None"""
+    if all(key is None for key in coef):
+        return coef.get(None, 0)
+    return None
+
+
+def chain_add(a, b, scale=1):
+    """Складывает рекуррентности одного цикла: {a0, +, a1, ...} + scale * {b0, +, b1, ...}"""
+    length = max(len(a), len(b))
+    a = a + [{}] * (length - len(a))
+    b = b + [{}] * (length - len(b))
+    return [coef_add(x, y, scale) for x, y in zip(a, b)]
+
+
+def binomial(k, j):
+    """Биномиальный коэффициент C(k, j)"""
+    result = 1
+    for t in range(j):
+        result = result * (k - t) // (t + 1)
+    return result
+
+
+class ScalarEvolution:
+    """
+    Анализ рекуррентностей значений одного цикла.
+
+    Значение, вычисленное в цикле, выражается рекуррентностью (списком
+    коэффициентов) или не выражается (None).
+    """
+
+    def __init__(self, blocks_by_num, loop):
+        """
+        Args:
+            blocks_by_num: Словарь {номер блока: BB} программы в SSA-форме
+            loop: Цикл (loops.Loop) с единственным латчем
+        """
+        self.blocks = blocks_by_num
+        self.loop = loop
+        self.latch = loop.latches[0]
+        self.defs = {}
+        self.header_phis = {}
+        for n in loop.blocks:
+            for instr in blocks_by_num[n].instructions:
+                d = instr.get_def()
+                if isinstance(d, Variable):
+                    self.defs[d] = instr
+                    if instr.typ == PHI and n == loop.header:
+                        self.header_phis[d] = instr
+        # Вычисленные узлы: (значение, None) - рекуррентность значения,
+        # (значение, phi) - разложение count * phi + R
+        self.cache = {}
+
+    def chain(self, val):
+        """
+        Возвращает рекуррентность значения или None.
+
+        Returns:
+            list: Коэффициенты [c0, c1, ...] или None
+        """
+        node = self.chain_node(val)
+        if node is not None:
+            self.evaluate(node)
+        return self.lookup_chain(val)
+
+    def linear_in_self(self, val, phi):
+        """
+        Выражает значение в виде count * phi + R.
+
+        Returns:
+            tuple: (count, R) или None
+        """
+        node = self.linear_node(val, phi)
+        if node is not None:
+            self.evaluate(node)
+        return self.lookup_linear(val, phi)
+
+    # ==== УЗЛЫ ВЫЧИСЛЕНИЯ ====
+
+    def chain_node(self, val):
+        """Узел рекуррентности значения или None для инварианта цикла"""
+        if not isinstance(val, Variable) or val not in self.defs:
+            return None
+        return (val, None)
+
+    def linear_node(self, val, phi):
+        """Узел разложения значения относительно phi или None, если оно известно сразу"""
+        if val == phi:
+            return None
+        if not isinstance(val, Variable) or val not in self.defs or val in self.header_phis:
+            return self.chain_node(val)
+        return (val, phi)
+
+    def lookup_chain(self, val):
+        """Рекуррентность значения из вычисленных узлов (None для незавершенного узла)"""
+        node = self.chain_node(val)
+        if node is None:
+            # Инвариант цикла
+            return [coef_of(val)]
+        return self.cache.get(node)
+
+    def lookup_linear(self, val, phi):
+        """Разложение значения из вычисленных узлов (None для незавершенного узла)"""
+        if val == phi:
+            return 1, []
+        node = self.linear_node(val, phi)
+        if node is None or node[1] is None:
+            chain = self.lookup_chain(val)
+            return None if chain is None else (0, chain)
+        return self.cache.get(node)
+
+    def operands(self, instr):
+        """Операнды инструкции, от которых зависят рекуррентность и разложение"""
+        if instr.typ in (STORE, LOAD):
+            return [instr.args['from']]
+        if instr.typ in ARITH_OPS:
+            return [instr.args['oper1'], instr.args['oper2']]
+        return []
+
+    def dependencies(self, node):
+        """Узлы, значения которых нужны для вычисления узла"""
+        val, phi = node
+        instr = self.defs[val]
+        if phi is None and val in self.header_phis:
+            deps = [self.linear_node(phi_operand(instr, self.latch), val)]
+        elif phi is None:
+            deps = [self.chain_node(x) for x in self.operands(instr)]
+        else:
+            deps = [self.linear_node(x, phi) for x in self.operands(instr)]
+        return [dep for dep in deps if dep is not None]
+
+    def evaluate(self, root):
+        """
+        Вычисляет узел и все нужные ему узлы в обратном порядке обхода
+        в глубину (с явным стеком, цепочки определений могут быть длинными).
+
+        Узел, который встречается снова, пока вычисляются зависящие от
+        него узлы (цикл через phi-функции), считается невыразимым (None)
+        для них, но вычисляется сам по себе.
+        """
+        in_progress = set()
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in self.cache:
+                continue
+            if expanded:
+                in_progress.discard(node)
+                self.cache[node] = self.compute(node)
+                continue
+            if node in in_progress:
+                continue
+            in_progress.add(node)
+            stack.append((node, True))
+            for dep in reversed(self.dependencies(node)):
+                if dep not in self.cache and dep not in in_progress:
+                    stack.append((dep, False))
+
+    def compute(self, node):
+        """Вычисляет узел по уже вычисленным зависимостям"""
+        val, phi = node
+        instr = self.defs[val]
+        if phi is None and val in self.header_phis:
+            return self.phi_chain(val, instr)
+        if phi is None:
+            return self.expression_chain(instr)
+        return self.linear_expression(instr, phi)
+
+    # ==== РЕКУРРЕНТНОСТИ ====
+
+    def phi_chain(self, phi, instr):
+        """
+        Решает рекуррентность phi-функции заголовка x = phi(init, x + R).
+
+        Returns:
+            list: {init, +, R} или None
+        """
+        init = [v for p, v in zip(instr.args['blocks'], instr.args['from'])
+                if p not in self.loop.blocks]
+        if len(init) != 1 or (isinstance(init[0], Variable) and init[0] in self.defs):
+            return None
+
+        # Приращение выражается относительно самой phi-функции: x + R
+        update = self.lookup_linear(phi_operand(instr, self.latch), phi)
+        if update is None:
+            return None
+        count, step = update
+        if count != 1:
+            return None
+        return [coef_of(init[0])] + step
+
+    def linear_expression(self, instr, phi):
+        """Выражает результат инструкции в виде count * phi + R (см. linear_in_self)"""
+        if instr.typ in (STORE, LOAD):
+            return self.lookup_linear(instr.args['from'], phi)
+        if instr.typ not in ARITH_OPS:
+            return None
+
+        a = self.lookup_linear(instr.args['oper1'], phi)
+        b = self.lookup_linear(instr.args['oper2'], phi)
+        if a is None or b is None:
+            return None
+        if instr.typ == ADD:
+            return a[0] + b[0], chain_add(a[1], b[1])
+        if instr.typ == SUB:
+            return a[0] - b[0], chain_add(a[1], b[1], -1)
+
+        # Умножение допустимо только на постоянный множитель
+        for x, y in ((a, b), (b, a)):
+            if y[0] == 0 and len(y[1]) == 1 and coef_constant(y[1][0]) is not None:
+                c = coef_constant(y[1][0])
+                return x[0] * c, [coef_add({}, coef, c) for coef in x[1]]
+        return None
+
+    def expression_chain(self, instr):
+        """Вычисляет рекуррентность инструкции по рекуррентностям операндов"""
+        if instr.typ in (STORE, LOAD):
+            return self.lookup_chain(instr.args['from'])
+        if instr.typ not in ARITH_OPS:
+            return None
+        a = self.lookup_chain(instr.args['oper1'])
+        b = self.lookup_chain(instr.args['oper2'])
+        if a is None or b is None:
+            return None
+        if instr.typ == ADD:
+            return chain_add(a, b)
+        if instr.typ == SUB:
+            return chain_add(a, b, -1)
+        for x, y in ((a, b), (b, a)):
+            if len(y) == 1 and coef_constant(y[0]) is not None:
+                c = coef_constant(y[0])
+                return [coef_add({}, coef, c) for coef in x]
+        return None
+
+
+# ==== ЧИСЛО ИТЕРАЦИЙ ====
+
+def exit_test(blocks_by_num, loop):
+    """
+    Находит условие выхода из цикла.
+
+    Returns:
+        tuple: (сравнение, блок выхода, True если переход в цикл по
+               истинному условию) или None
+    """
+    exits = loop.exits(blocks_by_num)
+    if len(exits) != 1 or exits[0][0] != loop.header:
+        return None
+    header = blocks_by_num[loop.header]
+    term = header.instructions[-1]
+    if term.typ != CONDBR:
+        return None
+    cond = term.args['cond']
+    cmp = next((instr for instr in header.instructions
+                if instr.typ == ICMP and instr.args['to'] == cond), None)
+    if cmp is None:
+        return None
+    return cmp, exits[0][1], term.args['dest1'] in loop.blocks
+
+
+def trip_count(scev, cmp, stay_on_true):
+    """
+    Вычисляет число итераций цикла.
+
+    Returns:
+        tuple: (число итераций или None, параметры символьного случая или None);
+               символьный случай - (счетчик, сравнение "счетчик op граница",
+               граница, шаг)
+    """
+    op = cmp.args.get('op', '>')
+    a, b = cmp.args['arg1'], cmp.args['arg2']
+    chain_a, chain_b = scev.chain(a), scev.chain(b)
+    if chain_a is None or chain_b is None:
+        return None, None
+    # Приводим к виду "счетчик op граница"
+    if len(chain_a) == 1 and len(chain_b) == 2:
+        chain_a, chain_b, a, b = chain_b, chain_a, b, a
+        op = SWAPPED_CMP[op]
+    if len(chain_a) != 2 or len(chain_b) != 1:
+        return None, None
+    if not stay_on_true:
+        op = INVERTED_CMP[op]
+
+    step = coef_constant(chain_a[1])
+    start = coef_constant(chain_a[0])
+    limit = coef_constant(chain_b[0])
+    if step is None or step == 0:
+        return None, None
+
+    if start is not None and limit is not None:
+        return constant_trip_count(start, step, op, limit), None
+
+    # Символьное число итераций: шаг 1 при '<', '<=' или -1 при '>', '>='
+    if (step == 1 and op in ('<', '<=')) or (step == -1 and op in ('>', '>=')):
+        return None, (chain_a, op, chain_b[0], step)
+    return None, None
+
+
+def constant_trip_count(start, step, op, limit):
+    """Число итераций цикла "пока start + step * k op limit" или None"""
+    if op == '<=':
+        op, limit = '<', limit + 1
+    if op == '>=':
+        op, limit = '>', limit - 1
+    if op == '<':
+        if start >= limit:
+            return 0
+        return -((start - limit) // step) if step > 0 else None
+    if op == '>':
+        if start <= limit:
+            return 0
+        return -((limit - start) // -step) if step < 0 else None
+    if op == '!=':
+        if (limit - start) % step == 0 and (limit - start) // step >= 0:
+            return (limit - start) // step
+        return None
+    if op == '==':
+        return 1 if start == limit else 0
+    return None
+
+
+class FinalValueReplacement:
+    """
+    Замена значений, используемых после цикла, замкнутыми формами.
+
+    Обрабатываются циклы с единственным латчем и единственным выходом
+    из заголовка. При постоянном числе итераций заменяются все значения,
+    для которых найдена рекуррентность. При числе итераций, зависящем от
+    инвариантов (шаг счетчика 1 или -1), цикл заменяется проверкой
+    "выполняется ли хотя бы одна итерация" и вычислением линейных
+    замкнутых форм, если так можно заменить все значения после цикла.
+    """
+
+    def __init__(self, blocks, verbose=True):
+        """
+        Args:
+            blocks: Базовые блоки программы в SSA-форме (списки инструкций
+                    изменяются на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+
+        # Статистика прохода
+        self.replaced = 0           # заменено значений после циклов
+        self.loops_deleted = 0      # удалено циклов
+        self.trip_counts = {}       # заголовок цикла -> число итераций (или 'n')
+
+    def run(self):
+        """
+        Выполняет замену финальных значений во всех циклах.
+
+        Returns:
+            list: Оставшиеся блоки программы, упорядоченные по номерам
+        """
+        for loop in find_loops(self.blocks):
+            ensure_preheader(self.blocks, loop)
+
+        # После удаления цикла структура объемлющих циклов меняется
+        done = set()
+        changed = True
+        while changed:
+            changed = False
+            for loop in find_loops(self.blocks):
+                if loop.header in done:
+                    continue
+                done.add(loop.header)
+                if self.process(loop):
+                    changed = True
+                    break
+
+        if self.verbose:
+            for header in sorted(self.trip_counts):
+                print(f"Цикл с заголовком BLOCK {header}: "
+                      f"итераций: {self.trip_counts[header]}")
+            print(f"Заменено финальных значений: {self.replaced}, "
+                  f"удалено циклов: {self.loops_deleted}")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    # ==== ЗАМЕНА ====
+
+    def process(self, loop):
+        """
+        Заменяет финальные значения одного цикла.
+
+        Returns:
+            bool: True, если цикл был удален
+        """
+        preds = build_preds(self.blocks)
+        pre = loop.preheader(self.blocks, preds)
+        test = exit_test(self.blocks, loop)
+        if pre is None or len(loop.latches) != 1 or test is None:
+            return False
+        cmp, exit_num, stay_on_true = test
+        exit_bb = self.blocks[exit_num]
+        if preds[exit_num] != [loop.header]:
+            return False
+
+        scev = ScalarEvolution(self.blocks, loop)
+        k, symbolic = trip_count(scev, cmp, stay_on_true)
+        if k is None and symbolic is None:
+            return False
+
+        # Значения цикла, используемые после него
+        chains = {}
+        for n, bb in self.blocks.items():
+            if n in loop.blocks:
+                continue
+            for instr in bb.instructions:
+                for val in instr.get_uses():
+                    if isinstance(val, Variable) and val in scev.defs and val not in chains:
+                        chains[val] = scev.chain(val)
+
+        if k is not None:
+            self.trip_counts[loop.header] = k
+            return self.replace_constant(loop, pre, exit_bb, k, chains)
+        if all(c is not None and len(c) <= 2 for c in chains.values()):
+            self.trip_counts[loop.header] = 'n'
+            return self.replace_symbolic(loop, pre, exit_bb, cmp, symbolic, chains)
+        return False
+
+    def replace_constant(self, loop, pre, exit_bb, k, chains):
+        """Заменяет значения при известном числе итераций k"""
+        instrs = []
+        replace = {}
+        for val, chain in chains.items():
+            if chain is None:
+                continue
+            total = {}
+            for j, coef in enumerate(chain):
+                total = coef_add(total, coef, binomial(k, j))
+            replace[val] = self.emit_coef(total, instrs, exit_bb)
+        if not replace:
+            return False
+
+        self.substitute(loop, replace)
+        pos = len([i for i in exit_bb.instructions if i.typ == PHI])
+        exit_bb.instructions[pos:pos] = instrs
+        self.replaced += len(replace)
+
+        if len(replace) == len(chains):
+            self.delete_loop(loop, pre, exit_bb)
+            return True
+        return False
+
+    def replace_symbolic(self, loop, pre, exit_bb, cmp, symbolic, chains):
+        """
+        Заменяет цикл с числом итераций, зависящим от инвариантов.
+
+        Предзаголовок проверяет условие входа в цикл; если цикл выполняется,
+        число итераций - разность границы и начального значения счетчика
+        (плюс 1 для нестрогого сравнения), иначе все значения равны начальным.
+        """
+        if any(instr.typ == PHI for instr in exit_bb.instructions):
+            return False
+        counter, op, limit, step = symbolic
+        pre_bb = self.blocks[pre]
+
+        # Проверка первой итерации: start op limit
+        guard_instrs = []
+        start_val = self.emit_coef(counter[0], guard_instrs, pre_bb)
+        limit_val = self.emit_coef(limit, guard_instrs, pre_bb)
+        cond = pre_bb.create_tmp_var()
+        guard_instrs.append(Instruction(ICMP, {'arg1': start_val, 'arg2': limit_val,
+                                               'to': cond, 'op': op}))
+
+        # Блок вычисления замкнутых форм
+        body = new_block(self.blocks, pre_bb)
+        instrs = []
+        trips = body.create_tmp_var()
+        if step == 1:
+            instrs.append(Instruction(SUB, {'oper1': limit_val, 'oper2': start_val, 'to': trips}))
+        else:
+            instrs.append(Instruction(SUB, {'oper1': start_val, 'oper2': limit_val, 'to': trips}))
+        if op in ('<=', '>='):
+            adjusted = body.create_tmp_var()
+            instrs.append(Instruction(ADD, {'oper1': trips, 'oper2': IntConst(1), 'to': adjusted}))
+            trips = adjusted
+
+        phis = []
+        replace = {}
+        for val, chain in chains.items():
+            first = self.emit_coef(chain[0], guard_instrs, pre_bb)
+            if len(chain) == 1:
+                replace[val] = first
+                continue
+            slope = self.emit_coef(chain[1], instrs, body)
+            scaled = trips
+            if const_value(slope) != 1:
+                scaled = body.create_tmp_var()
+                instrs.append(Instruction(MUL, {'oper1': trips, 'oper2': slope, 'to': scaled}))
+            final = body.create_tmp_var()
+            instrs.append(Instruction(ADD, {'oper1': first, 'oper2': scaled, 'to': final}))
+            merged = exit_bb.create_tmp_var()
+            phis.append(Instruction(PHI, {'to': merged, 'from': [first, final],
+                                          'blocks': [pre, body.block_num]}))
+            replace[val] = merged
+
+        self.substitute(loop, replace)
+        body.instructions = instrs + [Instruction(BR, {'dest': exit_bb.block_num})]
+        exit_bb.instructions[0:0] = phis
+
+        # Предзаголовок вместо перехода в цикл проверяет условие входа
+        pre_bb.instructions[-1:] = guard_instrs + [Instruction(CONDBR, {
+            'cond': cond, 'dest1': body.block_num, 'dest2': exit_bb.block_num})]
+        for n in loop.blocks:
+            del self.blocks[n]
+        self.replaced += len(replace)
+        self.loops_deleted += 1
+        return True
+
+    def emit_coef(self, coef, instrs, bb):
+        """
+        Добавляет в instrs вычисление коэффициента.
+
+        Returns:
+            Константа или переменная с результатом
+        """
+        value = None
+        for key in sorted((key for key in coef if key is not None), key=str):
+            n = coef[key]
+            term = key
+            if n != 1:
+                term = bb.create_tmp_var()
+                instrs.append(Instruction(MUL, {'oper1': key, 'oper2': IntConst(n), 'to': term}))
+            if value is None:
+                value = term
+            else:
+                total = bb.create_tmp_var()
+                instrs.append(Instruction(ADD, {'oper1': value, 'oper2': term, 'to': total}))
+                value = total
+
+        const = coef.get(None, 0)
+        if value is None:
+            return IntConst(const)
+        if const != 0:
+            total = bb.create_tmp_var()
+            instrs.append(Instruction(ADD, {'oper1': value, 'oper2': IntConst(const), 'to': total}))
+            value = total
+        return value
+
+    def substitute(self, loop, replace):
+        """Заменяет использования значений цикла вне его"""
+        def resolve(val):
+            return replace.get(val, val) if isinstance(val, Variable) else val
+        for n, bb in self.blocks.items():
+            if n not in loop.blocks:
+                bb.instructions = [instr.map_uses(resolve) for instr in bb.instructions]
+
+    def delete_loop(self, loop, pre, exit_bb):
+        """Удаляет цикл, результаты которого больше не используются"""
+        retarget(self.blocks[pre], loop.header, exit_bb.block_num)
+        replace_phi_pred(exit_bb, loop.header, pre)
+        for n in loop.blocks:
+            del self.blocks[n]
+        self.loops_deleted += 1
@@ -0,0 +1,171 @@
+"""
+Упрощение графа потока управления.
+
+Парсер создает отдельные блоки для условия цикла, выхода из цикла и
+слияния ветвей, поэтому в программе много пустых блоков и блоков,
+в которые ведет единственный безусловный переход. Проход сворачивает
+такие конструкции до неподвижной точки, сохраняя согласованность
+операндов phi-функций с предшественниками блоков.
+"""
+
+from BB import *
+from cfg import *
+
+
+class SimplifyCfg:
+    """
+    Проход упрощения графа.
+
+    Преобразования:
+    - условный переход с одинаковыми целями или константным условием
+      заменяется безусловным;
+    - недостижимые блоки удаляются;
+    - блок из одного безусловного перехода исключается из графа;
+    - блок, в который ведет единственный переход из единственного
+      предшественника, присоединяется к предшественнику;
+    - phi-функции с единственным операндом заменяются этим операндом.
+
+    Работает как с SSA-формой, так и с исходным IR (без phi-функций).
+    """
+
+    def __init__(self, blocks, verbose=True):
+        """
+        Args:
+            blocks: Базовые блоки программы (списки инструкций изменяются
+                    на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+
+        # Статистика прохода
+        self.blocks_before = len(self.blocks)
+        self.branches_folded = 0    # условных переходов заменено безусловными
+        self.blocks_merged = 0      # блоков присоединено к предшественнику
+        self.blocks_forwarded = 0   # исключено пустых блоков
+        self.blocks_unreachable = 0 # удалено недостижимых блоков
+
+    def run(self):
+        """
+        Выполняет упрощение до неподвижной точки.
+
+        Returns:
+            list: Оставшиеся блоки программы, упорядоченные по номерам
+        """
+        self.replace = {}
+        changed = True
+        while changed:
+            changed = self.fold_branches()
+            changed |= self.remove_unreachable()
+            changed |= self.forward_empty_blocks()
+            changed |= self.merge_blocks()
+
+        if self.replace:
+            for bb in self.blocks.values():
+                bb.instructions = [instr.map_uses(self.resolve) for instr in bb.instructions]
+
+        if self.verbose:
+            print(f"Упрощение графа: блоков {self.blocks_before} -> {len(self.blocks)} "
+                  f"(присоединено {self.blocks_merged}, пустых {self.blocks_forwarded}, "
+                  f"недостижимых {self.blocks_unreachable}), "
+                  f"свернуто переходов: {self.branches_folded}")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    def resolve(self, val):
+        """Заменяет результат удаленной phi-функции ее операндом"""
+        while isinstance(val, Variable) and val in self.replace:
+            val = self.replace[val]
+        return val
+
+    # ==== ПРЕОБРАЗОВАНИЯ ====
+
+    def fold_branches(self):
+        """Заменяет условные переходы с одинаковыми целями или константным условием"""
+        changed = False
+        for n, bb in self.blocks.items():
+            if not bb.instructions or bb.instructions[-1].typ != CONDBR:
+                continue
+            term = bb.instructions[-1]
+            dest1, dest2 = term.args['dest1'], term.args['dest2']
+            cond = const_value(self.resolve(term.args['cond']))
+            if dest1 == dest2:
+                dest = dest1
+            elif cond is not None:
+                dest, dropped = (dest1, dest2) if cond else (dest2, dest1)
+                self.remove_phi_pred(dropped, n)
+            else:
+                continue
+            bb.instructions[-1] = Instruction(BR, {'dest': dest})
+            self.branches_folded += 1
+            changed = True
+        return changed
+
+    def remove_unreachable(self):
+        """Удаляет блоки, недостижимые из входного"""
+        reachable = set(reverse_post_order(self.blocks))
+        dead = [n for n in self.blocks if n not in reachable]
+        for n in dead:
+            for succ in self.blocks[n].get_successors():
+                if succ in reachable:
+                    self.remove_phi_pred(succ, n)
+        for n in dead:
+            del self.blocks[n]
+            self.blocks_unreachable += 1
+        return bool(dead)
+
+    def forward_empty_blocks(self):
+        """Исключает блоки из одного безусловного перехода"""
+        changed = False
+        preds = dict((n, set(p)) for n, p in build_preds(self.blocks).items())
+        for n in sorted(self.blocks):
+            if forward_empty_block(self.blocks, preds, n):
+                self.blocks_forwarded += 1
+                changed = True
+        return changed
+
+    def merge_blocks(self):
+        """Присоединяет блоки с единственным предшественником к этому предшественнику"""
+        changed = False
+        preds = build_preds(self.blocks)
+        for n in sorted(self.blocks):
+            if n not in self.blocks:
+                continue
+            bb = self.blocks[n]
+            # Присоединяем цепочку преемников, пока это возможно
+            while bb.instructions and bb.instructions[-1].typ == BR:
+                succ = bb.instructions[-1].args['dest']
+                if succ == n or succ == ENTRY or preds[succ] != [n]:
+                    break
+                succ_bb = self.blocks.pop(succ)
+                body = []
+                for instr in succ_bb.instructions:
+                    if instr.typ == PHI:
+                        # Единственный предшественник - значение известно
+                        self.replace[instr.args['to']] = instr.args['from'][0]
+                    else:
+                        body.append(instr)
+                bb.instructions[-1:] = body
+                for s in succ_bb.get_successors():
+                    replace_phi_pred(self.blocks[s], succ, n)
+                    preds[s] = [n if p == succ else p for p in preds[s]]
+                self.blocks_merged += 1
+                changed = True
+        return changed
+
+    def remove_phi_pred(self, n, pred):
+        """Удаляет из phi-функций блока n операнды, приходящие из pred"""
+        bb = self.blocks[n]
+        for i, instr in enumerate(bb.instructions):
+            if instr.typ != PHI:
+                break
+            pairs = [(p, v) for p, v in zip(instr.args['blocks'], instr.args['from'])
+                     if p != pred]
+            if len(pairs) == 1:
+                # Остался один вход - phi-функция не нужна
+                self.replace[instr.args['to']] = pairs[0][1]
+            bb.instructions[i] = instr.with_args(**{'blocks': [p for p, _ in pairs],
+                                                    'from': [v for _, v in pairs]})
+        if self.replace:
+            bb.instructions = [instr for instr in bb.instructions
+                               if not (instr.typ == PHI and instr.args['to'] in self.replace)]
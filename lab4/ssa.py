@@ -1,6 +1,16 @@
 import networkx as nx
 from copy import deepcopy
 from BB import *
+from cfg import find_back_edges
+from verifier import SsaVerifier
+
+
+# Режимы построения SSA-формы
+MINIMAL = 'minimal'          # phi-функции на всей итерированной границе доминирования
+SEMI_PRUNED = 'semi-pruned'  # пропускаются переменные, локальные для одного блока
+PRUNED = 'pruned'            # phi-функции только там, где переменная жива
+
+SSA_MODES = (MINIMAL, SEMI_PRUNED, PRUNED)
 
 
 class SsaBuilder:
@@ -11,22 +21,34 @@ class SsaBuilder:
     в которой каждая переменная определяется ровно один раз.
     """
     
-    def __init__(self, blocks, verbose=True):
+    def __init__(self, blocks, verbose=True, mode=MINIMAL, check=False):
         """
         Инициализирует построитель SSA и выполняет начальные вычисления.
         
         Args:
             blocks: Список базовых блоков промежуточного представления
             verbose: Флаг, управляющий выводом отладочной информации
+            mode: Режим размещения phi-функций: MINIMAL, SEMI_PRUNED или PRUNED
+            check: Режим проверки (для тестов и отладки): сверка границ
+                   доминирования с networkx и проверка построенной SSA-формы
         """
+        if mode not in SSA_MODES:
+            raise ValueError(f"Неизвестный режим построения SSA: {mode}")
+
         self.blocks = blocks
         self.verbose = verbose
+        self.mode = mode
+        self.check = check
         
         # Построение доминаторов и границ доминирования
         self.build_dom()
         self.build_df()
         self.build_changed_variables()
 
+        # Для сокращенных режимов нужна информация о живости переменных
+        if self.mode != MINIMAL:
+            self.build_liveness()
+
     # ==== КОНСТРУКТОРЫ ====
 
     def build_dom(self):
@@ -45,9 +67,20 @@ class SsaBuilder:
         cc = nx.node_connected_component(CFG.to_undirected(), 0)
         self.CFG = nx.DiGraph(CFG.subgraph(cc))
         self.blocks = set(filter(lambda x: x.block_num in self.CFG, self.blocks))
-
-        # Определяем обратные рёбра для циклов
+        # Индекс блоков по номеру для быстрого доступа
+        self.block_by_num = dict((bb.block_num, bb) for bb in self.blocks)
+
+        # Упорядоченные списки предшественников и индекс ребра (pred, succ)
+        # в списке предшественников succ - это номер операнда phi-функции
+        self.preds = dict((x, sorted(self.CFG.predecessors(x))) for x in self.CFG)
+        self.pred_index = {}
+        for x, preds in self.preds.items():
+            for j, pred in enumerate(preds):
+                self.pred_index[(pred, x)] = j
+
+        # Определяем обратные рёбра для циклов и заголовки циклов
         self.identify_back_edges()
+        self.loop_headers = set(head for _, head in self.back_edges)
 
         # Вычисляем непосредственные доминаторы и создаем словарь доминаторов
         imm_dom = nx.immediate_dominators(self.CFG, 0)
@@ -67,41 +100,8 @@ class SsaBuilder:
         Обратное ребро - это ребро, которое указывает от потомка к предку в дереве доминаторов.
         Такие рёбра образуют циклы в графе.
         """
-        # Выполняем поиск в глубину для определения обратных рёбер
-        self.back_edges = set()
-        
-        # Множества для отслеживания посещенных и активных узлов
-        visited = set()
-        active = set()
-        
-        def dfs(node):
-            """
-            Вспомогательная функция для поиска в глубину.
-            
-            Args:
-                node: Текущий узел
-            """
-            if node in active:
-                return
-            
-            if node in visited:
-                return
-            
-            visited.add(node)
-            active.add(node)
-            
-            # Просматриваем все исходящие рёбра
-            for succ in self.get_succ(node):
-                if succ in active:
-                    # Найдено обратное ребро
-                    self.back_edges.add((node, succ))
-                else:
-                    dfs(succ)
-            
-            active.remove(node)
-        
-        # Запускаем поиск с начального узла
-        dfs(0)
+        # Выполняем поиск в глубину с явным стеком (см. cfg.find_back_edges)
+        self.back_edges = find_back_edges(self.block_by_num)
         
         if self.verbose:
             print(f"Найдены обратные рёбра: {self.back_edges}")
@@ -137,15 +137,75 @@ class SsaBuilder:
                         if y not in self.children[x]:
                             self.df[x].add(y)
 
-        # Проверяем совпадение с библиотечной реализацией
-        assert self.df == nx.dominance_frontiers(self.CFG, 0)
+        # В режиме проверки сверяем с библиотечной реализацией
+        if self.check:
+            assert self.df == nx.dominance_frontiers(self.CFG, 0)
 
     def build_changed_variables(self):
         """
-        Определяет для каждого блока множество переменных, которые изменяются в нем.
+        Определяет для каждой переменной множество блоков, в которых она изменяется.
+        
+        Исходные блоки не изменяются: результат хранится в построителе.
         """
+        # Места определения каждой переменной: имя -> множество номеров блоков
+        self.def_sites = {}
         for x in self.blocks:
-            x.build_changing_variables()
+            for instr in x.instructions:
+                if instr.typ == STORE:
+                    name = instr.args['to'].name
+                    self.def_sites.setdefault(name, set()).add(x.block_num)
+
+        # Имена всех переменных программы, для которых строится SSA-форма
+        self.var_names = sorted(self.get_all_vars_names())
+
+    def build_liveness(self):
+        """
+        Вычисляет живость переменных программы (до построения SSA).
+        
+        Для каждого блока строятся множества:
+        - upward_exposed: переменные, читаемые в блоке до их записи в нем;
+        - live_in: переменные, живые на входе в блок.
+        
+        Множество global_names содержит переменные, которые читаются хотя бы
+        в одном блоке до записи, - только для них нужны phi-функции
+        в полусокращенном режиме.
+        """
+        self.upward_exposed = {}
+        defined = {}
+        for bb in self.blocks:
+            exposed = set()
+            killed = set()
+            for instr in bb.instructions:
+                for key, val in instr.args.items():
+                    if not isinstance(val, Variable) or val.is_temp:
+                        continue
+                    if key == 'to':
+                        killed.add(val.name)
+                    elif val.name not in killed:
+                        exposed.add(val.name)
+            self.upward_exposed[bb.block_num] = exposed
+            defined[bb.block_num] = killed
+
+        self.global_names = set().union(*self.upward_exposed.values())
+
+        # Обратный анализ живости с рабочим списком
+        self.live_in = dict((x, set(self.upward_exposed[x])) for x in self.CFG)
+        worklist = list(self.CFG)
+        in_worklist = set(worklist)
+        while worklist:
+            x = worklist.pop()
+            in_worklist.discard(x)
+            live_out = set()
+            for y in self.get_succ(x):
+                live_out |= self.live_in[y]
+            live = self.upward_exposed[x] | (live_out - defined[x])
+            if live != self.live_in[x]:
+                self.live_in[x] = live
+                # Живость изменилась - пересчитываем предшественников
+                for y in self.get_preds(x):
+                    if y not in in_worklist:
+                        in_worklist.add(y)
+                        worklist.append(y)
 
     # ==== СЛУЖЕБНЫЕ МЕТОДЫ ====
 
@@ -154,18 +214,24 @@ class SsaBuilder:
         for bb in self.blocks:
             print(bb)
 
-    def to_graph(self):
+    def to_graph(self, blocks=None):
         """
         Генерирует представление графа в формате DOT.
         
+        Args:
+            blocks: Блоки для отображения (по умолчанию - исходные блоки)
+        
         Returns:
             str: Строка в формате DOT, представляющая граф
         """
+        if blocks is None:
+            blocks = self.blocks
+            
         # Начинаем создание DOT-файла
         ret = "digraph G{\nnode [shape=box nojustify=false]\n"
         
         # Добавляем узлы графа (блоки)
-        for x in self.blocks:
+        for x in blocks:
             # Форматируем содержимое блока
             s = str(x).replace('    ', '').replace('{', '').replace('}', '').replace("\n", "\\l    ").strip()
             while s[-2:] == '\\l':
@@ -183,9 +249,13 @@ class SsaBuilder:
         ret += "}\n"
         return ret
 
+    def block_map(self):
+        """Возвращает словарь {номер блока: блок} для текущих блоков"""
+        return dict((bb.block_num, bb) for bb in self.blocks)
+
     def get_block(self, n):
         """Возвращает блок по его номеру"""
-        return list(filter(lambda x: x.block_num == n, self.blocks))[0]
+        return self.block_by_num[n]
 
     def blocks_to_nums(self, s):
         """Преобразует набор блоков в набор их номеров"""
@@ -221,13 +291,7 @@ class SsaBuilder:
         Returns:
             set: Множество блоков, в которых переменная переопределяется
         """
-        redefining_blocks = set()
-        for bb in self.blocks:
-            for var in bb.changing_variables:
-                if var.name == varname:
-                    redefining_blocks.add(bb)
-                    break
-        return redefining_blocks
+        return set(map(self.get_block, self.def_sites.get(varname, ())))
 
     # ==== РАЗМЕЩЕНИЕ PHI-ФУНКЦИЙ ====
 
@@ -246,237 +310,290 @@ class SsaBuilder:
             df_union.update(self.df[x])
         return df_union
 
-    def find_df_post_order(self, s):
+    def find_df_post_order(self, s, has_already=None, work=None, stamp=1):
         """
-        Находит транзитивное замыкание по границам доминирования.
+        Находит итерированную границу доминирования для множества узлов.
+        
+        Используется алгоритм с рабочим списком: каждый узел попадает в список
+        не более одного раза за вызов, поэтому каждое ребро границы
+        доминирования просматривается не более одного раза. Вместо очистки
+        множеств между вызовами используются отметки номером итерации.
         
         Args:
             s: Начальное множество узлов
+            has_already: Отметки узлов, уже попавших в результат
+            work: Отметки узлов, уже попавших в рабочий список
+            stamp: Номер текущей итерации (различный для разных переменных)
             
         Returns:
             set: Транзитивное замыкание границ доминирования
         """
-        old = set()
-        new = self.find_df(s)
-        
-        # Итеративно расширяем множество, пока оно не перестанет меняться
-        while True:
-            old |= new
-            new = self.find_df(new)
-            if new.difference(old) == set():
-                return old
-
-    def find_post_order(self, s):
+        # Отметки принадлежат вызывающему: построитель не хранит состояние запуска
+        if has_already is None:
+            has_already = dict((x, 0) for x in self.CFG)
+        if work is None:
+            work = dict((x, 0) for x in self.CFG)
+
+        result = set()
+        worklist = list(s)
+        for x in worklist:
+            work[x] = stamp
+
+        while worklist:
+            x = worklist.pop()
+            for y in self.df[x]:
+                if has_already[y] == stamp:
+                    continue
+                # y попадает в итерированную границу доминирования
+                has_already[y] = stamp
+                result.add(y)
+                # phi-функция в y - тоже определение переменной
+                if work[y] != stamp:
+                    work[y] = stamp
+                    worklist.append(y)
+        return result
+
+    def find_post_order(self, s, *stamps):
         """Обертка для find_df_post_order"""
-        return self.find_df_post_order(s)
+        return self.find_df_post_order(s, *stamps)
 
-    def insert_phi(self, varname):
+    def find_phi_blocks(self, varname, *stamps):
         """
-        Вставляет phi-функции для указанной переменной.
+        Находит блоки, в которых нужна phi-функция для указанной переменной.
         
-        Phi-функции вставляются в узлы, находящиеся на границах доминирования
-        блоков, в которых переопределяется переменная.
+        Phi-функции нужны в узлах, находящихся на итерированной границе
+        доминирования блоков, в которых переопределяется переменная.
         
         Args:
-            varname: Имя переменной, для которой вставляются phi-функции
+            varname: Имя переменной
+            stamps: Отметки для find_df_post_order
+            
+        Returns:
+            set: Номера блоков, в которые вставляется phi-функция
         """
         # Находим блоки, в которых переменная переопределяется
-        stored_in_blocks = self.find_blocks_that_redefine_var(varname)
-        stored_in_blocks_num = self.blocks_to_nums(stored_in_blocks)
+        stored_in_blocks_num = self.def_sites.get(varname, set())
 
         # Находим блоки на границах доминирования
-        post_order_blocks_num = self.find_post_order(stored_in_blocks_num)
-        post_order_blocks = self.nums_to_bloks(post_order_blocks_num)
+        post_order_blocks_num = self.find_post_order(stored_in_blocks_num, *stamps)
 
-        # Для каждого блока на границе доминирования добавляем phi-функцию
-        for bb in post_order_blocks:
-            bb.phi_var_blocks[varname] = set()
-            # Добавляем всех предшественников блока как источники для phi-функции
-            preds = self.CFG.predecessors(bb.block_num)
-            for pred in preds:
-                bb.phi_var_blocks[varname].add(pred)
+        # В сокращенном режиме пропускаем блоки, где переменная мертва
+        if self.mode == PRUNED:
+            post_order_blocks_num = set(
+                x for x in post_order_blocks_num if varname in self.live_in[x]
+            )
+        return post_order_blocks_num
 
-
-    def insert_all_phi(self):
+    def place_phi(self):
         """
-        Вставляет phi-функции для всех переменных программы.
+        Определяет размещение phi-функций для всех переменных программы.
         
-        Этот метод:
-        1. Находит все переменные программы
-        2. Для каждой переменной вставляет phi-функции
-        3. Добавляет phi-инструкции в начало соответствующих блоков
-        """
-        # Получаем и сортируем имена всех переменных
-        vars = self.get_all_vars_names()
-        var_names = sorted(list(vars))
-        
-        # Вставляем phi-функции для каждой переменной
-        for varname in var_names:
-            self.insert_phi(varname)
+        Returns:
+            dict: {номер блока: список имен переменных, для которых нужна phi-функция}
+        """
+        var_names = self.var_names
 
-        # Добавляем инструкции phi в начало блоков
-        for bb in self.blocks:
-            for varname, phiblocks in bb.phi_var_blocks.items():
-                instr = Instruction(PHI, {'to': Variable(varname, 0), 
-                                         'from': list(phiblocks)})
-                bb.instructions.insert(0, instr)
+        # В полусокращенном режиме пропускаем переменные, локальные для блоков
+        if self.mode == SEMI_PRUNED:
+            var_names = [name for name in var_names if name in self.global_names]
 
-    # ==== ОБНОВЛЕНИЕ ВЕРСИЙ ПЕРЕМЕННЫХ ====
+        # Отметки итерированной границы доминирования (алгоритм Цитрона):
+        # номер переменной, для которой блок получил phi-функцию
+        # и для которой он попал в рабочий список
+        has_already = dict((x, 0) for x in self.CFG)
+        work = dict((x, 0) for x in self.CFG)
 
-    def update_variable_versions(self):
-        """Запускает обход для обновления версий всех переменных"""
-        # Создаем множество для хранения информации о циклах
-        self.loop_headers = set()
-        for _, head in self.back_edges:
-            self.loop_headers.add(head)
-        
-        self.traverse()
+        placement = dict((x, []) for x in self.CFG)
+        for stamp, varname in enumerate(var_names, 1):
+            for x in self.find_phi_blocks(varname, has_already, work, stamp):
+                placement[x].append(varname)
+        return placement
 
-    def traverse(self):
+    def insert_phi_functions(self, blocks):
         """
-        Выполняет обход для обновления версий переменных.
+        Создает копии блоков с phi-функциями в начале.
         
-        Для каждой переменной запускает рекурсивный обход, начиная с блока 0,
-        и обновляет версии переменных.
-        """
-        # Получаем и сортируем имена всех переменных
-        vars = self.get_all_vars_names()
-        var_names = sorted(list(vars))
+        Исходные блоки не изменяются, инструкции копий разделяются с ними.
+        Операнд j phi-функции соответствует блоку-предшественнику blocks[j],
+        до переименования в операндах стоят номера этих блоков.
+        
+        Args:
+            blocks: Словарь {номер блока: BB}
+            
+        Returns:
+            dict: Словарь {номер блока: копия блока с phi-функциями}
+        """
+        placement = self.place_phi()
+        result = {}
+        phi_count = 0
+        for x, bb in blocks.items():
+            new_bb = bb.copy()
+            preds = self.preds[x]
+            phis = []
+            for varname in placement[x]:
+                new_bb.phi_var_blocks[varname] = set(preds)
+                phis.append(Instruction(PHI, {'to': Variable(varname, 0),
+                                              'from': list(preds),
+                                              'blocks': list(preds)}))
+            # Phi-функции идут в обратном порядке имен, как при вставке в начало блока
+            new_bb.instructions[0:0] = reversed(phis)
+            phi_count += len(phis)
+            result[x] = new_bb
 
-        # Для каждой переменной выполняем обход
-        for target_var in var_names:
-            self.stack = []  # Стек для хранения версий переменной
-            self.counter = 0  # Счетчик для генерации новых версий
-            self.visited_in_loop = {}  # Словарь для отслеживания посещенных узлов в циклах
-            self.traverse_rec(0, target_var)
+        if self.verbose:
+            print(f"Вставлено phi-функций ({self.mode}): {phi_count}")
+        return result
 
-    def traverse_rec(self, bb, target_var):
+    def insert_all_phi(self):
         """
-        Рекурсивно обходит граф, обновляя версии указанной переменной.
+        Вставляет phi-функции для всех переменных программы.
         
-        Args:
-            bb: Номер текущего базового блока
-            target_var: Имя переменной, версии которой обновляются
+        Оставлено для совместимости: заменяет self.blocks копиями блоков
+        с phi-функциями. Для построения SSA-формы без изменения состояния
+        построителя используйте build().
         """
-        if self.verbose:
-            print("->>> IN BLOCK", bb)
+        self.blocks = set(self.insert_phi_functions(self.block_map()).values())
 
-        # Проверяем, является ли блок заголовком цикла
-        is_loop_header = bb in self.loop_headers
-        
-        # Для заголовков циклов, мы можем посещать их несколько раз
-        # Отслеживаем это, чтобы избежать бесконечной рекурсии
-        if is_loop_header:
-            key = (bb, target_var)
-            # Если уже посещали этот заголовок цикла для данной переменной, просто возвращаемся
-            if key in self.visited_in_loop:
-                return
-            self.visited_in_loop[key] = True
-
-        # Обрабатываем инструкции в текущем блоке
-        self._process_block_instructions(bb, target_var)
-        
-        # Обновляем phi-функции в преемниках, исключая обратные рёбра
-        self._update_phi_in_successors(bb, target_var)
-
-        # Рекурсивно обходим дочерние узлы в дереве доминаторов
-        children = self.children[bb]
-        for v1 in children:
-            # Если ребро (bb, v1) - обратное, пропускаем его при первом обходе
-            if (bb, v1) in self.back_edges and not is_loop_header:
-                continue
-            self.traverse_rec(v1, target_var)
+    # ==== ОБНОВЛЕНИЕ ВЕРСИЙ ПЕРЕМЕННЫХ ====
 
-        # Убираем версию со стека при выходе из определения
-        self._pop_version_if_redefined(bb, target_var)
-    
-    def _process_block_instructions(self, bb, target_var):
+    def update_variable_versions(self):
         """
-        Обрабатывает инструкции в блоке, обновляя версии переменных.
+        Обновляет версии всех переменных.
         
-        Args:
-            bb: Номер текущего базового блока
-            target_var: Имя переменной, версии которой обновляются
-        """
-        for i, instr in enumerate(self.get_block(bb).instructions):
-            # Просматриваем аргументы инструкции
-            for key, val in instr.args.items():
-                # Пропускаем нецелевые переменные
-                if not isinstance(val, Variable) or val.is_temp or val.name != target_var:
-                    continue
-                    
-                name = val.name
-                
-                # Обрабатываем инструкции присваивания (создают новую версию)
-                if instr.typ == STORE:
-                    self._create_new_variable_version(bb, i, key, name)
-                    
-                # Обрабатываем phi-функции (создают новую версию)
-                elif instr.typ == PHI:
-                    self._create_new_variable_version(bb, i, key, name)
-                    
-                # Обновляем использования переменных (не phi)
-                elif instr.typ != PHI:
-                    self._update_variable_use(bb, i, key, name)
-    
-    def _create_new_variable_version(self, bb, i, key, name):
+        Оставлено для совместимости: заменяет self.blocks переименованными
+        копиями блоков.
         """
-        Создает новую версию переменной.
-        
-        Args:
-            bb: Номер текущего базового блока
-            i: Индекс инструкции
-            key: Ключ аргумента в инструкции
-            name: Имя переменной
-        """
-        new_ver = self.counter
-        self.stack.append(self.counter)
-        self.counter += 1
-        self.get_block(bb).instructions[i].args['to'] = Variable(name, new_ver)
-    
-    def _update_variable_use(self, bb, i, key, name):
+        self.blocks = set(self.rename_variables(self.block_map()).values())
+
+        if self.check:
+            SsaVerifier(self.blocks).check()
+
+    def build(self):
         """
-        Обновляет использование переменной.
+        Строит SSA-форму, не изменяя ни исходные блоки, ни сам построитель.
         
-        Args:
-            bb: Номер текущего базового блока
-            i: Индекс инструкции
-            key: Ключ аргумента в инструкции
-            name: Имя переменной
+        Все состояние построения хранится в локальных переменных, поэтому
+        один построитель можно использовать из нескольких потоков, а один
+        список блоков - для нескольких построений.
+        
+        Returns:
+            list: Новые блоки в SSA-форме, упорядоченные по номерам. Инструкции,
+                  которые не требуют переименования, разделяются с исходными блоками
         """
-        self.get_block(bb).instructions[i].args[key] = Variable(name, self.stack[-1])
-    
-    def _update_phi_in_successors(self, bb, target_var):
+        blocks = self.insert_phi_functions(self.block_map())
+        blocks = self.rename_variables(blocks)
+        result = [blocks[x] for x in sorted(blocks)]
+
+        if self.check:
+            SsaVerifier(result).check()
+        return result
+
+    def rename_variables(self, blocks):
         """
-        Обновляет phi-функции в преемниках текущего блока.
+        Переименовывает переменные, создавая новую версию для каждого определения.
+        
+        Выполняется один обход дерева доминаторов с явным стеком для всех
+        переменных сразу: для каждой переменной хранится стек версий.
+        Инструкции не изменяются на месте - переименованные инструкции
+        создаются заново, остальные разделяются с исходными блоками.
         
         Args:
-            bb: Номер текущего базового блока
-            target_var: Имя переменной, версии которой обновляются
+            blocks: Словарь {номер блока: BB} с расставленными phi-функциями
+            
+        Returns:
+            dict: Словарь {номер блока: новый блок в SSA-форме}
         """
-        successors = self.get_succ(bb)
-        for v1 in successors:
-            # Определяем индекс текущего блока среди предшественников v1
-            j = self.which_pred(bb, v1)
+        renamed = set(self.var_names)
+        result = dict((x, bb.copy()) for x, bb in blocks.items())
+        for x, bb in blocks.items():
+            result[x].phi_var_blocks = dict(bb.phi_var_blocks)
+
+        # Состояние переименования: стеки и счетчики версий по именам
+        stacks = dict((name, []) for name in renamed)
+        counters = dict((name, 0) for name in renamed)
+
+        def current_version(name):
+            """
+            Возвращает текущую версию переменной. Если на пути от входа
+            переменная еще не присваивалась, она читается как 0.
+            """
+            if not stacks[name]:
+                return IntConst(0)
+            return Variable(name, stacks[name][-1])
+
+        def new_version(name):
+            version = counters[name]
+            counters[name] += 1
+            stacks[name].append(version)
+            return Variable(name, version)
+
+        def rename_use(val):
+            if isinstance(val, Variable) and not val.is_temp and val.name in renamed:
+                return current_version(val.name)
+            return val
+
+        # Копии phi-функций создаются при первом обращении: операнды заполняются
+        # из предшественников раньше или позже обработки самого блока
+        own_phis = {}
+
+        def own_phi(x, i):
+            key = (x, i)
+            if key not in own_phis:
+                phi = result[x].instructions[i]
+                phi = phi.with_args(**{'from': list(phi.args['from'])})
+                result[x].instructions[i] = phi
+                own_phis[key] = phi
+            return own_phis[key]
+
+        # Элементы стека: (признак выхода из блока, номер блока, определенные имена)
+        stack = [(False, 0, None)]
+        while stack:
+            leaving, x, defined = stack.pop()
             
-            # Обновляем версии переменных в phi-функциях
-            for instr in self.get_block(v1).instructions:
-                if instr.typ != PHI or instr.args['to'].name != target_var:
+            if leaving:
+                # Убираем со стеков все версии, созданные в блоке
+                for name in defined:
+                    stacks[name].pop()
+                continue
+
+            if self.verbose:
+                print("->>> IN BLOCK", x)
+
+            instructions = result[x].instructions
+            defined = []
+            for i, instr in enumerate(instructions):
+                if instr.typ == PHI:
+                    name = instr.args['to'].name
+                    if name in renamed:
+                        own_phi(x, i).args['to'] = new_version(name)
+                        defined.append(name)
                     continue
-                instr.args['from'][j] = Variable(target_var, self.stack[-1])
-    
-    def _pop_version_if_redefined(self, bb, target_var):
-        """
-        Убирает версию со стека, если переменная была переопределена в блоке.
-        
-        Args:
-            bb: Номер текущего базового блока
-            target_var: Имя переменной
-        """
-        for instr in self.get_block(bb).instructions:
-            if instr.typ == STORE and instr.args['to'].name == target_var:
-                self.stack.pop()
-                break
+                
+                # Источник присваивания - обычное использование переменной
+                new_instr = instr.map_uses(rename_use)
+                to = instr.args.get('to')
+                if (instr.typ == STORE and isinstance(to, Variable)
+                        and not to.is_temp and to.name in renamed):
+                    new_instr = new_instr.with_args(to=new_version(to.name))
+                    defined.append(to.name)
+                instructions[i] = new_instr
+
+            # Обновляем операнды phi-функций в преемниках
+            for y in self.get_succ(x):
+                j = self.pred_index[(x, y)]
+                for i, instr in enumerate(result[y].instructions):
+                    if instr.typ != PHI:
+                        break
+                    name = instr.args['to'].name
+                    if name in renamed:
+                        own_phi(y, i).args['from'][j] = current_version(name)
+
+            # Выход из блока выполняется после обхода всех его потомков
+            stack.append((True, x, defined))
+            for y in reversed(list(self.children[x])):
+                stack.append((False, y, None))
+
+        return result
 
     def which_pred(self, v, v1):
         """
@@ -489,6 +606,4 @@ class SsaBuilder:
         Returns:
             int: Индекс v в отсортированном списке предшественников v1
         """
-        preds = list(self.get_preds(v1))
-        preds.sort()
-        return preds.index(v)
\ No newline at end of file
+        return self.pred_index[(v, v1)]
@@ -0,0 +1,441 @@
+"""
+Супероптимизатор коротких линейных последовательностей add/sub/mul.
+
+Выражение - дерево арифметических инструкций одного блока: операнд,
+вычисленный в том же блоке и используемый только этой инструкцией,
+подставляется в дерево, остальные операнды - входы выражения. Ключ
+выражения не зависит от имен входов: входы нумеруются x0, x1, ...
+в порядке появления, например add(mul(x0,2),x0).
+
+Поиск (offline) перебирает в глубину программы из нескольких инструкций
+над входами, небольшими константами и результатами предыдущих инструкций
+с отсечениями: операнды коммутативных
+операций упорядочены, инструкции над двумя константами и инструкции,
+повторяющие уже вычисленное значение, не рассматриваются, стоимость
+ограничена лучшей найденной. Кандидат проверяется на случайных
+тестовых векторах, затем полным перебором входов малой разрядности.
+Найденные замены сохраняются в базу (JSON), которую проход
+SuperoptRewrite применяет при компиляции.
+
+Запуск поиска:
+    python superopt.py [--length N] [путь_к_файлу ...]
+Без файлов используются встроенные примеры программ.
+"""
+
+import itertools
+import json
+import os
+import random
+import sys
+
+from BB import *
+from cfg import *
+
+
+# Стоимость арифметических инструкций
+COST = {ADD: 1, SUB: 1, MUL: 3}
+
+# Операции, результат которых не зависит от порядка операндов
+COMMUTATIVE = (ADD, MUL)
+
+# Константы, доступные поиску (кроме констант самого выражения)
+CONSTANTS = (0, 1, 2, -1)
+
+# Ограничения на размер выражений
+MAX_OPS = 4
+MAX_INPUTS = 3
+
+# База замен по умолчанию
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'superopt_db.json')
+
+
+# ==== ВЫРАЖЕНИЯ ====
+
+def expression_trees(bb, uses):
+    """
+    Находит деревья выражений блока.
+
+    Args:
+        bb: Базовый блок в SSA-форме
+        uses: Словарь {переменная: количество использований} программы
+
+    Returns:
+        list: Тройки (индекс корня, дерево, индексы подставленных инструкций);
+              дерево - кортеж (операция, левое, правое), лист - переменная или число
+    """
+    defs = {}
+    for i, instr in enumerate(bb.instructions):
+        if instr.typ in COST:
+            defs[instr.args['to']] = i
+
+    def build(i, inlined):
+        instr = bb.instructions[i]
+        children = []
+        for val in (instr.args['oper1'], instr.args['oper2']):
+            j = defs.get(val) if isinstance(val, Variable) else None
+            if j is not None and j < i and uses.get(val, 0) == 1 and len(inlined) + 1 < MAX_OPS:
+                inlined.append(j)
+                children.append(build(j, inlined))
+            elif isinstance(val, Variable):
+                children.append(val)
+            else:
+                children.append(const_value(val))
+        return (instr.typ, children[0], children[1])
+
+    trees = []
+    consumed = set()
+    for i in reversed(range(len(bb.instructions))):
+        if bb.instructions[i].typ not in COST or i in consumed:
+            continue
+        inlined = []
+        tree = build(i, inlined)
+        consumed.update(inlined)
+        trees.append((i, tree, inlined))
+    return trees
+
+
+def canonical(tree):
+    """
+    Строит ключ выражения.
+
+    Returns:
+        tuple: (ключ, список входов по номерам)
+    """
+    inputs = []
+
+    def walk(node):
+        if isinstance(node, tuple):
+            return f'{node[0]}({walk(node[1])},{walk(node[2])})'
+        if isinstance(node, Variable):
+            if node not in inputs:
+                inputs.append(node)
+            return f'x{inputs.index(node)}'
+        return str(node)
+
+    return walk(tree), inputs
+
+
+def tree_cost(tree):
+    """Стоимость вычисления дерева"""
+    if not isinstance(tree, tuple):
+        return 0
+    return COST[tree[0]] + tree_cost(tree[1]) + tree_cost(tree[2])
+
+
+def evaluate_tree(tree, inputs, values, mask=None):
+    """Значение дерева при значениях входов values (по модулю mask + 1, если задан)"""
+    if isinstance(tree, tuple):
+        result = evaluate(tree[0], evaluate_tree(tree[1], inputs, values, mask),
+                          evaluate_tree(tree[2], inputs, values, mask))
+    elif isinstance(tree, Variable):
+        result = values[inputs.index(tree)]
+    else:
+        result = tree
+    return result & mask if mask is not None else result
+
+
+def evaluate_program(program, result, values, mask=None):
+    """Значение программы из базы замен при значениях входов values"""
+    temps = []
+
+    def operand(val):
+        if isinstance(val, int):
+            return val
+        if val[0] == 'x':
+            return values[int(val[1:])]
+        return temps[int(val[1:])]
+
+    for typ, a, b in program:
+        value = evaluate(typ, operand(a), operand(b))
+        temps.append(value & mask if mask is not None else value)
+    value = operand(result)
+    return value & mask if mask is not None else value
+
+
+# ==== ПОИСК ====
+
+class Superoptimizer:
+    """Перебор программ, эквивалентных выражению"""
+
+    def __init__(self, max_length=3, vectors=16, width=4, seed=0):
+        """
+        Args:
+            max_length: Наибольшее число инструкций в программе-кандидате
+            vectors: Количество случайных тестовых векторов
+            width: Разрядность полной проверки эквивалентности
+            seed: Начальное значение генератора тестовых векторов
+        """
+        self.max_length = max_length
+        self.vectors = vectors
+        self.width = width
+        self.seed = seed
+
+        # Статистика поиска
+        self.candidates = 0         # кандидатов, совпавших на тестовых векторах
+        self.rejected = 0           # из них отвергнуто полной проверкой
+
+    def search(self, tree):
+        """
+        Ищет самую дешевую программу, вычисляющую выражение.
+
+        Returns:
+            dict: Запись базы замен {'program', 'result', 'cost'} или None,
+                  если программы дешевле выражения не найдено
+        """
+        key, inputs = canonical(tree)
+        k = len(inputs)
+        rng = random.Random(self.seed)
+        tests = [tuple(rng.randint(-1000, 1000) for _ in range(k)) for _ in range(self.vectors)]
+        target = tuple(evaluate_tree(tree, inputs, values) for values in tests)
+
+        constants = sorted(set(CONSTANTS) | set(constants_of(tree)))
+        # Операнды: входы, константы, затем результаты инструкций
+        pool = [(f'x{i}', tuple(values[i] for values in tests)) for i in range(k)]
+        pool += [(c, (c,) * len(tests)) for c in constants]
+
+        self.best = None
+        self.best_cost = tree_cost(tree)
+        for name, values in pool:
+            if values == target and self.verify(tree, inputs, [], name):
+                self.best, self.best_cost = ([], name), 0
+                break
+        if self.best is None:
+            self.extend(tree, inputs, target, pool, [], 0, set(v for _, v in pool))
+
+        if self.best is None:
+            return None
+        program, result = self.best
+        return {'program': program, 'result': result, 'cost': self.best_cost}
+
+    def extend(self, tree, inputs, target, pool, program, cost, seen):
+        """Добавляет к программе одну инструкцию (поиск в глубину с отсечениями)"""
+        for typ in COST:
+            new_cost = cost + COST[typ]
+            if new_cost >= self.best_cost:
+                continue
+            for (a, va), (b, vb) in itertools.product(pool, repeat=2):
+                if isinstance(a, int) and isinstance(b, int):
+                    continue
+                if typ in COMMUTATIVE and str(a) > str(b):
+                    continue
+                values = tuple(evaluate(typ, x, y) for x, y in zip(va, vb))
+                if values in seen:
+                    continue
+                name = f't{len(program)}'
+                candidate = program + [[typ, a, b]]
+                if values == target:
+                    self.candidates += 1
+                    if self.verify(tree, inputs, candidate, name):
+                        self.best, self.best_cost = (candidate, name), new_cost
+                        break
+                    self.rejected += 1
+                    continue
+                if len(candidate) < self.max_length and new_cost + min(COST.values()) < self.best_cost:
+                    seen.add(values)
+                    self.extend(tree, inputs, target, pool + [(name, values)], candidate, new_cost, seen)
+                    seen.discard(values)
+
+    def verify(self, tree, inputs, program, result):
+        """Полная проверка эквивалентности на входах разрядности self.width"""
+        mask = (1 << self.width) - 1
+        for values in itertools.product(range(1 << self.width), repeat=len(inputs)):
+            if (evaluate_tree(tree, inputs, values, mask)
+                    != evaluate_program(program, result, values, mask)):
+                return False
+        return True
+
+
+def constants_of(tree):
+    """Константы выражения"""
+    if isinstance(tree, tuple):
+        return constants_of(tree[1]) + constants_of(tree[2])
+    return [tree] if isinstance(tree, int) else []
+
+
+# ==== БАЗА ЗАМЕН ====
+
+class RewriteDatabase:
+    """База замен: ключ выражения -> программа или None (замены нет)"""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.rules = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.rules = json.load(f)
+
+    def __contains__(self, key):
+        return key in self.rules
+
+    def lookup(self, key):
+        return self.rules.get(key)
+
+    def add(self, key, entry):
+        self.rules[key] = entry
+
+    def save(self):
+        # Одна запись в строке, чтобы изменения базы было удобно просматривать
+        lines = [f'  {json.dumps(key)}: {json.dumps(self.rules[key], sort_keys=True)}'
+                 for key in sorted(self.rules)]
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{\n' + ',\n'.join(lines) + '\n}\n')
+
+
+def use_counts(blocks_by_num):
+    """Количество использований каждой переменной программы"""
+    uses = {}
+    for bb in blocks_by_num.values():
+        for instr in bb.instructions:
+            for val in instr.get_uses():
+                if isinstance(val, Variable):
+                    uses[val] = uses.get(val, 0) + 1
+    return uses
+
+
+def populate(programs, db, optimizer, verbose=True):
+    """
+    Ищет замены для всех выражений программ, отсутствующих в базе.
+
+    Args:
+        programs: Программы в SSA-форме (списки блоков)
+        db: База замен
+        optimizer: Superoptimizer
+    """
+    for blocks in programs:
+        blocks_by_num = block_map(blocks)
+        uses = use_counts(blocks_by_num)
+        for bb in blocks_by_num.values():
+            for _, tree, _ in expression_trees(bb, uses):
+                key, inputs = canonical(tree)
+                # Выражения без входов сворачивает Sccp
+                if key in db or not inputs or len(inputs) > MAX_INPUTS:
+                    continue
+                entry = optimizer.search(tree)
+                db.add(key, entry)
+                if verbose:
+                    found = 'нет замены' if entry is None else (
+                        f"{format_program(entry)} (стоимость {tree_cost(tree)} -> {entry['cost']})")
+                    print(f"{key}: {found}")
+
+
+def format_program(entry):
+    """Текстовая запись программы из базы замен"""
+    steps = [f"t{i} = {a} {typ} {b}" for i, (typ, a, b) in enumerate(entry['program'])]
+    return '; '.join(steps + [f"результат {entry['result']}"])
+
+
+# ==== ПРИМЕНЕНИЕ ====
+
+class SuperoptRewrite:
+    """
+    Проход применения базы замен супероптимизатора.
+
+    Работает над SSA-формой: входы выражения определены до корня дерева
+    и не переопределяются, поэтому замена вычисляется на месте корня.
+    """
+
+    def __init__(self, blocks, verbose=True, db=None):
+        """
+        Args:
+            blocks: Базовые блоки программы в SSA-форме (списки инструкций
+                    изменяются на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+            db: База замен (по умолчанию - RewriteDatabase() из DB_PATH)
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+        self.db = RewriteDatabase() if db is None else db
+
+        # Статистика прохода
+        self.rewritten = 0      # заменено выражений
+        self.cost_before = 0    # стоимость замененных выражений
+        self.cost_after = 0     # стоимость замен
+
+    def run(self):
+        """
+        Заменяет выражения, для которых в базе есть более дешевая программа.
+
+        Returns:
+            list: Блоки программы, упорядоченные по номерам
+        """
+        uses = use_counts(self.blocks)
+        for bb in self.blocks.values():
+            replaced = {}
+            removed = set()
+            for root, tree, inlined in expression_trees(bb, uses):
+                key, inputs = canonical(tree)
+                entry = self.db.lookup(key)
+                if entry is None or entry['cost'] >= tree_cost(tree):
+                    continue
+                replaced[root] = self.emit(bb, entry, inputs, bb.instructions[root].args['to'])
+                removed.update(inlined)
+                self.rewritten += 1
+                self.cost_before += tree_cost(tree)
+                self.cost_after += entry['cost']
+            if replaced:
+                instructions = []
+                for i, instr in enumerate(bb.instructions):
+                    if i in replaced:
+                        instructions.extend(replaced[i])
+                    elif i not in removed:
+                        instructions.append(instr)
+                bb.instructions = instructions
+
+        if self.verbose:
+            print(f"Супероптимизатор: заменено выражений: {self.rewritten}, "
+                  f"стоимость {self.cost_before} -> {self.cost_after}")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    def emit(self, bb, entry, inputs, to):
+        """Создает инструкции программы из базы; результат записывается в to"""
+        temps = []
+
+        def operand(val):
+            if isinstance(val, int):
+                return IntConst(val)
+            if val[0] == 'x':
+                return inputs[int(val[1:])]
+            return temps[int(val[1:])]
+
+        instrs = []
+        program = entry['program']
+        for i, (typ, a, b) in enumerate(program):
+            var = to if f't{i}' == entry['result'] else bb.create_tmp_var()
+            temps.append(var)
+            instrs.append(Instruction(typ, {'oper1': operand(a), 'oper2': operand(b), 'to': var}))
+        if not program:
+            # Результат - вход или константа: копирование
+            instrs.append(Instruction(LOAD if to.is_temp else STORE,
+                                      {'from': operand(entry['result']), 'to': to}))
+        return instrs
+
+
+if __name__ == '__main__':
+    from IR import example, example1, example2
+    from parser import Parser
+    from ssa import SsaBuilder
+    from copyprop import CopyPropagation
+
+    args = sys.argv[1:]
+    length = 3
+    if args[:1] == ['--length']:
+        length, args = int(args[1]), args[2:]
+
+    if args:
+        sources = []
+        for path in args:
+            with open(path, encoding='utf-8') as f:
+                sources.append(Parser().parse(f.read()))
+    else:
+        sources = [example(), example1(), example2()]
+
+    programs = [CopyPropagation(SsaBuilder(blocks, verbose=False).build(), verbose=False).run()
+                for blocks in sources]
+    db = RewriteDatabase()
+    optimizer = Superoptimizer(max_length=length)
+    populate(programs, db, optimizer)
+    db.save()
+    print(f"Кандидатов на тестовых векторах: {optimizer.candidates}, "
+          f"отвергнуто полной проверкой: {optimizer.rejected}")
+    print(f"Записей в базе {db.path}: {len(db.rules)}")
@@ -0,0 +1,302 @@
+"""
+Развертка циклов с постоянным числом итераций.
+
+Число итераций находится по условию выхода из заголовка и рекуррентностям
+SCEV (как в FinalValueReplacement). Цикл, развернутая копия которого
+укладывается в бюджет размера кода, разворачивается полностью: итерации
+копируются друг за другом, проверки условия в копиях заголовка заменяются
+безусловными переходами. Иначе тело копируется factor раз в основной цикл
+со своим счетчиком групп итераций, а остаток итераций выполняет исходный
+цикл.
+
+Копии получают новые SSA-версии переменных (временные переменные -
+новые имена в блоке копии), операнды phi-функций заголовка заменяются
+значениями предыдущей итерации. Получающиеся цепочки блоков с единственным
+переходом сливает SimplifyCfg.
+"""
+
+from BB import *
+from cfg import *
+from loops import find_loops, ensure_preheader
+from scev import ScalarEvolution, exit_test, trip_count
+
+
+class LoopUnrolling:
+    """
+    Проход развертки циклов.
+
+    Разворачиваются внутренние циклы с единственным латчем и единственным
+    выходом из заголовка, число итераций которых - константа.
+    """
+
+    def __init__(self, blocks, verbose=True, factor=4, budget=64):
+        """
+        Args:
+            blocks: Базовые блоки программы в SSA-форме (списки инструкций
+                    изменяются на месте, сами инструкции - нет)
+            verbose: Флаг, управляющий выводом отладочной информации
+            factor: Коэффициент частичной развертки (1 - только полная развертка)
+            budget: Наибольшее число инструкций в копиях развернутого цикла
+        """
+        self.blocks = block_map(blocks)
+        self.verbose = verbose
+        self.factor = factor
+        self.budget = budget
+
+        # Последние SSA-версии переменных (для новых версий в копиях)
+        self.versions = {}
+        for bb in self.blocks.values():
+            for instr in bb.instructions:
+                d = instr.get_def()
+                if isinstance(d, Variable) and not d.is_temp:
+                    self.versions[d.name] = max(self.versions.get(d.name, 0), d.version)
+
+        # Статистика прохода
+        self.instructions_before = self.count_instructions()
+        self.unrolled = {}      # заголовок цикла -> (число итераций, коэффициент или None)
+
+    def count_instructions(self):
+        """Количество инструкций в программе"""
+        return sum(len(bb.instructions) for bb in self.blocks.values())
+
+    def run(self):
+        """
+        Выполняет развертку циклов.
+
+        Returns:
+            list: Блоки программы, упорядоченные по номерам
+        """
+        for loop in find_loops(self.blocks):
+            ensure_preheader(self.blocks, loop)
+
+        # После полной развертки внутреннего цикла внутренним становится
+        # объемлющий; заголовки основных циклов частичной развертки
+        # тоже попадают в done, чтобы не разворачивать их повторно
+        self.done = set()
+        changed = True
+        while changed:
+            changed = False
+            for loop in find_loops(self.blocks):
+                if loop.header in self.done or loop.children:
+                    continue
+                self.done.add(loop.header)
+                if self.process(loop):
+                    changed = True
+                    break
+
+        if self.verbose:
+            for header in sorted(self.unrolled):
+                k, factor = self.unrolled[header]
+                how = "полностью" if factor is None else f"с коэффициентом {factor}, остаток {k % factor}"
+                print(f"Цикл с заголовком BLOCK {header}: итераций: {k}, развернут {how}")
+            print(f"Развернуто циклов: {len(self.unrolled)}, инструкций: "
+                  f"{self.instructions_before} -> {self.count_instructions()}")
+
+        return [self.blocks[n] for n in sorted(self.blocks)]
+
+    def process(self, loop):
+        """
+        Разворачивает цикл, если известно число его итераций.
+
+        Returns:
+            bool: True, если цикл был развернут
+        """
+        preds = build_preds(self.blocks)
+        pre = loop.preheader(self.blocks, preds)
+        test = exit_test(self.blocks, loop)
+        if pre is None or len(loop.latches) != 1 or test is None:
+            return False
+        cmp, exit_num, stay_on_true = test
+        if preds[exit_num] != [loop.header]:
+            return False
+        k, _ = trip_count(ScalarEvolution(self.blocks, loop), cmp, stay_on_true)
+        if k is None:
+            return False
+
+        size = sum(len(self.blocks[n].instructions) for n in loop.blocks)
+        if k * size + len(self.blocks[loop.header].instructions) <= self.budget:
+            self.unroll_fully(loop, pre, exit_num, k)
+            self.unrolled[loop.header] = (k, None)
+            return True
+
+        factor = min(self.factor, self.budget // size)
+        if factor < 2 or k < factor:
+            return False
+        self.unroll_partially(loop, pre, exit_num, k, factor)
+        self.unrolled[loop.header] = (k, factor)
+        return True
+
+    # ==== РАЗВЕРТКА ====
+
+    def unroll_fully(self, loop, pre, exit_num, k):
+        """Заменяет цикл k копиями итерации и копией заголовка, ведущей в выход"""
+        header = self.blocks[loop.header]
+        phis = [instr for instr in header.instructions if instr.typ == PHI]
+        values = dict((phi.args['to'], phi_operand(phi, pre)) for phi in phis)
+
+        prev, target = pre, loop.header
+        for j in range(k):
+            copies, rename = self.clone(loop, values)
+            self.link(prev, target, copies[loop.header])
+            self.skip_test(loop, copies)
+            prev, target = copies[loop.latches[0]].block_num, copies[loop.header].block_num
+            values = self.next_values(loop, phis, rename)
+
+        final, rename = self.clone(loop, values, [loop.header])
+        self.link(prev, target, final[loop.header])
+        self.leave(loop, final[loop.header], exit_num, rename)
+
+    def unroll_partially(self, loop, pre, exit_num, k, factor):
+        """
+        Копирует тело factor раз в основной цикл, остаток выполняет исходный цикл.
+
+        Основной цикл выполняет k // factor групп итераций, что проверяется
+        отдельным счетчиком групп; проверки исходного условия внутри группы
+        заменяются безусловными переходами.
+        """
+        header = self.blocks[loop.header]
+        latch = loop.latches[0]
+        phis = [instr for instr in header.instructions if instr.typ == PHI]
+        groups, rest = divmod(k, factor)
+
+        # Первая копия сохраняет phi-функции заголовка
+        first, rename = self.clone(loop, {})
+        main = first[loop.header]
+        entry = dict((phi.args['to'], rename[phi.args['to']]) for phi in phis)
+        self.link(pre, loop.header, main)
+
+        copies = first
+        for j in range(1, factor):
+            values = self.next_values(loop, phis, rename)
+            prev, target = copies[latch].block_num, copies[loop.header].block_num
+            copies, rename = self.clone(loop, values)
+            self.link(prev, target, copies[loop.header])
+            self.skip_test(loop, copies)
+        last = copies[latch]
+        retarget(last, copies[loop.header].block_num, main.block_num)
+        back = self.next_values(loop, phis, rename)
+
+        # Phi-функции основного цикла и счетчик групп итераций
+        counter = main.create_tmp_var()
+        next_counter = last.create_tmp_var()
+        cond = main.create_tmp_var()
+        main_phis = [Instruction(PHI, {'to': entry[phi.args['to']],
+                                       'from': [phi_operand(phi, pre), back[phi.args['to']]],
+                                       'blocks': [pre, last.block_num]}) for phi in phis]
+        main_phis.append(Instruction(PHI, {'to': counter, 'from': [IntConst(0), next_counter],
+                                           'blocks': [pre, last.block_num]}))
+        insert_before_terminator(last, [Instruction(ADD, {'oper1': counter, 'oper2': IntConst(1),
+                                                          'to': next_counter})])
+        body = main.instructions[-1].args['dest1'] if stays(main.instructions[-1], first) \
+            else main.instructions[-1].args['dest2']
+        main.instructions = main_phis + [instr for instr in main.instructions if instr.typ != PHI]
+        main.instructions[-1:] = [
+            Instruction(ICMP, {'arg1': counter, 'arg2': IntConst(groups), 'to': cond, 'op': '<'}),
+            Instruction(CONDBR, {'cond': cond, 'dest1': body, 'dest2': loop.header})]
+        self.done.add(main.block_num)
+
+        if rest:
+            # Остаток итераций: исходный цикл начинает со значений основного
+            for i, instr in enumerate(header.instructions):
+                if instr.typ == PHI:
+                    header.instructions[i] = instr.with_args(**{
+                        'from': [entry[instr.args['to']] if b == pre else v
+                                 for b, v in zip(instr.args['blocks'], instr.args['from'])],
+                        'blocks': [main.block_num if b == pre else b for b in instr.args['blocks']]})
+            return
+
+        # Остатка нет: после основного цикла условие выхода проверяется один раз
+        final, rename = self.clone(loop, entry, [loop.header])
+        retarget(main, loop.header, final[loop.header].block_num)
+        self.leave(loop, final[loop.header], exit_num, rename)
+
+    # ==== КОПИРОВАНИЕ ====
+
+    def fresh(self, var, bb):
+        """Возвращает новую SSA-версию переменной для копии в блоке bb"""
+        if var.is_temp:
+            return bb.create_tmp_var()
+        self.versions[var.name] = self.versions.get(var.name, 0) + 1
+        return Variable(var.name, self.versions[var.name])
+
+    def clone(self, loop, values, nums=None):
+        """
+        Копирует блоки цикла (одну итерацию).
+
+        Args:
+            loop: Копируемый цикл
+            values: {результат phi-функции заголовка: значение в копии};
+                    phi-функции, отсутствующие в values, копируются
+            nums: Номера копируемых блоков (по умолчанию - все блоки цикла)
+
+        Returns:
+            tuple: ({номер блока: блок-копия}, {значение: значение в копии})
+        """
+        nums = sorted(loop.blocks if nums is None else nums)
+        copies = dict((n, new_block(self.blocks, self.blocks[n])) for n in nums)
+        rename = dict(values)
+        for n in nums:
+            for instr in self.blocks[n].instructions:
+                d = instr.get_def()
+                if isinstance(d, Variable) and d not in rename:
+                    rename[d] = self.fresh(d, copies[n])
+
+        def resolve(val):
+            return rename.get(val, val) if isinstance(val, Variable) else val
+
+        def block(num):
+            return copies[num].block_num if num in copies else num
+
+        for n in nums:
+            for instr in self.blocks[n].instructions:
+                if instr.typ == PHI and instr.args['to'] in values:
+                    continue
+                new = instr.map_uses(resolve)
+                if new.get_def() is not None:
+                    new = new.with_args(to=rename[new.get_def()])
+                if new.typ == PHI:
+                    new = new.with_args(blocks=[block(b) for b in new.args['blocks']])
+                elif new.typ == BR:
+                    new = new.with_args(dest=block(new.args['dest']))
+                elif new.typ == CONDBR:
+                    new = new.with_args(dest1=block(new.args['dest1']),
+                                        dest2=block(new.args['dest2']))
+                copies[n].add_instr(new)
+        return copies, rename
+
+    def next_values(self, loop, phis, rename):
+        """Значения phi-функций заголовка в следующей копии"""
+        latch = loop.latches[0]
+        result = {}
+        for phi in phis:
+            val = phi_operand(phi, latch)
+            result[phi.args['to']] = rename.get(val, val) if isinstance(val, Variable) else val
+        return result
+
+    def link(self, prev, target, header):
+        """Направляет переход из блока prev в блок target на копию заголовка header"""
+        retarget(self.blocks[prev], target, header.block_num)
+
+    def skip_test(self, loop, copies):
+        """Заменяет проверку условия в копии заголовка переходом в тело"""
+        bb = copies[loop.header]
+        term = bb.instructions[-1]
+        dest = term.args['dest1'] if stays(term, copies) else term.args['dest2']
+        bb.instructions[-1] = Instruction(BR, {'dest': dest})
+
+    def leave(self, loop, final, exit_num, rename):
+        """Завершает развертку: копия заголовка ведет в выход, исходный цикл удаляется"""
+        final.instructions[-1] = Instruction(BR, {'dest': exit_num})
+        replace_phi_pred(self.blocks[exit_num], loop.header, final.block_num)
+        for n in loop.blocks:
+            del self.blocks[n]
+
+        def resolve(val):
+            return rename.get(val, val) if isinstance(val, Variable) else val
+        for bb in self.blocks.values():
+            bb.instructions = [instr.map_uses(resolve) for instr in bb.instructions]
+
+
+def stays(term, copies):
+    """True, если условный переход копии заголовка ведет в цикл по истинному условию"""
+    return any(copy.block_num == term.args['dest1'] for copy in copies.values())
@@ -0,0 +1,124 @@
+"""
+Проверка корректности SSA-формы.
+
+Проверка выполняется за один обход дерева доминаторов и предназначена
+для тестов и отладочных запусков; в обычной сборке она не вызывается.
+"""
+
+from BB import *
+from cfg import *
+
+
+class SsaVerifier:
+    """
+    Проверяет свойства SSA-формы программы:
+    - каждая версия переменной определяется ровно один раз;
+    - определение доминирует над каждым использованием
+      (для операнда phi-функции - над концом соответствующего предшественника);
+    - число операндов phi-функции равно числу предшественников блока,
+      а phi-функции стоят в начале блока;
+    - нет использований версий, которые нигде не определены
+      (например, оставшихся без переименования версий 0).
+    """
+
+    def __init__(self, blocks):
+        """
+        Args:
+            blocks: Базовые блоки программы в SSA-форме
+        """
+        self.blocks = block_map(blocks)
+        self.errors = []
+
+    def verify(self):
+        """
+        Выполняет проверку.
+
+        Returns:
+            list: Список сообщений об ошибках (пустой, если ошибок нет)
+        """
+        self.errors = []
+        preds = build_preds(self.blocks)
+        idom = immediate_dominators(self.blocks)
+        children = dominator_tree(idom)
+
+        defined = set()     # все определенные версии
+        in_scope = set()    # версии, определения которых доминируют текущую точку
+        unresolved = []     # использования вне области видимости определения
+
+        def use(val, where):
+            if isinstance(val, Variable) and val not in in_scope:
+                unresolved.append((val, where))
+
+        # Обход дерева доминаторов с явным стеком: (признак выхода, блок, определения блока)
+        stack = [(False, ENTRY, None)]
+        while stack:
+            leaving, n, block_defs = stack.pop()
+            if leaving:
+                in_scope.difference_update(block_defs)
+                continue
+
+            bb = self.blocks[n]
+            block_defs = []
+            seen_non_phi = False
+            for i, instr in enumerate(bb.instructions):
+                where = f'BLOCK {n}, инструкция {i} ({instr})'
+                if instr.typ == PHI:
+                    if seen_non_phi:
+                        self.errors.append(f'{where}: phi-функция не в начале блока')
+                    self.check_phi_arity(instr, preds[n], where)
+                else:
+                    seen_non_phi = True
+                    for val in instr.get_uses():
+                        use(val, where)
+
+                d = instr.get_def()
+                if isinstance(d, Variable):
+                    if d in defined:
+                        self.errors.append(f'{where}: повторное определение {d}')
+                    defined.add(d)
+                    if d not in in_scope:
+                        in_scope.add(d)
+                        block_defs.append(d)
+
+            # Операнды phi-функций преемников должны быть доступны в конце блока
+            for succ in bb.get_successors():
+                for instr in self.blocks[succ].instructions:
+                    if instr.typ != PHI:
+                        break
+                    for pred, val in zip(instr.args['blocks'], instr.args['from']):
+                        if pred == n:
+                            use(val, f'BLOCK {succ}, {instr} (из BLOCK {n})')
+
+            stack.append((True, n, block_defs))
+            for child in reversed(children[n]):
+                stack.append((False, child, None))
+
+        for val, where in unresolved:
+            if val in defined:
+                self.errors.append(f'{where}: определение {val} не доминирует над использованием')
+            else:
+                self.errors.append(f'{where}: использование неопределенной версии {val}')
+
+        return self.errors
+
+    def check_phi_arity(self, instr, preds, where):
+        """Проверяет соответствие операндов phi-функции предшественникам блока"""
+        values = instr.args['from']
+        blocks = instr.args.get('blocks')
+        if len(values) != len(preds):
+            self.errors.append(f'{where}: операндов phi-функции {len(values)}, '
+                               f'предшественников {len(preds)}')
+        elif blocks is None or sorted(blocks) != sorted(preds):
+            self.errors.append(f'{where}: блоки операндов phi-функции {blocks} '
+                               f'не совпадают с предшественниками {preds}')
+
+    def check(self):
+        """
+        Выполняет проверку и выбрасывает исключение при ошибках.
+
+        Raises:
+            ValueError: Если SSA-форма некорректна
+        """
+        errors = self.verify()
+        if errors:
+            raise ValueError("Некорректная SSA-форма:\n" + "\n".join(errors))